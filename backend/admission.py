@@ -0,0 +1,263 @@
+"""Admission control: per-user rate limits, per-route concurrency limits and
+priority-based load shedding, applied before a view runs.
+
+Every endpoint belongs to a priority class. Writes and cheap reads are the
+last to be shed; aggregations and calls to external services (Vision,
+OpenAI) are the first. A request is checked in this order:
+
+1. the caller's token buckets for the class, else 429 with Retry-After. The
+   caller is the client address: there is no login session, so a user name
+   in the request is only a claim. Each (address, claimed name) pair has a
+   bucket of the class's size, and the address as a whole one
+   ADMISSION_ADDRESS_FACTOR times larger for the users behind a shared
+   address. Rotating names only draws on the address's bucket, and a name
+   claimed from another address never drains this one's;
+2. the process-wide in-flight count against the class's shed threshold,
+   else 503;
+3. the route's concurrency limit. It may wait briefly in a bounded queue;
+   if the queue is full or the wait times out, it gets 503 with Retry-After.
+
+Every decision is counted in /api/metrics. Limits apply per worker process.
+Classes are tuned with ADMISSION_<CLASS>_<FIELD> environment variables, e.g.
+ADMISSION_EXTERNAL_CONCURRENCY=8.
+"""
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+from flask import g, jsonify, request
+
+import metrics
+
+# shed_at: fraction of max_inflight above which the class is turned away
+PriorityClass = namedtuple('PriorityClass', 'shed_at concurrency queue rate burst')
+
+DEFAULT_CLASSES = {
+    'write': PriorityClass(shed_at=1.0, concurrency=32, queue=64, rate=10.0, burst=50),
+    'read': PriorityClass(shed_at=0.9, concurrency=32, queue=64, rate=20.0, burst=100),
+    'aggregate': PriorityClass(shed_at=0.75, concurrency=8, queue=16, rate=2.0, burst=10),
+    'external': PriorityClass(shed_at=0.6, concurrency=4, queue=4, rate=0.2, burst=3),
+}
+
+# Endpoints that do not fall into their method's default class
+ROUTE_CLASSES = {
+    'receipts.process_receipt': 'external',
+    'summary.summary_ai': 'external',
+    'summary.summary_ai_stream': 'external',
+    'analytics.analytics_overview': 'aggregate',
+    'analytics.dashboard': 'aggregate',
+    'analytics.analytics_stats': 'aggregate',
+    'payments.settlements_suggest': 'aggregate',
+    'summary.summary_plain': 'aggregate',
+    'export.export_data': 'aggregate',
+    'expenses.search_expenses': 'aggregate',
+    'sync.sync_changes': 'aggregate',
+}
+
+# Long-lived streams and probes are never limited, nor are CORS preflights
+EXEMPT = {'sync.stream_changes', 'health.health', 'health.ready', 'health.metrics_endpoint', 'static'}
+
+decisions = metrics.counter('admission_decisions_total', 'Admission decisions by route, class and outcome',
+                            ('route', 'priority', 'decision'))
+inflight = metrics.gauge('admission_inflight', 'Requests being served, by route', ('route',))
+queued = metrics.gauge('admission_queued', 'Requests waiting for a route slot', ('route',))
+
+
+def load_classes(overrides=None):
+    """DEFAULT_CLASSES with ADMISSION_<CLASS>_<FIELD> env vars and explicit overrides applied"""
+    classes = {}
+    for name, defaults in DEFAULT_CLASSES.items():
+        values = defaults._asdict()
+        for field, default in values.items():
+            env = os.getenv(f'ADMISSION_{name.upper()}_{field.upper()}')
+            if env is not None:
+                values[field] = type(default)(env)
+        values.update((overrides or {}).get(name, {}))
+        classes[name] = PriorityClass(**values)
+    return classes
+
+
+class TokenBuckets:
+    """One token bucket per key, refilled at `rate` tokens/s up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend a token; returns 0 if one was available, else seconds until the next"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > 10000:
+                    self._forget_full(now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def give_back(self, key):
+        """Return a token take() spent, for a request another bucket then refused"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, last = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), last)
+
+    def _forget_full(self, now):
+        # A bucket that has refilled is the same as a missing one
+        self._buckets = {k: (t, last) for k, (t, last) in self._buckets.items()
+                         if t + (now - last) * self.rate < self.burst}
+
+
+class RouteLimiter:
+    """At most `concurrency` requests at once, plus up to `queue` waiting"""
+
+    def __init__(self, concurrency, queue):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.running = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        """Returns 'admitted', 'queued' (admitted after waiting), 'queue_full' or 'queue_timeout'"""
+        with self._cond:
+            if self.running < self.concurrency:
+                self.running += 1
+                return 'admitted'
+            if self.waiting >= self.queue:
+                return 'queue_full'
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self.running < self.concurrency, timeout):
+                    return 'queue_timeout'
+                self.running += 1
+                return 'queued'
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify()
+
+
+class Admission:
+    def __init__(self, app=None, classes=None, max_inflight=None, queue_timeout=None):
+        self.classes = classes or load_classes()
+        self.max_inflight = max_inflight or int(os.getenv('ADMISSION_MAX_INFLIGHT', '64'))
+        self.queue_timeout = queue_timeout or float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))
+        self.buckets = {name: TokenBuckets(c.rate, c.burst) for name, c in self.classes.items()}
+        factor = float(os.getenv('ADMISSION_ADDRESS_FACTOR', '10'))
+        self.address_buckets = {name: TokenBuckets(c.rate * factor, c.burst * factor)
+                                for name, c in self.classes.items()}
+        self.inflight = 0
+        self._limiters = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['admission'] = self
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def priority_of(self, endpoint, method):
+        if endpoint in ROUTE_CLASSES:
+            return ROUTE_CLASSES[endpoint]
+        return 'read' if method in ('GET', 'HEAD') else 'write'
+
+    def _limiter(self, endpoint, priority):
+        limiter = self._limiters.get(endpoint)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.setdefault(endpoint, RouteLimiter(
+                    self.classes[priority].concurrency, self.classes[priority].queue))
+        return limiter
+
+    def queue_depth(self, endpoint):
+        """(requests running, requests waiting) on a route's concurrency limit, and its queue size"""
+        limiter = self._limiters.get(endpoint)
+        if limiter is None:
+            return 0, 0, self.classes[self.priority_of(endpoint, 'GET')].queue
+        return limiter.running, limiter.waiting, limiter.queue
+
+    def _claimed_user(self):
+        """The user named in the request, if any; unauthenticated, so never a key on its own"""
+        user = request.args.get('user')
+        if not user:
+            body = request.get_json(silent=True) or {}
+            user = body.get('username') or body.get('paidBy') if isinstance(body, dict) else None
+        return user or ''
+
+    def _take(self, priority):
+        """Seconds to wait before the caller may retry, or 0 once a token is spent from each bucket"""
+        address = request.remote_addr
+        key = (address, self._claimed_user())
+        wait = self.buckets[priority].take(key)
+        if wait:
+            return wait
+        wait = self.address_buckets[priority].take(address)
+        if wait:
+            # Refused for the address: the caller's own budget is left as it was
+            self.buckets[priority].give_back(key)
+        return wait
+
+    def _admit(self):
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in EXEMPT or request.method == 'OPTIONS':
+            return None
+        priority = self.priority_of(endpoint, request.method)
+        cls = self.classes[priority]
+
+        wait = self._take(priority)
+        if wait:
+            return self._reject(endpoint, priority, 'rate_limited', 429, 'Too many requests', wait)
+
+        with self._lock:
+            if self.inflight >= self.max_inflight * cls.shed_at:
+                shed = True
+            else:
+                shed = False
+                self.inflight += 1
+        if shed:
+            return self._reject(endpoint, priority, 'shed', 503, 'Server busy', 1)
+
+        limiter = self._limiter(endpoint, priority)
+        queued.inc(route=endpoint)
+        try:
+            decision = limiter.acquire(self.queue_timeout)
+        finally:
+            queued.dec(route=endpoint)
+        if decision not in ('admitted', 'queued'):
+            with self._lock:
+                self.inflight -= 1
+            return self._reject(endpoint, priority, decision, 503, 'Server busy', self.queue_timeout)
+
+        decisions.inc(route=endpoint, priority=priority, decision=decision)
+        inflight.inc(route=endpoint)
+        g.admission_slot = (limiter, endpoint)
+        return None
+
+    def _release(self, exc=None):
+        slot = g.pop('admission_slot', None)
+        if slot is None:
+            return
+        limiter, endpoint = slot
+        limiter.release()
+        inflight.dec(route=endpoint)
+        with self._lock:
+            self.inflight -= 1
+
+    def _reject(self, endpoint, priority, decision, status, message, retry_after):
+        decisions.inc(route=endpoint, priority=priority, decision=decision)
+        response = jsonify({'error': message, 'reason': decision})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
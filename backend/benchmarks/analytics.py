@@ -0,0 +1,147 @@
+"""SpendFrame statistics against the same computations in pure Python.
+
+Generates synthetic expense rows in memory (no database, so the numbers are
+the statistics alone), computes each statistic with stats.SpendFrame and with
+straightforward loops over the rows, checks that both agree, and reports the
+time of each and the speedup.
+
+    cd backend && python benchmarks/analytics.py --rows 1000000
+"""
+import argparse
+import datetime
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stats  # noqa: E402
+
+MEMBERS = 8
+
+
+def synthetic_rows(n, seed=3):
+    rng = random.Random(seed)
+    start = datetime.date(2021, 1, 1)
+    rows = []
+    for i in range(n):
+        amount = round(rng.lognormvariate(3, 0.8), 2)
+        day = start + datetime.timedelta(days=rng.randrange(5 * 365))
+        rows.append((f'e{i}', 'x', amount, day.isoformat(), f'm{i % MEMBERS}', round(amount * 0.75, 2)))
+    return rows
+
+
+def split_totals(rows):
+    totals = defaultdict(float)
+    for i, row in enumerate(rows):
+        totals[f'm{(i + 1) % MEMBERS}'] += row[5]
+    return dict(totals)
+
+
+def py_percentiles(amounts):
+    ordered = sorted(amounts)
+    out = {}
+    for q in stats.PERCENTILES:
+        # numpy's default 'linear' interpolation
+        pos = (len(ordered) - 1) * q / 100
+        lo = math.floor(pos)
+        hi = min(lo + 1, len(ordered) - 1)
+        out[f'p{q}'] = ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+    return out
+
+
+def py_rolling(rows, window=7, points=90):
+    daily = defaultdict(float)
+    for row in rows:
+        daily[datetime.date.fromisoformat(row[3])] += row[2]
+    last = max(daily)
+    out = []
+    for k in range(points - 1, -1, -1):
+        day = last - datetime.timedelta(days=k)
+        total = sum(daily.get(day - datetime.timedelta(days=j), 0.0) for j in range(window))
+        out.append({'date': day.isoformat(), 'average': round(total / window, 2)})
+    return out
+
+
+def py_month_over_month(rows, months=12):
+    monthly = defaultdict(float)
+    for row in rows:
+        monthly[row[3][:7]] += row[2]
+    out, previous = [], None
+    for month in sorted(monthly)[-months - 1:]:
+        total = monthly[month]
+        if previous is not None:
+            out.append((month, round(total, 2)))
+        previous = total
+    return out
+
+
+def py_outliers(amounts, threshold=stats.OUTLIER_THRESHOLD):
+    def median(values):
+        s = sorted(values)
+        mid = len(s) // 2
+        return s[mid] if len(s) % 2 else (s[mid - 1] + s[mid]) / 2
+    center = median(amounts)
+    deviation = [abs(a - center) for a in amounts]
+    mad = median(deviation)
+    return sum(1 for d in deviation if 0.6745 * d / mad > threshold)
+
+
+def py_fairness(rows, owed):
+    paid, share = defaultdict(float), defaultdict(float)
+    for row in rows:
+        paid[row[4]] += row[2]
+        share[row[4]] += row[2] - row[5]
+    for name, amount in owed.items():
+        share[name] += amount
+    return {name: round(paid[name] / share[name], 3) for name in share}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = synthetic_rows(args.rows)
+    owed = split_totals(rows)
+    print(f"generated {len(rows):,} rows in {time.perf_counter() - start:.1f}s")
+
+    frame, load_ms = timed(stats.SpendFrame.from_rows, rows)
+    amounts = [row[2] for row in rows]
+    cases = (
+        ('percentiles', lambda: frame.summary()['percentiles'], lambda: py_percentiles(amounts),
+         lambda a, b: all(math.isclose(a[k], b[k], rel_tol=1e-9) for k in a)),
+        ('rolling average', frame.rolling_average, lambda: py_rolling(rows),
+         lambda a, b: a == b),
+        ('month over month', lambda: [(m['month'], m['total']) for m in frame.month_over_month()],
+         lambda: py_month_over_month(rows), lambda a, b: a == b),
+        ('outliers', lambda: len(frame.outliers(limit=len(rows))), lambda: py_outliers(amounts),
+         lambda a, b: a == b),
+        ('fairness', lambda: {m['member']: m['ratio'] for m in frame.fairness(owed)},
+         lambda: py_fairness(rows, owed), lambda a, b: a == b),
+    )
+
+    print(f"load into columns: {load_ms:.0f} ms")
+    print(f"{'statistic':<18}{'numpy ms':>10}{'python ms':>11}{'speedup':>9}  agree")
+    total_np = total_py = 0.0
+    for label, vectorized, baseline, agree in cases:
+        a, np_ms = timed(vectorized)
+        b, py_ms = timed(baseline)
+        total_np += np_ms
+        total_py += py_ms
+        print(f"{label:<18}{np_ms:>10.1f}{py_ms:>11.1f}{py_ms / np_ms:>8.1f}x  {agree(a, b)}")
+    print(f"{'all':<18}{total_np:>10.1f}{total_py:>11.1f}{total_py / total_np:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Mixed read/write load against the API on either storage backend.
+
+Seeds users, groups and expenses through the endpoints, then drives a
+weighted mix of requests from a thread pool through the Flask test client
+(no network, so the numbers are app + database cost) and reports throughput
+and latency percentiles per endpoint.
+
+    cd backend && python benchmarks/load.py --backend sqlite --requests 5000
+    cd backend && DB_HOST=... python benchmarks/load.py --backend mysql
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+
+# (name, weight) of each request in the mix
+MIX = (
+    ('groups.list', 15),
+    ('expenses.list', 25),
+    ('expenses.recent', 10),
+    ('payments.pending', 10),
+    ('analytics.overview', 10),
+    ('settlements.suggest', 10),
+    ('dashboard', 5),
+    ('expenses.create', 15),
+)
+
+
+def seed(client, run, users, groups, expenses):
+    names = [f'load-{run}-u{i}' for i in range(users)]
+    for name in names:
+        client.post('/api/users/register', json={'username': name, 'password': 'pw'})
+
+    group_ids = []
+    for g in range(groups):
+        owner = names[g % users]
+        resp = client.post('/api/groups/create', json={'groupName': f'load group {g}', 'username': owner})
+        gid = resp.get_json()['id']
+        group_ids.append((gid, owner))
+        for k in range(1, 4):
+            client.post('/api/groups/add-member', json={'groupId': gid, 'memberName': names[(g + k) % users]})
+
+    for i in range(expenses):
+        gid, owner = group_ids[i % groups]
+        client.post('/api/expenses/create', json={
+            'groupId': gid, 'title': f'seed {i}', 'amount': 10 + i % 90,
+            'date': f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}', 'paidBy': owner
+        })
+    return names, group_ids
+
+
+def one_request(client, name, names, group_ids, rng):
+    user = rng.choice(names)
+    gid, owner = rng.choice(group_ids)
+    if name == 'groups.list':
+        return client.get(f'/api/groups/list?user={user}')
+    if name == 'expenses.list':
+        return client.get(f'/api/expenses/list?groupId={gid}')
+    if name == 'expenses.recent':
+        return client.get(f'/api/expenses/recent?user={user}')
+    if name == 'payments.pending':
+        return client.get(f'/api/payments/pending?user={user}')
+    if name == 'analytics.overview':
+        return client.get(f'/api/analytics/overview?user={user}')
+    if name == 'settlements.suggest':
+        return client.get(f'/api/settlements/suggest?groupId={gid}')
+    if name == 'dashboard':
+        return client.get(f'/api/dashboard?user={user}')
+    return client.post('/api/expenses/create', json={
+        'groupId': gid, 'title': 'load', 'amount': rng.randint(5, 200),
+        'date': '2025-06-01', 'paidBy': owner
+    })
+
+
+def run(app, names, group_ids, total, threads):
+    names_mix = [n for n, _ in MIX]
+    weights = [w for _, w in MIX]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    local = threading.local()
+
+    def worker(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+            local.rng = random.Random(i)
+        name = local.rng.choices(names_mix, weights)[0]
+        start = time.perf_counter()
+        resp = one_request(local.client, name, names, group_ids, local.rng)
+        ms = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies[name].append(ms)
+            if resp.status_code >= 400:
+                errors[name] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(total)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def report(backend, elapsed, latencies, errors):
+    total = sum(len(v) for v in latencies.values())
+    print(f"{backend}: {total} requests in {elapsed:.2f}s = {total / elapsed:,.0f} req/s")
+    print(f"{'endpoint':<22}{'n':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, _ in MIX:
+        values = latencies.get(name)
+        if not values:
+            continue
+        print(f"{name:<22}{len(values):>7}{statistics.median(values):>9.2f}"
+              f"{pct(values, 95):>9.2f}{pct(values, 99):>9.2f}{errors[name]:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--sqlite-path', help='defaults to a fresh temporary file')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--expenses', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    sqlite_path = args.sqlite_path or os.path.join(tempfile.mkdtemp(prefix='expense-load-'), 'load.sqlite3')
+    # Admission limits would turn the synthetic burst away; this measures the app and database
+    app = create_app({'DB_BACKEND': args.backend, 'SQLITE_PATH': sqlite_path, 'ADMISSION': False})
+    client = app.test_client()
+
+    seed_start = time.perf_counter()
+    names, group_ids = seed(client, int(time.time()), args.users, args.groups, args.expenses)
+    print(f"seeded {args.users} users, {args.groups} groups, {args.expenses} expenses "
+          f"in {time.perf_counter() - seed_start:.2f}s")
+
+    elapsed, latencies, errors = run(app, names, group_ids, args.requests, args.threads)
+    report(args.backend, elapsed, latencies, errors)
@@ -0,0 +1,110 @@
+"""Cross-group debt netting (netting.py) on one large connected component.
+
+For each user count, builds a component of --users users in --groups
+groups per user: each group has 3 to 8 members, mostly within --spread
+places of one another with an occasional stranger, so every user is linked
+to the rest, and 1 to 6 equal-split expenses. The group debts are written
+to the balance_ledger of a fresh SQLite database, as create_expense leaves
+them. Reports how many transfers the per-group suggestions need against
+the netted plan, how many group transfers cancelled out, the time to
+gather the component breadth first from one user, and the time of net(),
+whose cycle cancelling has --budget seconds ("complete": no if it ran out).
+
+    cd backend && python benchmarks/netting.py --users 1000 10000 30000 --groups 0.5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import netting  # noqa: E402
+import storage  # noqa: E402
+from routes.payments import settle_balances  # noqa: E402
+
+
+def make_ledger(users, groups, spread, rng):
+    """{(group_id, debtor, creditor): amount}, netted within each pair as the ledger stores it"""
+    owed = {}
+    for g in range(groups):
+        home = rng.randrange(users)
+        members = {home}
+        size = rng.randint(3, 8)
+        while len(members) < size:
+            stranger = rng.random() < 0.1
+            members.add(rng.randrange(users) if stranger else (home + rng.randint(-spread, spread)) % users)
+        members = [f'u{m}' for m in members]
+        for _ in range(rng.randint(1, 6)):
+            payer = rng.choice(members)
+            share = round(rng.randint(500, 20000) / 100 / len(members), 2)
+            for member in members:
+                if member != payer:
+                    owed[(f'g{g}', member, payer)] = owed.get((f'g{g}', member, payer), 0.0) + share
+    ledger = {}
+    for (group_id, debtor, creditor), amount in owed.items():
+        amount -= owed.get((group_id, creditor, debtor), 0.0)
+        if amount > 0.005:
+            ledger[(group_id, debtor, creditor)] = amount
+    return ledger
+
+
+def per_group_transfers(ledger):
+    """How many transfers /api/settlements/suggest lists over all the groups"""
+    groups = {}
+    for (group_id, debtor, creditor), amount in ledger.items():
+        net = groups.setdefault(group_id, {})
+        net[creditor] = net.get(creditor, 0.0) + amount
+        net[debtor] = net.get(debtor, 0.0) - amount
+    return sum(len(settle_balances(net)) for net in groups.values())
+
+
+def run(users, groups, spread, budget, seed):
+    rng = random.Random(seed)
+    ledger = make_ledger(users, round(users * groups), spread, rng)
+    storage.configure('sqlite', os.path.join(tempfile.mkdtemp(prefix='expense-netting-'), 'netting.sqlite3'))
+    with storage.transaction() as repo:
+        repo.cur.executemany('''
+            INSERT INTO balance_ledger (debtor, creditor, group_id, amount) VALUES (%s, %s, %s, %s)
+        ''', [row for (group_id, debtor, creditor), amount in ledger.items()
+              for row in ((debtor, creditor, group_id, amount), (creditor, debtor, group_id, -amount))])
+
+    # Any user with a debt; the component reaches (nearly) everyone from there
+    first = next(iter(ledger))[1]
+    start = time.perf_counter()
+    with storage.session() as repo:
+        debts, _ = netting.debt_component(repo, first, max_users=users)
+    gather = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plan = netting.net(debts, budget)
+    elapsed = time.perf_counter() - start
+
+    reached = len({name for debt in debts for name in debt[:2]})
+    return (reached, len(debts), per_group_transfers(ledger), len(plan['transfers']), len(plan['offsets']),
+            gather, elapsed, plan['complete'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 30000])
+    parser.add_argument('--groups', type=float, default=0.5, help='groups per user')
+    parser.add_argument('--spread', type=int, default=10,
+                        help='how far apart, in user numbers, the members of one group are')
+    parser.add_argument('--budget', type=float, default=netting.BUDGET_SECONDS)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'users':>8}{'debts':>9}{'per group':>11}{'netted':>9}{'offsets':>9}"
+          f"{'gather s':>10}{'net s':>8}  complete")
+    for users in args.users:
+        reached, debts, per_group, transfers, offsets, gather, elapsed, complete = run(
+            users, args.groups, args.spread, args.budget, args.seed)
+        print(f"{reached:>8,}{debts:>9,}{per_group:>11,}{transfers:>9,}{offsets:>9,}"
+              f"{gather:>10.2f}{elapsed:>8.2f}  {'yes' if complete else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
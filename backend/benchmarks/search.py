@@ -0,0 +1,104 @@
+"""Latency of /api/expenses/search queries over a large synthetic index.
+
+Bulk-loads expenses straight into a fresh SQLite database (or the configured
+MySQL one with --backend mysql), builds expense_terms with reindex_expenses(),
+then times prefix queries with and without filters at the repository level.
+
+    cd backend && python benchmarks/search.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+WORDS = ('dinner lunch breakfast coffee taxi uber train flight hotel airbnb groceries market '
+         'pizza sushi tacos drinks bar concert tickets museum gas parking rent utilities '
+         'internet phone gym snacks gift birthday party movie').split()
+# Every group holds ~100 expenses and every user sits in ~50 groups, so the
+# total grows with --rows while each user's own search space stays realistic
+EXPENSES_PER_GROUP = 100
+GROUPS_PER_USER = 50
+MEMBERS_PER_GROUP = 5
+
+QUERIES = (
+    ('one word', {'terms': ['dinner']}),
+    ('short prefix', {'terms': ['pi']}),
+    ('two words', {'terms': ['pizza', 'party']}),
+    ('word + amount', {'terms': ['hotel'], 'min_amount': 100}),
+    ('word + dates', {'terms': ['taxi'], 'date_from': '2025-06-01', 'date_to': '2025-06-30'}),
+    ('page 5', {'terms': ['coffee'], 'offset': 80}),
+)
+
+
+def load(repo, rows):
+    rng = random.Random(7)
+    n_groups = max(rows // EXPENSES_PER_GROUP, 1)
+    n_users = max(n_groups * MEMBERS_PER_GROUP // GROUPS_PER_USER, MEMBERS_PER_GROUP)
+    users = [f'bench-u{i}' for i in range(n_users)]
+    repo.cur.executemany("INSERT INTO users (username, password) VALUES (%s, 'x')", [(u,) for u in users])
+    groups = [(f'bench-g{g}', f'{rng.choice(WORDS)} crew {g}', users[g % n_users]) for g in range(n_groups)]
+    repo.cur.executemany("INSERT INTO `groups` (id, name, created_by) VALUES (%s, %s, %s)", groups)
+    repo.cur.executemany("INSERT INTO group_members (group_id, username) VALUES (%s, %s)",
+                         [(gid, users[(g * MEMBERS_PER_GROUP + k) % n_users]) for g, (gid, _, _) in enumerate(groups)
+                          for k in range(MEMBERS_PER_GROUP)])
+    batch = []
+    for i in range(rows):
+        gid, _, owner = groups[i % n_groups]
+        title = ' '.join(rng.sample(WORDS, 2))
+        batch.append((f'bench-e{i}', gid, round(rng.uniform(3, 400), 2), title, rng.choice(WORDS),
+                      f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', '12:00', owner))
+        if len(batch) == 10000:
+            _insert(repo, batch)
+            batch = []
+    if batch:
+        _insert(repo, batch)
+    return users
+
+
+def _insert(repo, batch):
+    repo.cur.executemany('''
+        INSERT INTO expenses (id, group_id, amount, category, note, date, time, paid_by)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ''', batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='expense-search-'), 'search.sqlite3')
+    storage.configure(args.backend, path)
+
+    start = time.perf_counter()
+    with storage.transaction() as repo:
+        users = load(repo, args.rows)
+        indexed = repo.reindex_expenses()
+    print(f"loaded and indexed {indexed:,} expenses in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(11)
+    print(f"{'query':<16}{'p50 ms':>9}{'p95 ms':>9}{'hits':>7}")
+    with storage.session() as repo:
+        for label, params in QUERIES:
+            timings, hits = [], 0
+            for _ in range(args.runs):
+                user = rng.choice(users)
+                t = time.perf_counter()
+                hits += len(repo.search_expenses(user, **params))
+                timings.append((time.perf_counter() - t) * 1000)
+            timings.sort()
+            print(f"{label:<16}{statistics.median(timings):>9.2f}"
+                  f"{timings[int(len(timings) * 0.95) - 1]:>9.2f}{hits // args.runs:>7}")
+
+
+if __name__ == '__main__':
+    main()
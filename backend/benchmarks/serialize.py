@@ -0,0 +1,110 @@
+"""Latency and peak memory of the list endpoints' responses, before and after
+compact rows.
+
+Loads one group of N expenses (and N payments by its member) for each size
+into a fresh SQLite database, then builds each endpoint's response body two
+ways from the same query:
+- dicts: fetchall(), a dict per row, then Flask's jsonify (what the
+  endpoints did before);
+- rows: the cursor read chunk by chunk by serialize.json_response;
+and rows again with gzip. Peak memory is measured separately with
+tracemalloc, which slows the code it traces.
+
+    cd backend && python benchmarks/serialize.py --sizes 10000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialize  # noqa: E402
+import storage  # noqa: E402
+from app import create_app  # noqa: E402
+from flask import jsonify  # noqa: E402
+
+ENDPOINTS = (
+    ('list_expenses', lambda repo, n: repo.list_expenses(f'bench-g{n}')),
+    ('recent_expenses', lambda repo, n: repo.recent_expenses(f'bench-u{n}', limit=n)),
+    ('payment_history', lambda repo, n: repo.payment_history(f'bench-u{n}', limit=n)),
+)
+
+
+def load(repo, n):
+    user, gid = f'bench-u{n}', f'bench-g{n}'
+    repo.cur.execute("INSERT INTO users (username, password) VALUES (%s, 'x')", (user,))
+    repo.cur.execute("INSERT INTO `groups` (id, name, created_by) VALUES (%s, %s, %s)", (gid, f'group {n}', user))
+    repo.cur.execute("INSERT INTO group_members (group_id, username) VALUES (%s, %s)", (gid, user))
+    for start in range(0, n, 10000):
+        ids = range(start, min(start + 10000, n))
+        repo.cur.executemany('''
+            INSERT INTO expenses (id, group_id, amount, category, note, date, time, paid_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ''', [(f'{gid}-e{i}', gid, 10 + i % 90 + 0.25, f'expense {i}', 'split evenly',
+               f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}', '12:00', user) for i in ids])
+        repo.cur.executemany('''
+            INSERT INTO payments (expense_id, username, amount, payment_method) VALUES (%s, %s, %s, 'manual')
+        ''', [(f'{gid}-e{i}', user, 5 + i % 40) for i in ids])
+
+
+def as_dicts(fetch):
+    def build(repo, n):
+        rows = fetch(repo, n)
+        keys = rows.row_type.json_keys
+        return jsonify([dict(zip(keys, row)) for row in rows.cursor.fetchall()]).get_data()
+    return build
+
+
+def as_rows(fetch, compress):
+    def build(repo, n):
+        serialize.COMPRESSION = compress
+        return serialize.json_response(fetch(repo, n)).get_data()
+    return build
+
+
+def measure(app, build, n):
+    headers = {'Accept-Encoding': 'gzip'}
+    with app.test_request_context(headers=headers), storage.session(stream=True) as repo:
+        gc.collect()
+        start = time.perf_counter()
+        body = build(repo, n)
+        ms = (time.perf_counter() - start) * 1000
+        size = len(body)
+        del body
+        gc.collect()
+        tracemalloc.start()
+        build(repo, n)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return ms, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='expense-serialize-'), 'serialize.sqlite3')
+    app = create_app({'DB_BACKEND': 'sqlite', 'SQLITE_PATH': path, 'ADMISSION': False})
+    start = time.perf_counter()
+    with storage.transaction() as repo:
+        for n in args.sizes:
+            load(repo, n)
+    print(f"loaded {sum(args.sizes):,} expenses and payments in {time.perf_counter() - start:.1f}s "
+          f"(encoder: {'orjson' if serialize.orjson else 'json'})")
+
+    print(f"{'endpoint':<17}{'rows':>9}  {'path':<6}{'ms':>9}{'peak MB':>10}{'body MB':>10}")
+    for name, fetch in ENDPOINTS:
+        for n in args.sizes:
+            for label, build in (('dicts', as_dicts(fetch)), ('rows', as_rows(fetch, False)),
+                                 ('gzip', as_rows(fetch, True))):
+                ms, peak, size = measure(app, build, n)
+                print(f"{name:<17}{n:>9,}  {label:<6}{ms:>9.1f}{peak / 2**20:>10.1f}{size / 2**20:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""HTTP throughput of the development server against gunicorn (gunicorn.conf.py).
+
+Starts each server on a fresh SQLite database, seeds it over HTTP, then
+drives load.py's request mix from --threads keep-alive clients and reports
+requests per second and latency percentiles. Admission control is off so
+the numbers are serving + app + database cost.
+
+    cd backend && python benchmarks/serving.py --requests 3000 --threads 16
+
+Two runs of that command on one core (Python 3.11, gunicorn 26.2, so 3
+gthread workers x 4 threads), 2026-10-19:
+
+    server           req/s   p50 ms   p95 ms   p99 ms  errors
+    werkzeug-dev       348    42.10    80.29   108.40       0
+    gunicorn           610    23.38    53.37    68.01       0
+
+    werkzeug-dev       308    48.14    90.56   123.84       0
+    gunicorn           493    27.58    68.83    94.15       0
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load import MIX, one_request, pct, seed  # noqa: E402
+
+SERVERS = {
+    # What `python app.py` runs, minus the reloader's extra process
+    'werkzeug-dev': [sys.executable, '-c',
+                     'import sys; from app import app; app.run(debug=True, port=int(sys.argv[1]), use_reloader=False)'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', 'app:app'],
+}
+
+
+class Response:
+    def __init__(self, status, body):
+        self.status_code = status
+        self.body = body
+
+    def get_json(self):
+        return json.loads(self.body)
+
+
+class HTTPClient:
+    """The slice of Flask's test client that load.py uses, over a keep-alive connection"""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                return Response(resp.status, resp.read())
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, json=None):
+        return self.request('POST', path, json)
+
+
+def start(name, port, workers):
+    env = dict(os.environ, DB_BACKEND='sqlite', ADMISSION_ENABLED='0', GUNICORN_ACCESS_LOG='',
+               SQLITE_PATH=os.path.join(tempfile.mkdtemp(prefix='expense-serving-'), 'serving.sqlite3'),
+               GUNICORN_BIND=f'127.0.0.1:{port}')
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+    command = SERVERS[name] + ([str(port)] if name == 'werkzeug-dev' else [])
+    proc = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = HTTPClient(port)
+    for _ in range(200):
+        try:
+            if client.get('/api/health').status_code == 200:
+                return proc
+        except OSError:
+            client.conn = None
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'{name} did not start on port {port}')
+
+
+def drive(port, names, group_ids, total, threads):
+    mix = [n for n, _ in MIX]
+    weights = [w for _, w in MIX]
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def worker(i):
+        nonlocal errors
+        if not hasattr(local, 'client'):
+            local.client = HTTPClient(port)
+            local.rng = random.Random(i)
+        name = local.rng.choices(mix, weights)[0]
+        started = time.perf_counter()
+        resp = one_request(local.client, name, names, group_ids, local.rng)
+        ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(ms)
+            errors += resp.status_code >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(total)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=['werkzeug-dev', 'gunicorn'])
+    parser.add_argument('--workers', type=int, help='gunicorn workers (default: from gunicorn.conf.py)')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5123)
+    args = parser.parse_args()
+
+    print(f"{'server':<14}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+          f"   ({args.requests} requests, {args.threads} clients, {os.cpu_count()} cores)")
+    for i, name in enumerate(args.servers):
+        port = args.port + i
+        proc = start(name, port, args.workers)
+        try:
+            names, group_ids = seed(HTTPClient(port), int(time.time()), 50, 20, 500)
+            elapsed, latencies, errors = drive(port, names, group_ids, args.requests, args.threads)
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f"{name:<14}{len(latencies) / elapsed:>8,.0f}{statistics.median(latencies):>9.2f}"
+              f"{pct(latencies, 95):>9.2f}{pct(latencies, 99):>9.2f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Storage, write and read cost of per-member split rows against split rules.
+
+For each group size, fills a fresh SQLite database with --expenses equal
+expenses stored both ways: "rows" writes one expense_split row per member
+who owes the payer, as create_expense did before rules; "rule" writes the
+single expense_split_rule row it writes now. Reports the split tables' rows
+and on-disk size (from SQLite's dbstat), the median time to write one
+expense's splits, and the median time of the readers that resolve them:
+pending payments for one member and a group's balances for settlements.
+
+    cd backend && python benchmarks/splits.py --sizes 10 100 500 --expenses 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+def median_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def split_tables_bytes(repo):
+    repo.cur.execute("SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name LIKE %s", ('%expense_split%',))
+    return repo.cur.fetchone()[0]
+
+
+def run(size, expenses, reads, mode):
+    storage.configure('sqlite', os.path.join(tempfile.mkdtemp(prefix='expense-splits-'), 'splits.sqlite3'))
+    run_id = uuid.uuid4().hex[:6]
+    users = [f's{run_id}-u{i}' for i in range(size)]
+    group_id = str(uuid.uuid4())
+    with storage.transaction() as repo:
+        for user in users:
+            repo.create_user(user, 'x')
+        repo.create_group(group_id, 'bench', users[0])
+        repo.update_members(group_id, add=users[1:])
+        repo.cur.execute("SELECT MAX(id) FROM group_members WHERE group_id = %s", (group_id,))
+        member_seq = repo.cur.fetchone()[0]
+        ids = [str(uuid.uuid4()) for _ in range(expenses)]
+        repo.cur.executemany('''
+            INSERT INTO expenses (id, group_id, amount, category, note, date, time, paid_by)
+            VALUES (%s, %s, 40.0, 'dinner', NULL, '2025-06-01', '12:00', %s)
+        ''', [(eid, group_id, users[i % size]) for i, eid in enumerate(ids)])
+
+    share = 40.0 / size
+    writes = []
+    for i, eid in enumerate(ids):
+        paid_by = users[i % size]
+        start = time.perf_counter()
+        with storage.transaction() as repo:
+            if mode == 'rows':
+                repo.cur.executemany(
+                    "INSERT INTO expense_split (expense_id, username, split_amount) VALUES (%s, %s, %s)",
+                    [(eid, user, share) for user in users if user != paid_by]
+                )
+            else:
+                repo.cur.execute('''
+                    INSERT INTO expense_split_rule (expense_id, group_id, paid_by, share, member_seq)
+                    VALUES (%s, %s, %s, %s, %s)
+                ''', (eid, group_id, paid_by, share, member_seq))
+        writes.append((time.perf_counter() - start) * 1000)
+
+    with storage.session() as repo:
+        repo.cur.execute("SELECT (SELECT COUNT(*) FROM expense_split) + (SELECT COUNT(*) FROM expense_split_rule)")
+        rows = repo.cur.fetchone()[0]
+        size_bytes = split_tables_bytes(repo)
+        pending = median_ms(lambda: repo.payment_splits(users[-1]), reads)
+        balances = median_ms(lambda: repo.group_balances(group_id), reads)
+    return rows, size_bytes, statistics.median(writes), pending, balances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--expenses', type=int, default=500)
+    parser.add_argument('--reads', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'members':>8}  {'storage':<8}{'rows':>10}{'split MB':>10}{'write ms':>10}"
+          f"{'pending ms':>12}{'balances ms':>13}   ({args.expenses} expenses)")
+    for size in args.sizes:
+        for mode in ('rows', 'rule'):
+            rows, size_bytes, write, pending, balances = run(size, args.expenses, args.reads, mode)
+            print(f"{size:>8}  {mode:<8}{rows:>10,}{size_bytes / 1e6:>10.2f}{write:>10.3f}"
+                  f"{pending:>12.2f}{balances:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
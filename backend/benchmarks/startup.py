@@ -0,0 +1,61 @@
+"""Worker boot cost: time to import and build the app, and resident memory after.
+
+Each sample runs in a fresh interpreter, the way a gunicorn worker or a test
+process starts. --eager also imports the Vision and HTTP clients up front to
+show what lazy loading saves.
+
+    cd backend && python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, resource, time
+start = time.perf_counter()
+{preload}
+import app
+elapsed = time.perf_counter() - start
+with open('/proc/self/statm') as f:
+    rss_pages = int(f.read().split()[1])
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'rss_mb': rss_pages * resource.getpagesize() / 2**20,
+    'modules': len(__import__('sys').modules),
+}}))
+'''
+
+EAGER = 'from google.cloud import vision; import requests'
+
+
+def sample(preload):
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE.format(preload=preload)],
+        cwd=BACKEND, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(label, preload, runs):
+    samples = [sample(preload) for _ in range(runs)]
+    import_ms = [s['import_ms'] for s in samples]
+    rss = [s['rss_mb'] for s in samples]
+    print(f"{label:<6} import median {statistics.median(import_ms):7.1f} ms  "
+          f"min {min(import_ms):7.1f} ms  rss {statistics.median(rss):6.1f} MB  "
+          f"modules {samples[0]['modules']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--eager', action='store_true', help='also measure with Vision/requests preloaded')
+    args = parser.parse_args()
+
+    report('lazy', '', args.runs)
+    if args.eager:
+        report('eager', EAGER, args.runs)
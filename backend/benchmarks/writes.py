@@ -0,0 +1,117 @@
+"""Database round trips and latency of each write endpoint's repository call.
+
+Wraps the repository cursor so every statement is counted and, to model a
+database across the network, followed by --rtt-ms of sleep; the commit
+counts as one more round trip. Runs each write --runs times against a fresh
+SQLite database and reports statements per write and latency percentiles.
+
+    cd backend && python benchmarks/writes.py --rtt-ms 0.5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+class CountingCursor:
+    """Cursor proxy that counts execute/executemany calls and adds a round trip delay"""
+
+    def __init__(self, cursor, rtt):
+        self._cursor = cursor
+        self.rtt = rtt
+        self.statements = 0
+
+    def _round_trip(self):
+        self.statements += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def execute(self, *args):
+        self._round_trip()
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        # pymysql sends a multi-row INSERT ... VALUES as one statement
+        self._round_trip()
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def timed_write(rtt, fn):
+    start = time.perf_counter()
+    with storage.transaction() as repo:
+        repo.cur = CountingCursor(repo.cur, rtt)
+        fn(repo)
+        statements = repo.cur.statements + 1
+        if rtt:
+            time.sleep(rtt)
+    return statements, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--members', type=int, default=4)
+    parser.add_argument('--rtt-ms', type=float, default=0.5)
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    storage.configure('sqlite', os.path.join(tempfile.mkdtemp(prefix='expense-writes-'), 'writes.sqlite3'))
+    run = uuid.uuid4().hex[:6]
+    users = [f'w{run}-u{i}' for i in range(args.members)]
+    with storage.transaction() as repo:
+        for user in users:
+            repo.create_user(user, 'x')
+
+    state = {'groups': [], 'expenses': []}
+
+    def create_group(repo):
+        gid = str(uuid.uuid4())
+        repo.create_group(gid, 'bench', users[0])
+        state['groups'].append(gid)
+
+    def add_member(repo):
+        gid = state['groups'][state.setdefault('member_i', 0) // (args.members - 1)]
+        repo.add_member(gid, users[1 + state['member_i'] % (args.members - 1)])
+        state['member_i'] += 1
+
+    def create_expense(repo):
+        eid = str(uuid.uuid4())
+        repo.create_expense(eid, state['groups'][len(state['expenses']) % args.runs], 'dinner', 40.0,
+                            '2025-06-01', users[0], None)
+        state['expenses'].append(eid)
+
+    def make_payment(repo):
+        eid = state['expenses'][state.setdefault('pay_i', 0)]
+        repo.make_payment(eid, users[1], 10.0)
+        state['pay_i'] += 1
+
+    writes = (
+        ('create_group', create_group, args.runs),
+        ('add_member', add_member, args.runs * (args.members - 1)),
+        ('create_expense', create_expense, args.runs),
+        ('make_payment', make_payment, args.runs),
+    )
+    print(f"{'write':<16}{'round trips':>12}{'p50 ms':>9}{'p95 ms':>9}   (rtt {args.rtt_ms} ms)")
+    for name, fn, runs in writes:
+        counts, timings = [], []
+        for _ in range(runs):
+            statements, ms = timed_write(rtt, fn)
+            counts.append(statements)
+            timings.append(ms)
+        timings.sort()
+        print(f"{name:<16}{statistics.mean(counts):>12.1f}{statistics.median(timings):>9.2f}"
+              f"{timings[int(len(timings) * 0.95) - 1]:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
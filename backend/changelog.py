@@ -0,0 +1,27 @@
+"""Append-only change log behind /api/sync.
+
+Repository writes record one row per changed entity inside their transaction
+(Repository.record_change). Just before that transaction commits, its rows
+are numbered from a counter whose row stays locked until the commit
+(Repository.sequence_changes), so seq order is commit order, and the seq is
+the client's sync cursor. The auto-increment id is not: ids are taken at
+INSERT, and a lower id committed late would be skipped by a client already
+past it. Old rows are compacted away; the highest compacted seq is kept as a
+floor, and a cursor below that floor can no longer be replayed, so the
+client must full-resync.
+"""
+import os
+import sys
+
+RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', '30'))
+
+
+if __name__ == '__main__':
+    import storage
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else RETENTION_DAYS
+    removed = 0
+    for database in storage.get_database().databases():
+        with database.transaction() as repo:
+            removed += repo.compact_changes(days)
+    print(f"Compacted {removed} change log entries older than {days} days")
@@ -0,0 +1,89 @@
+"""Lazily created clients for external services.
+
+google.cloud.vision pulls in gRPC and protobuf, and requests is only needed
+by the AI summary. Importing either at module level made every worker and
+test process pay for them at boot, so both are imported on first use and the
+client objects are cached for the life of the process.
+
+Under gunicorn (gunicorn.conf.py) the master imports the libraries once with
+preload_modules(), so workers share that memory copy-on-write, and each
+worker calls reset() and create_clients() after the fork: gRPC channels and
+pooled TLS sockets must not be shared between processes.
+"""
+import importlib
+import json
+import os
+import threading
+
+_lock = threading.Lock()
+_vision_client = None
+_llm_session = None
+
+#----------------------- Google Vision Client -----------------------
+
+def _create_vision_client():
+    from google.cloud import vision
+
+    key_json = os.getenv("GOOGLE_VISION_CREDENTIALS_JSON")
+    if key_json:
+        try:
+            info = json.loads(key_json)
+            return vision.ImageAnnotatorClient.from_service_account_info(info)
+        except Exception as e:
+            # If malformed JSON, log and continue to file fallback
+            print("Error loading Vision credentials from env:", e)
+
+    # 2) Fallback: use a file path (works locally)
+    key_path = os.getenv("GOOGLE_VISION_KEY_PATH", "./google-vision-key.json")
+    if not os.path.exists(key_path):
+        print(f"Key file not found at: {key_path}")
+        print(f"Current directory: {os.getcwd()}")
+        print(f"Files in current directory: {os.listdir('.')}")
+        raise FileNotFoundError(f"Google Vision key file not found at {key_path}")
+    return vision.ImageAnnotatorClient.from_service_account_file(key_path)
+
+def get_vision_client():
+    global _vision_client
+    if _vision_client is None:
+        with _lock:
+            if _vision_client is None:
+                _vision_client = _create_vision_client()
+    return _vision_client
+
+#----------------------- LLM HTTP Session -----------------------
+
+def get_llm_session():
+    """Shared requests session so AI calls reuse the TLS connection to the provider"""
+    global _llm_session
+    if _llm_session is None:
+        with _lock:
+            if _llm_session is None:
+                import requests
+                _llm_session = requests.Session()
+    return _llm_session
+
+def reset():
+    """Forget cached clients, e.g. in a freshly forked worker"""
+    global _vision_client, _llm_session
+    with _lock:
+        _vision_client = None
+        _llm_session = None
+
+def preload_modules():
+    """Import the client libraries without creating any client"""
+    for name in ('google.cloud.vision', 'requests'):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+def create_clients():
+    """Create the clients now instead of on first use; Vision only if credentials are configured"""
+    get_llm_session()
+    if os.getenv("GOOGLE_VISION_CREDENTIALS_JSON") or os.path.exists(
+            os.getenv("GOOGLE_VISION_KEY_PATH", "./google-vision-key.json")):
+        try:
+            get_vision_client()
+        except Exception as e:
+            # Left to the first receipt scan, which reports the error to its caller
+            print("Vision client not created, retrying on first use:", e)
@@ -0,0 +1,72 @@
+"""Read-your-writes that holds across worker processes.
+
+expenseDB.ReadRouter keeps the scopes a transaction wrote on the primary for
+DB_READ_YOUR_WRITES_SECONDS, but only in the worker that made the write.
+Under gunicorn's several workers the client's next read may land on another
+one, and from there on a replica that has not caught up yet.
+
+So the client carries the pin. The response to a request that committed a
+write sets the read_primary_until cookie and X-Read-Primary-Until header to
+the Unix time until which the client's reads should go to the primary. A
+request that brings either back, unexpired, reads everything from the
+primary, whichever worker serves it.
+
+Browsers send the cookie only to the same site, or cross-site with
+credentials: 'include' on a SameSite=None cookie, which this is not. A
+cross-origin client keeps read-your-writes by echoing the header on its
+next requests. One that does neither has only the per-worker pins.
+"""
+import contextvars
+import math
+import os
+import time
+
+from flask import g, request
+
+SECONDS = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '5'))
+COOKIE = 'read_primary_until'
+HEADER = 'X-Read-Primary-Until'
+
+_primary = contextvars.ContextVar('read_primary', default=False)
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def reads_from_primary():
+    """Whether the current request's client wrote moments ago, so must not read from a replica"""
+    return _primary.get()
+
+
+def committed():
+    """Record that the current request committed a write (storage.Database.transaction)"""
+    _wrote.set(True)
+
+
+def _until():
+    raw = request.headers.get(HEADER) or request.cookies.get(COOKIE)
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def init_app(app):
+    @app.before_request
+    def _restore_pin():
+        now = time.time()
+        # Anything later than one window from now was not set by us
+        g.consistency_tokens = (_primary.set(now < _until() <= now + SECONDS), _wrote.set(False))
+
+    @app.after_request
+    def _carry_pin(response):
+        if _wrote.get():
+            until = f'{time.time() + SECONDS:.3f}'
+            response.set_cookie(COOKIE, until, max_age=math.ceil(SECONDS), httponly=True, samesite='Lax')
+            response.headers[HEADER] = until
+        return response
+
+    @app.teardown_request
+    def _forget_pin(exc=None):
+        tokens = g.pop('consistency_tokens', None)
+        if tokens:
+            _primary.reset(tokens[0])
+            _wrote.reset(tokens[1])
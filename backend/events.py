@@ -0,0 +1,86 @@
+"""In-process pub/sub for the /api/stream change feed.
+
+Write endpoints publish compact change events onto channels named
+``group:<id>`` and ``user:<username>``; stream handlers wait on the bus and
+forward whatever matches their channels. Events are kept in a bounded ring so
+a reconnecting client can resume from its Last-Event-ID.
+
+The bus lives in process memory, so each worker only sees the writes it
+handled itself.
+"""
+import itertools
+import os
+import threading
+import uuid
+from collections import deque, namedtuple
+
+Event = namedtuple('Event', 'seq id type channels data')
+
+
+class EventBus:
+    def __init__(self, history=1000):
+        # Event ids are "<boot>-<seq>" so ids handed out before a restart are
+        # recognised as foreign instead of being matched against new sequence numbers.
+        self.boot = uuid.uuid4().hex[:8]
+        self._seq = itertools.count(1)
+        self._events = deque(maxlen=history)
+        self._cond = threading.Condition()
+
+    def after_fork(self):
+        """New boot id and empty ring for a forked worker, whose events are its own"""
+        with self._cond:
+            self.boot = uuid.uuid4().hex[:8]
+            self._seq = itertools.count(1)
+            self._events.clear()
+
+    def publish(self, channels, event_type, data):
+        """Append an event for the given channels and wake up waiting streams"""
+        with self._cond:
+            seq = next(self._seq)
+            event = Event(seq, f'{self.boot}-{seq}', event_type, frozenset(channels), data)
+            self._events.append(event)
+            self._cond.notify_all()
+        return event
+
+    @property
+    def last_seq(self):
+        with self._cond:
+            return self._events[-1].seq if self._events else 0
+
+    def parse_event_id(self, event_id):
+        """Map a Last-Event-ID back to a local sequence number.
+
+        Returns None when the id was issued by another process or boot, in which
+        case the client has to re-fetch its lists.
+        """
+        boot, _, seq = (event_id or '').partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq, channels):
+        """Return (events, last_seq, complete) for events after seq on any of channels.
+
+        last_seq is the newest sequence number the caller has now been shown,
+        matching or not. complete is False when the ring has already dropped
+        events the caller has not seen yet.
+        """
+        with self._cond:
+            return self._since(seq, channels)
+
+    def wait(self, seq, channels, timeout):
+        """Block until there are events after seq or timeout expires"""
+        with self._cond:
+            if not self._events or self._events[-1].seq <= seq:
+                self._cond.wait(timeout)
+            return self._since(seq, channels)
+
+    def _since(self, seq, channels):
+        if not self._events:
+            return [], seq, True
+        complete = self._events[0].seq <= seq + 1
+        events = [e for e in self._events if e.seq > seq and not e.channels.isdisjoint(channels)]
+        return events, max(seq, self._events[-1].seq), complete
+
+
+bus = EventBus(history=int(os.getenv('STREAM_HISTORY', '1000')))
@@ -0,0 +1,94 @@
+"""In-process cache of which usernames, group ids and memberships exist.
+
+Users and groups are never deleted, so a positive answer about them stays
+true: it is kept until it is evicted, least recently used first, once the
+cache holds EXISTENCE_CACHE_SIZE entries. Members can be removed
+(POST /api/groups/members), so a positive membership expires after
+EXISTENCE_MEMBER_TTL seconds. A negative answer can be made stale by a
+write in another worker, so it expires after EXISTENCE_NEGATIVE_TTL
+seconds. Both default to 5 seconds.
+
+Nothing tells the other workers about a write: for up to those 5 seconds
+after a member is removed, or a user, group or member is added, through one
+worker, another may still act on the old answer, e.g. accept an expense
+paid by the removed member or answer 409 for the new one. Lower the TTLs
+(or set EXISTENCE_CACHE_SIZE=0) if that window matters more than the
+queries it saves. Writes in this process forget an answer as soon as they insert or
+delete the row, and record the positive one when their transaction commits
+(Database.transaction), never before, so a rolled back write is not
+remembered.
+
+Lookups are counted by kind and result (hit, negative_hit, miss) in
+/api/metrics. EXISTENCE_CACHE_SIZE=0 turns the cache off.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+KINDS = ('user', 'group', 'member')
+
+lookups = metrics.counter('existence_cache_lookups_total', 'Existence checks by kind and result',
+                          ('kind', 'result'))
+entries = metrics.gauge('existence_cache_entries', 'Entries held by the existence cache')
+
+
+class ExistenceCache:
+    def __init__(self, max_entries, negative_ttl, positive_ttls=None):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        # kind -> seconds a positive answer is trusted; kinds not listed never expire
+        self.positive_ttls = positive_ttls or {}
+        # (kind, key) -> (exists, monotonic expiry or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, key):
+        """True or False if the answer is known, else None"""
+        if not self.max_entries:
+            return None
+        with self._lock:
+            exists, expires = self._entries.get((kind, key), (None, None))
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[(kind, key)]
+                exists = None
+            elif exists:
+                self._entries.move_to_end((kind, key))
+        if exists is None:
+            lookups.inc(kind=kind, result='miss')
+            return None
+        lookups.inc(kind=kind, result='hit' if exists else 'negative_hit')
+        return exists
+
+    def put(self, kind, key, exists):
+        if not self.max_entries:
+            return
+        ttl = self.positive_ttls.get(kind) if exists else self.negative_ttl
+        with self._lock:
+            self._entries[(kind, key)] = (exists, None if ttl is None else time.monotonic() + ttl)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            entries.set(len(self._entries))
+
+    def remember(self, found):
+        """Record (kind, key) pairs that now exist"""
+        for kind, key in found:
+            self.put(kind, key, True)
+
+    def forget(self, kind, key):
+        with self._lock:
+            self._entries.pop((kind, key), None)
+            entries.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            entries.set(0)
+
+
+cache = ExistenceCache(int(os.getenv('EXISTENCE_CACHE_SIZE', '100000')),
+                       float(os.getenv('EXISTENCE_NEGATIVE_TTL', '5')),
+                       {'member': float(os.getenv('EXISTENCE_MEMBER_TTL', '5'))})
@@ -1,20 +1,312 @@
+import bisect
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
 import pymysql
 
-db_host = 'expensetrackerdb.cha46q8mu6lt.us-east-2.rds.amazonaws.com'
-db_user = 'admin'
-db_password = 'Chirag#13'
-db_name = 'expense_tracker'
+import consistency
 
+db_host = os.getenv('DB_HOST', 'expensetrackerdb.cha46q8mu6lt.us-east-2.rds.amazonaws.com')
+db_user = os.getenv('DB_USER', 'admin')
+db_password = os.getenv('DB_PASSWORD', 'Chirag#13')
+db_name = os.getenv('DB_NAME', 'expense_tracker')
 
-def get_connection():
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Idle connections older than this are pinged before being handed out
+POOL_PING_AFTER = 30
+
+# Read replicas as 'host[:port]' entries, e.g. DB_REPLICAS=10.0.0.5,10.0.0.6:3307
+DB_REPLICAS = [h.strip() for h in os.getenv('DB_REPLICAS', '').split(',') if h.strip()]
+# A replica that fails to hand out a connection is skipped for this long
+REPLICA_EJECT_SECONDS = float(os.getenv('DB_REPLICA_EJECT_SECONDS', '30'))
+# After a write, reads for the same user/group stay on the primary this long
+READ_YOUR_WRITES_SECONDS = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '5'))
+
+# Shard primaries as 'host[:port][/database]' entries, e.g.
+# DB_SHARDS=10.0.1.5,10.0.1.6:3307/expense_b. Groups are spread over them by
+# ShardRouter; the first is the home shard. Empty means one unsharded database.
+DB_SHARDS = [h.strip() for h in os.getenv('DB_SHARDS', '').split(',') if h.strip()]
+# Points per shard on the consistent-hash ring
+SHARD_VNODES = int(os.getenv('DB_SHARD_VNODES', '64'))
+# How long a worker trusts its copy of the group_shards directory
+SHARD_DIRECTORY_SECONDS = float(os.getenv('DB_SHARD_DIRECTORY_SECONDS', '30'))
+
+
+def connect(host=None, port=3306, database=None):
     connection = pymysql.connect(
-        host=db_host,
+        host=host or db_host,
+        port=port,
         user=db_user,
         password=db_password,
-        database=db_name
+        database=database or db_name
                 )
     return connection
 
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Wraps a pymysql connection; close() returns it to the pool instead of the socket."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def discard(self):
+        """Close the underlying socket, e.g. when an unbuffered result was abandoned"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.discard(raw)
+
+
+class ConnectionPool:
+    def __init__(self, connect, size, timeout):
+        self._connect = connect
+        self._size = size
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def acquire(self):
+        try:
+            raw, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self._size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return PooledConnection(self, self._connect())
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                raw, last_used = self._idle.get(timeout=self._timeout)
+            except queue.Empty:
+                raise PoolTimeout(f'No database connection available after {self._timeout}s')
+
+        if time.monotonic() - last_used > POOL_PING_AFTER:
+            try:
+                raw.ping(reconnect=True)
+            except Exception:
+                self.discard(raw)
+                raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        try:
+            # Drop whatever the caller left uncommitted and end the snapshot
+            raw.rollback()
+        except Exception:
+            self.discard(raw)
+            return
+        self._idle.put((raw, time.monotonic()))
+
+    def discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @property
+    def in_use(self):
+        return self._created - self._idle.qsize()
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.ejected_until = 0.0
+
+
+class ReadRouter:
+    """Sends read-intent connections to replicas and everything else to the primary.
+
+    Replicas are picked by power-of-two-choices on connections in use. One
+    that fails to connect is ejected for eject_seconds and the read retries
+    elsewhere, ending on the primary. Keys pinned by pin() (scope tuples such
+    as ('user', name)) read from the primary for pin_seconds, so a client
+    sees its own writes despite replication lag. Those pins are kept in this
+    process only; consistency.py carries them to the other workers with the
+    client.
+    """
+
+    def __init__(self, primary, replicas, eject_seconds, pin_seconds):
+        self.primary = primary
+        self.replicas = replicas
+        self.eject_seconds = eject_seconds
+        self.pin_seconds = pin_seconds
+        self._pins = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, intent='write', pin=None):
+        pinned = self.is_pinned(pin) or consistency.reads_from_primary()
+        if intent == 'read' and self.replicas and not pinned:
+            candidates = self.healthy()
+            while candidates:
+                replica = self._choose(candidates)
+                candidates.remove(replica)
+                try:
+                    return replica.pool.acquire()
+                except PoolTimeout:
+                    pass                    # busy, not broken
+                except Exception:
+                    self.eject(replica)
+        return self.primary.acquire()
+
+    def _choose(self, candidates):
+        if len(candidates) == 1:
+            return candidates[0]
+        a, b = random.sample(candidates, 2)
+        return a if a.pool.in_use <= b.pool.in_use else b
+
+    def healthy(self):
+        now = time.monotonic()
+        return [r for r in self.replicas if r.ejected_until <= now]
+
+    def eject(self, replica):
+        replica.ejected_until = time.monotonic() + self.eject_seconds
+
+    def pin(self, keys):
+        until = time.monotonic() + self.pin_seconds
+        with self._lock:
+            for key in keys:
+                self._pins[key] = until
+            if len(self._pins) > 10000:
+                now = time.monotonic()
+                self._pins = {k: t for k, t in self._pins.items() if t > now}
+
+    def is_pinned(self, key):
+        return key is not None and self._pins.get(key, 0.0) > time.monotonic()
+
+
+def _replica(entry):
+    host, _, port = entry.partition(':')
+    port = int(port or 3306)
+    return Replica(entry, ConnectionPool(lambda: connect(host, port), POOL_SIZE, POOL_TIMEOUT))
+
+
+def _shard(entry):
+    address, _, database = entry.partition('/')
+    host, _, port = address.partition(':')
+    port = int(port or 3306)
+    shard_pool = ConnectionPool(lambda: connect(host, port, database or None), POOL_SIZE, POOL_TIMEOUT)
+    return ReadRouter(shard_pool, [], REPLICA_EJECT_SECONDS, READ_YOUR_WRITES_SECONDS)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class ShardRouter:
+    """Maps a group id to the name of the shard that holds the group.
+
+    Groups are placed on a consistent-hash ring with `vnodes` points per
+    shard, so adding a shard to N others moves about 1/(N+1) of the groups
+    and leaves the rest where they are. The directory, {group id: shard}
+    as returned by `load` (the group_shards table), overrides the ring for
+    groups moved by hand; it is re-read after `ttl` seconds, so every worker
+    follows a move within that long.
+    """
+
+    def __init__(self, shards, vnodes=SHARD_VNODES, load=None, ttl=SHARD_DIRECTORY_SECONDS):
+        if not shards:
+            raise ValueError('ShardRouter needs at least one shard')
+        self.shards = list(shards)
+        points = sorted((_hash(f'{shard}#{i}'), shard) for shard in self.shards for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+        self._load = load
+        self._ttl = ttl
+        self._directory = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def ring_shard(self, group_id):
+        """The shard the ring alone assigns the group to"""
+        i = bisect.bisect(self._points, _hash(group_id)) % len(self._points)
+        return self._owners[i]
+
+    def shard_for(self, group_id):
+        shard = self.directory().get(group_id)
+        return shard if shard in self.shards else self.ring_shard(group_id)
+
+    def directory(self):
+        if self._load is None:
+            return self._directory
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at >= self._ttl:
+                self._directory = dict(self._load())
+                self._loaded_at = now
+            return self._directory
+
+    def refresh(self):
+        """Re-read the directory on the next lookup"""
+        with self._lock:
+            self._loaded_at = None
+
+
+pool = ConnectionPool(connect, POOL_SIZE, POOL_TIMEOUT)
+router = ReadRouter(pool, [_replica(entry) for entry in DB_REPLICAS],
+                    REPLICA_EJECT_SECONDS, READ_YOUR_WRITES_SECONDS)
+# Shard entry -> ReadRouter over that shard's primary, created on first use
+shard_routers = {}
+_shard_lock = threading.Lock()
+
+
+def shard_router(shard):
+    with _shard_lock:
+        if shard not in shard_routers:
+            shard_routers[shard] = _shard(shard)
+        return shard_routers[shard]
+
+
+def reset_pools():
+    """Start over with empty pools, e.g. in a freshly forked worker.
+
+    Connections inherited from the parent are dropped without being closed:
+    closing one would end the parent's MySQL session on the shared socket.
+    """
+    global pool, router, shard_routers
+    pool = ConnectionPool(connect, POOL_SIZE, POOL_TIMEOUT)
+    router = ReadRouter(pool, [_replica(entry) for entry in DB_REPLICAS],
+                        REPLICA_EJECT_SECONDS, READ_YOUR_WRITES_SECONDS)
+    shard_routers = {}
+
+
+def get_connection(intent='write', pin=None, shard=None):
+    """Pooled connection; intent='read' may be served by a replica unless pin is pinned.
+
+    With `shard` (a DB_SHARDS entry) the connection is to that shard's primary.
+    """
+    return (shard_router(shard) if shard else router).acquire(intent, pin)
+
+
+def pin_primary(*keys, shard=None):
+    """Keep reads for these keys on the primary for READ_YOUR_WRITES_SECONDS"""
+    (shard_router(shard) if shard else router).pin(keys)
+
 '''# expenseDB.py
 import os
 import pymysql
@@ -32,4 +324,4 @@ def get_connection():
         database=db_name
     )
     return connection
-'''
\ No newline at end of file
+'''
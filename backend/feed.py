@@ -0,0 +1,40 @@
+"""Per-user activity feed behind /api/expenses/recent and /api/activity.
+
+Fan-out on write: creating an expense or recording a payment inserts one
+activity_feed row for every member of the group, in the same transaction,
+with everything a feed item shows copied in. Reading a user's recent
+activity is then a single range scan of the (username, kind, date) index
+instead of joining expenses, groups and memberships and sorting the lot. A
+member who joins a group is given its latest expenses; deleting an expense
+removes its items from every feed.
+
+Each user keeps the newest RETENTION items of each kind. Feeds are trimmed
+on write for one fan-out in TRIM_EVERY (so the cost is amortized), and can
+be rebuilt from expenses and payments or trimmed in full with:
+
+    python feed.py rebuild
+    python feed.py trim [retention]
+"""
+import os
+import sys
+
+RETENTION = int(os.getenv('FEED_RETENTION', '200'))
+TRIM_EVERY = int(os.getenv('FEED_TRIM_EVERY', '20'))
+KINDS = ('expense', 'payment')
+
+
+if __name__ == '__main__':
+    import storage
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'rebuild'
+    keep = int(sys.argv[2]) if len(sys.argv) > 2 else RETENTION
+    if command not in ('rebuild', 'trim'):
+        sys.exit('usage: python feed.py rebuild|trim [retention]')
+    total = 0
+    for database in storage.get_database().databases():
+        with database.transaction() as repo:
+            total += repo.rebuild_feed(keep) if command == 'rebuild' else repo.trim_feed(keep)
+    if command == 'rebuild':
+        print(f"Rebuilt activity feeds: {total} items")
+    else:
+        print(f"Trimmed {total} feed items beyond the newest {keep} per user")
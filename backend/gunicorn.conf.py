@@ -0,0 +1,119 @@
+"""Production server: gunicorn with pre-forked threaded workers.
+
+    cd backend && gunicorn app:app
+
+gunicorn reads this file from the working directory. `python app.py` is the
+single-process Werkzeug development server and is for local use only.
+
+- Workers: GUNICORN_WORKERS, else 2 x usable cores + 1, each running
+  GUNICORN_THREADS request threads (gthread), so /api/stream's long-lived
+  event streams do not each hold a whole process.
+- The /api/stream event bus (events.py) lives in each worker's memory: a
+  stream only hears of the writes handled by its own worker. Clients that
+  depend on it must poll /api/sync as well, or the server must run with
+  GUNICORN_WORKERS=1 (and more threads) until the bus is shared.
+- The app is imported once in the master (preload_app) along with the OCR
+  and HTTP client libraries, so workers share that memory copy-on-write.
+  After the fork each worker builds its own database pools, Vision and LLM
+  clients and event bus (post_fork): sockets, gRPC channels and SQLite
+  handles must not be shared between processes.
+- Request timeouts: a request running longer than GUNICORN_TIMEOUT seconds
+  (other than those for views marked @long_running in routes/common.py:
+  the event and AI summary streams and the exports) makes its worker stop
+  accepting connections, finish its other requests within
+  GUNICORN_GRACEFUL_TIMEOUT and be replaced. A worker that stops responding
+  altogether is killed by the master after GUNICORN_TIMEOUT.
+- Graceful reload: `kill -HUP <master>` starts fresh workers with this file
+  re-read and retires the old ones once they finish their requests. With
+  preload_app, new application code needs a new master: `kill -USR2
+  <master>` starts one next to the old, then `kill -TERM <old master>`.
+  The master's pid is in GUNICORN_PIDFILE.
+
+benchmarks/serving.py compares throughput with the development server.
+"""
+import os
+import signal
+import threading
+import time
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('GUNICORN_WORKERS', '0')) or 2 * _cores() + 1
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# Recycle workers now and then, at staggered times, so slow leaks cannot build up
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+
+pidfile = os.getenv('GUNICORN_PIDFILE') or None
+# GUNICORN_ACCESS_LOG= (empty) turns the access log off
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    import clients
+    clients.preload_modules()
+
+
+def post_fork(server, worker):
+    import clients
+    import storage
+    from events import bus
+
+    storage.after_fork()
+    bus.after_fork()
+    clients.reset()
+    clients.create_clients()
+
+    # worker.app is gunicorn's Application, which the worker loads the WSGI app from
+    from app import app
+    worker.flask_app = app
+    worker.routes = app.url_map.bind('localhost')
+    worker.inflight = {}
+    threading.Thread(target=_watch_requests, args=(worker,), daemon=True,
+                     name='request-timeout').start()
+
+
+def _long_running(worker, req):
+    """Whether the request is for a view marked @long_running (routes/common.py)"""
+    try:
+        endpoint, _ = worker.routes.match(req.path, method=req.method)
+    except Exception:
+        # Not found, wrong method or a redirect: answered at once
+        return False
+    return getattr(worker.flask_app.view_functions.get(endpoint), 'long_running', False)
+
+
+def pre_request(worker, req):
+    if not _long_running(worker, req):
+        worker.inflight[threading.get_ident()] = (req.method, req.path, time.monotonic())
+
+
+def post_request(worker, req, environ, resp):
+    worker.inflight.pop(threading.get_ident(), None)
+
+
+def _watch_requests(worker):
+    """Retire the worker once any of its requests has run past the timeout"""
+    while True:
+        time.sleep(1)
+        now = time.monotonic()
+        for method, path, started in list(worker.inflight.values()):
+            if now - started > timeout:
+                worker.log.error('%s %s still running after %ds; replacing worker %s',
+                                 method, path, timeout, worker.pid)
+                os.kill(worker.pid, signal.SIGTERM)
+                return
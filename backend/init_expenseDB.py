@@ -1,7 +1,7 @@
-from expenseDB import get_connection
+from expenseDB import DB_SHARDS, get_connection
 
-def create_tables():
-    conn = get_connection()
+def create_tables(shard=None):
+    conn = get_connection(shard=shard)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -28,7 +28,8 @@ def create_tables():
             group_id VARCHAR(36) NOT NULL,
             username VARCHAR(80) NOT NULL,
             FOREIGN KEY (group_id) REFERENCES `groups`(id),
-            FOREIGN KEY (username) REFERENCES users(username)
+            FOREIGN KEY (username) REFERENCES users(username),
+            UNIQUE KEY unique_member (group_id, username)
         )
     ''')
     
@@ -59,6 +60,20 @@ def create_tables():
             )
     ''')
 
+    # Equal splits as one rule row per expense (see splits.py); expense_split
+    # then only holds the members whose share differs from the rule
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expense_split_rule (
+        expense_id VARCHAR(36) PRIMARY KEY,
+        group_id VARCHAR(36) NOT NULL,
+        paid_by VARCHAR(80) NOT NULL,
+        share FLOAT NOT NULL,
+        member_seq INT NOT NULL,
+        FOREIGN KEY (expense_id) REFERENCES expenses(id),
+        INDEX idx_expense_split_rule_group (group_id, member_seq)
+            )
+    ''')
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS payments (
         id INT AUTO_INCREMENT PRIMARY KEY,
@@ -74,6 +89,144 @@ def create_tables():
             )
     ''')
 
+    # Inverted index behind /api/expenses/search (see search.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expense_terms (
+        term VARCHAR(64) NOT NULL,
+        group_id VARCHAR(36) NOT NULL,
+        expense_id VARCHAR(36) NOT NULL,
+        weight SMALLINT NOT NULL,
+        PRIMARY KEY (group_id, term, expense_id),
+        INDEX idx_expense_terms_expense (expense_id)
+            )
+    ''')
+
+    # Per-group daily spend behind /api/analytics/timeseries (see rollups.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_spend (
+        group_id VARCHAR(36) NOT NULL,
+        day VARCHAR(10) NOT NULL,
+        paid_by VARCHAR(80) NOT NULL,
+        total DOUBLE NOT NULL DEFAULT 0,
+        expenses INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (group_id, day, paid_by)
+            )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_category_spend (
+        group_id VARCHAR(36) NOT NULL,
+        day VARCHAR(10) NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        total DOUBLE NOT NULL DEFAULT 0,
+        expenses INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (group_id, day, category)
+            )
+    ''')
+
+    # Pairwise balances behind /api/balances (see ledger.py); each pair is
+    # stored in both orientations so either side is one primary-key range
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+        debtor VARCHAR(80) NOT NULL,
+        creditor VARCHAR(80) NOT NULL,
+        group_id VARCHAR(36) NOT NULL,
+        amount DOUBLE NOT NULL DEFAULT 0,
+        PRIMARY KEY (debtor, creditor, group_id)
+            )
+    ''')
+
+    # Version counters behind the ETags on list endpoints
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS entity_versions (
+        kind VARCHAR(10) NOT NULL,
+        entity_id VARCHAR(80) NOT NULL,
+        version BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, entity_id)
+            )
+    ''')
+
+    # Journal and periodic per-group snapshots of the ledger behind ?asOf=
+    # (see snapshots.py); ledger_heads counts the writes since the last one
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_entries (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        group_id VARCHAR(36) NOT NULL,
+        debtor VARCHAR(80) NOT NULL,
+        creditor VARCHAR(80) NOT NULL,
+        amount DOUBLE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_ledger_entries_group (group_id, id)
+            )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_snapshots (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        group_id VARCHAR(36) NOT NULL,
+        taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_entry BIGINT NOT NULL,
+        is_floor TINYINT NOT NULL DEFAULT 0,
+        balances MEDIUMTEXT NOT NULL,
+        INDEX idx_ledger_snapshots_group (group_id, taken_at)
+            )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_heads (
+        group_id VARCHAR(36) PRIMARY KEY,
+        pending INT NOT NULL DEFAULT 0,
+        snapshot_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+    ''')
+
+    # Change log behind /api/sync; the seq, numbered in commit order just
+    # before each write commits, is the client's cursor
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        seq BIGINT NULL,
+        group_id VARCHAR(36) NOT NULL,
+        entity VARCHAR(20) NOT NULL,
+        entity_id VARCHAR(120) NOT NULL,
+        op VARCHAR(10) NOT NULL,
+        payload TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE INDEX idx_change_log_seq (seq),
+        INDEX idx_change_log_group (group_id, id),
+        INDEX idx_change_log_created (created_at)
+            )
+    ''')
+
+    # Per-user activity feed behind /api/expenses/recent (see feed.py); rows
+    # are fanned out to every member on write so a read is one range scan
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_feed (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(80) NOT NULL,
+        kind VARCHAR(10) NOT NULL,
+        ref_id VARCHAR(36) NOT NULL,
+        group_id VARCHAR(36) NOT NULL,
+        group_name VARCHAR(120),
+        actor VARCHAR(80) NOT NULL,
+        title VARCHAR(50),
+        note VARCHAR(255),
+        amount FLOAT NOT NULL,
+        date VARCHAR(10) NOT NULL,
+        INDEX idx_activity_feed_user (username, kind, date, id),
+        INDEX idx_activity_feed_ref (ref_id)
+            )
+    ''')
+
+    # Groups moved off their consistent-hash shard (see shards.py); only the
+    # home shard's copy is read
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS group_shards (
+        group_id VARCHAR(36) PRIMARY KEY,
+        shard VARCHAR(255) NOT NULL
+            )
+    ''')
+
 #Add status column to expenses table to track if fully paid
     cursor.execute( '''
         ALTER TABLE expenses 
@@ -86,11 +239,41 @@ def create_tables():
     CREATE INDEX IF NOT EXISTS idx_expense_status ON expenses(status);
     CREATE INDEX IF NOT EXISTS idx_payment_expense ON payments(expense_id);
     ''')
+
+    # Memberships are unique so add_member can rely on the key instead of a
+    # SELECT; drop duplicates left by the old check-then-insert first
+    cursor.execute('''
+        DELETE dup FROM group_members dup
+        JOIN group_members kept
+          ON kept.group_id = dup.group_id AND kept.username = dup.username AND kept.id < dup.id
+    ''')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS unique_member ON group_members(group_id, username);
+    ''')
+
+    # The sync cursor used to be the change id; number older rows by it so
+    # cursors clients already hold stay valid, and start the counter above them
+    cursor.execute('''
+        ALTER TABLE change_log
+        ADD COLUMN IF NOT EXISTS seq BIGINT NULL
+    ''')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_seq ON change_log(seq);
+    ''')
+    cursor.execute("SELECT 1 FROM entity_versions WHERE kind = 'changelog' AND entity_id = 'seq'")
+    if cursor.fetchone() is None:
+        cursor.execute("UPDATE change_log SET seq = id WHERE seq IS NULL")
+        cursor.execute('''
+            INSERT INTO entity_versions (kind, entity_id, version)
+            SELECT 'changelog', 'seq', COALESCE(MAX(seq), 0) FROM change_log
+        ''')
     
     conn.commit()
     cursor.close()
     conn.close()
-    print("Tables created successfully!")
+    print(f"Tables created successfully{f' on {shard}' if shard else ''}!")
 
 if __name__ == '__main__':
-    create_tables()
\ No newline at end of file
+    # Every shard holds the full schema
+    for shard in DB_SHARDS or [None]:
+        create_tables(shard)
\ No newline at end of file
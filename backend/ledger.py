@@ -0,0 +1,40 @@
+"""Pairwise balance ledger behind /api/balances.
+
+balance_ledger holds, per group, how much each debtor owes each creditor.
+Every pair is stored twice with opposite signs, so all of one user's
+balances are a single primary-key range. create_expense adds the splits,
+make_payment subtracts the payment, and delete_expense takes back whatever
+was still owed, all in the same transaction as the write itself. A payment
+counts only against its payer's split on the expense, up to that split
+(storage.base.STILL_OWED), here and in the audit alike.
+
+Check the ledger against the splits (see splits.py) and payments, or rebuild
+it from them:
+
+    python ledger.py audit
+    python ledger.py rebuild
+"""
+import sys
+
+
+if __name__ == '__main__':
+    import storage
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'audit'
+    if command == 'rebuild':
+        rows = 0
+        for database in storage.get_database().databases():
+            with database.transaction() as repo:
+                rows += repo.rebuild_ledger()
+        print(f"Rebuilt balance ledger with {rows} rows")
+    elif command == 'audit':
+        mismatches = []
+        for database in storage.get_database().databases():
+            with database.session() as repo:
+                mismatches += repo.audit_ledger()
+        for (debtor, creditor, group_id), stored, expected in mismatches:
+            print(f"{group_id} {debtor} -> {creditor}: ledger {stored:.2f}, expected {expected:.2f}")
+        print(f"{len(mismatches)} mismatched ledger rows")
+        sys.exit(1 if mismatches else 0)
+    else:
+        sys.exit("usage: python ledger.py [audit|rebuild]")
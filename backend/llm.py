@@ -0,0 +1,126 @@
+"""Chat completions from the AI provider, streamed token by token.
+
+SUMMARY_AI_PROVIDER picks the provider:
+
+- openai (the default): OpenAI chat completions with "stream": true, over
+  the shared session in clients.py. Needs OPENAI_API_KEY.
+- fake: streams FAKE_AI_TEXT a word at a time, FAKE_AI_DELAY seconds apart,
+  without any network. For tests and offline development.
+
+open_stream() returns once the provider has accepted the request, so a
+missing key or a refused request is reported before any token is sent on.
+Closing the stream closes the provider's response, which is how OpenAI is
+told to stop generating when our own client goes away.
+
+    python llm.py "Say hello in five words"
+"""
+import json
+import os
+import re
+import sys
+import time
+
+from clients import get_llm_session
+
+PROVIDER = os.getenv('SUMMARY_AI_PROVIDER', 'openai')
+OPENAI_URL = 'https://api.openai.com/v1/chat/completions'
+MODEL = 'gpt-4o-mini'
+FAKE_TEXT = os.getenv('FAKE_AI_TEXT', '- Spending is steady this month.\n'
+                                      '- Most of it goes to your top group.\n'
+                                      '- Settle pending payments to keep balances small.')
+FAKE_DELAY = float(os.getenv('FAKE_AI_DELAY', '0'))
+
+
+class ProviderError(Exception):
+    """The provider could not be asked; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=502, details=''):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def request_body(messages, stream=False):
+    body = {'model': MODEL, 'messages': messages, 'temperature': 0.4, 'max_tokens': 250}
+    if stream:
+        body['stream'] = True
+    return body
+
+
+def headers():
+    """Authorization headers for OpenAI; ProviderError if no key is configured"""
+    api_key = os.getenv('OPENAI_API_KEY', '').strip()
+    if not api_key:
+        raise ProviderError('OPENAI_API_KEY not set on server', status=500)
+    return {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+
+
+class TextStream:
+    """A fixed text as a stream of tokens, one word (with its leading whitespace) at a time"""
+
+    def __init__(self, text, delay=0.0):
+        self.tokens = re.findall(r'\s*\S+', text)
+        self.delay = delay
+        self.closed = False
+
+    def __iter__(self):
+        for token in self.tokens:
+            if self.delay:
+                time.sleep(self.delay)
+            if self.closed:
+                return
+            yield token
+
+    def close(self):
+        self.closed = True
+
+
+class OpenAIStream:
+    """The content deltas of a streamed chat completion, read as they arrive"""
+
+    def __init__(self, response):
+        self.response = response
+
+    def __iter__(self):
+        for line in self.response.iter_lines():
+            # Server-Sent Events: only the data lines carry chunks
+            if not line.startswith(b'data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == b'[DONE]':
+                return
+            for choice in json.loads(payload).get('choices') or []:
+                content = (choice.get('delta') or {}).get('content')
+                if content:
+                    yield content
+
+    def close(self):
+        self.response.close()
+
+
+def open_stream(messages, timeout=30):
+    """Ask the provider for a completion; iterate the result for its tokens and close it when done"""
+    if PROVIDER == 'fake':
+        return TextStream(FAKE_TEXT, FAKE_DELAY)
+
+    import requests  # loaded on the first AI request rather than at worker boot
+    try:
+        resp = get_llm_session().post(OPENAI_URL, headers=headers(), json=request_body(messages, stream=True),
+                                      timeout=timeout, stream=True)
+    except requests.exceptions.RequestException as e:
+        raise ProviderError(f'OpenAI request failed: {e}')
+    if resp.status_code != 200:
+        details = resp.text[:500]
+        resp.close()
+        raise ProviderError(f'OpenAI error {resp.status_code}', details=details)
+    return OpenAIStream(resp)
+
+
+if __name__ == '__main__':
+    stream = open_stream([{'role': 'user', 'content': ' '.join(sys.argv[1:]) or 'Say hello'}])
+    try:
+        for token in stream:
+            print(token, end='', flush=True)
+        print()
+    finally:
+        stream.close()
@@ -0,0 +1,119 @@
+"""Process-local counters, gauges and histograms, served in Prometheus text format at /api/metrics.
+
+Each worker process keeps its own values; scrape every worker (or sum them
+in the collector) when running more than one.
+"""
+import threading
+
+_registry = []
+_lock = threading.Lock()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with _lock:
+            return list(self._values.items())
+
+    def rows(self):
+        """(name suffix, ((label, value), ...), value) for each exposition line"""
+        return [('', tuple(zip(self.labels, key)), value) for key, value in sorted(self.samples())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Counter):
+    """Observations counted into cumulative buckets, with their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            # The last count is the +Inf bucket
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            counts = counts[:index] + [n + 1 for n in counts[index:]]
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def sum(self, **labels):
+        return self._values.get(self._key(labels), ([0], 0.0))[1]
+
+    def rows(self):
+        rows = []
+        for key, (counts, total) in sorted(self.samples()):
+            labels = tuple(zip(self.labels, key))
+            for bound, n in zip(self.buckets + ('+Inf',), counts):
+                rows.append(('_bucket', labels + (('le', str(bound)),), n))
+            rows.append(('_sum', labels, total))
+            rows.append(('_count', labels, counts[-1]))
+        return rows
+
+
+def counter(name, help, labels=()):
+    metric = Counter(name, help, labels)
+    _registry.append(metric)
+    return metric
+
+
+def gauge(name, help, labels=()):
+    metric = Gauge(name, help, labels)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, help, labels=(), **kwargs):
+    metric = Histogram(name, help, labels, **kwargs)
+    _registry.append(metric)
+    return metric
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for suffix, pairs, value in metric.rows():
+            name = metric.name + suffix
+            labels = ','.join(f'{label}="{_escape(v)}"' for label, v in pairs)
+            lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
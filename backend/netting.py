@@ -0,0 +1,354 @@
+"""Netting debts across groups into one short list of transfers.
+
+/api/settlements/suggest settles each group on its own, so two friends who
+share five groups get five transfer lists that often cancel out. net()
+takes the positive balance_ledger rows of many groups and:
+
+1. works out each user's balance in each group, as the per-group
+   suggestions do. That makes a debt graph of users and groups: a user who
+   owes on balance in a group pays into it, one who is owed is paid out;
+2. cancels cycles: when a owes in one group what they are owed in another
+   by b, who owes it back in a third, and so on round to a, every one of
+   those balances drops by the smallest of them and no money moves;
+3. carries each debtor's money down what is left, which has no cycles, to
+   users who are owed overall. Money reaching a user who is square
+   overall goes on through another of their groups, so one transfer can
+   stand for a chain of group transfers: a pays b in one group and b pays c
+   in another become a paying c.
+
+A transfer lists the group transfers it settles ({'groupId', 'from', 'to',
+'amount'}, as /api/settlements/suggest gives them), and `offsets` lists
+those that step 2 cancelled, so both can be recorded against their groups.
+Recording any one transfer leaves everyone else's overall balance as it
+was. Step 3 keeps each debtor's money together where it can, but finding
+the fewest transfers possible is a subset-sum search, which it does not
+attempt.
+
+The graph is one user's debts or, with scope=component, the debts of every
+user reachable from them, grown breadth first up to MAX_USERS users. Debts
+to users beyond that are left for a later plan. Cycle cancelling stops
+after BUDGET_SECONDS. The groups that the cycles left still run through are
+then settled on their own, as /api/settlements/suggest would, and the rest
+are carried as usual ("complete": false).
+
+    python netting.py <user> [component]
+"""
+import os
+import sys
+import time
+
+MAX_USERS = int(os.getenv('NETTING_MAX_USERS', '50000'))
+BUDGET_SECONDS = float(os.getenv('NETTING_BUDGET_SECONDS', '5'))
+
+
+def debt_component(repo, username, max_users=MAX_USERS):
+    """Debts among the users reachable from `username` through debts; returns (debts, truncated)"""
+    seen = {username}
+    frontier = [username]
+    debts = set()
+    truncated = False
+    while frontier:
+        found = repo.ledger_debts(frontier)
+        frontier = []
+        for debtor, creditor, _, _ in found:
+            for other in (debtor, creditor):
+                if other in seen:
+                    continue
+                if len(seen) >= max_users:
+                    truncated = True
+                    continue
+                seen.add(other)
+                frontier.append(other)
+        debts.update(found)
+    return [debt for debt in debts if debt[0] in seen and debt[1] in seen], truncated
+
+
+class _Edge:
+    """A user's balance in a group, in cents: user -> group if they owe, group -> user if owed"""
+    __slots__ = ('source', 'target', 'cents', 'group_id')
+
+    def __init__(self, source, target, cents, group_id):
+        self.source = source
+        self.target = target
+        self.cents = cents
+        self.group_id = group_id
+
+
+def _graph(debts):
+    """Step 1: an _Edge per user with a balance in a group; group nodes are ('group', id)"""
+    balances = {}
+    for debtor, creditor, group_id, amount in debts:
+        cents = round(amount * 100)
+        if cents > 0 and debtor != creditor:
+            balances[(group_id, debtor)] = balances.get((group_id, debtor), 0) - cents
+            balances[(group_id, creditor)] = balances.get((group_id, creditor), 0) + cents
+    edges = []
+    for (group_id, user), cents in balances.items():
+        if cents < 0:
+            edges.append(_Edge(user, ('group', group_id), -cents, group_id))
+        elif cents > 0:
+            edges.append(_Edge(('group', group_id), user, cents, group_id))
+    return edges
+
+
+def _settle(legs, cents, into):
+    """Take `cents` off (into a group, out of it) edge pairs, adding the group transfers to `into`"""
+    for paying, paid in legs:
+        paying.cents -= cents
+        paid.cents -= cents
+        key = (paying.group_id, paying.source, paid.target)
+        into[key] = into.get(key, 0) + cents
+
+
+def _cancel_cycles(edges, offsets, deadline):
+    """Step 2: depth-first search, cancelling every cycle it closes; False if out of time"""
+    out = {}
+    for edge in edges:
+        out.setdefault(edge.source, []).append(edge)
+    # Each node's next edge to follow. The ones before it are empty or lead
+    # to finished nodes, and stay so, so a node seen again carries on from it
+    at = dict.fromkeys(out, 0)
+    # Unvisited: absent; on the stack: its depth; finished: -1
+    state = {}
+    steps = 0
+    for root in out:
+        if root in state:
+            continue
+        # Nodes on the path from root and the edges between them
+        path, via = [root], []
+        state[root] = 0
+        while path:
+            steps += 1
+            if not steps % 4096 and time.perf_counter() > deadline:
+                return False
+            node = path[-1]
+            edges_out = out[node]
+            if at[node] == len(edges_out):
+                state[node] = -1
+                path.pop()
+                if via:
+                    via.pop()
+                continue
+            edge = edges_out[at[node]]
+            depth = state.get(edge.target)
+            if not edge.cents or depth == -1:
+                at[node] += 1
+            elif depth is None:
+                if edge.target in out:
+                    state[edge.target] = len(path)
+                    path.append(edge.target)
+                    via.append(edge)
+                else:
+                    state[edge.target] = -1
+            else:
+                cycle = via[depth:] + [edge]
+                # Start at a user, so the edges pair up into and out of each group
+                turn = 0 if isinstance(cycle[0].target, tuple) else 1
+                ring = cycle[turn:] + cycle[:turn]
+                smallest = min(e.cents for e in cycle)
+                _settle(zip(ring[::2], ring[1::2]), smallest, offsets)
+                # Back up to the tail of the first emptied edge; the nodes above it are unvisited again
+                cut = depth + next(i for i, e in enumerate(cycle) if not e.cents)
+                for popped in path[cut + 1:]:
+                    del state[popped]
+                del path[cut + 1:], via[cut:]
+    return True
+
+
+def _split(parcel, cents):
+    """Take `cents` off a parcel [cents, [(cents, path)]]; returns the (cents, path) pieces taken"""
+    parcel[0] -= cents
+    pieces = parcel[1]
+    taken = []
+    while cents:
+        have, path = pieces[-1]
+        part = min(have, cents)
+        taken.append((part, path))
+        if part == have:
+            pieces.pop()
+        else:
+            pieces[-1] = (have - part, path)
+        cents -= part
+    return taken
+
+
+def _carry(edges, settles):
+    """Step 3: (debtor, creditor) -> cents, carrying each debtor's money down the acyclic remainder.
+
+    Nodes are visited in topological order. At each user, the money
+    arriving from upstream debtors, plus the user's own if they owe
+    overall, first pays what the user is owed overall, in whole parcels
+    where they fit. What is left, and everything reaching a group, moves on
+    along the node's edges, largest parcel into largest edge.
+    """
+    out = {}
+    excess = {}
+    waiting = {}
+    for edge in edges:
+        out.setdefault(edge.source, []).append(edge)
+        excess[edge.source] = excess.get(edge.source, 0) + edge.cents
+        excess[edge.target] = excess.get(edge.target, 0) - edge.cents
+        waiting[edge.target] = waiting.get(edge.target, 0) + 1
+    order = [node for node in excess if not waiting.get(node)]
+    # node -> {debtor: [cents, [(cents, path)]]} arriving there; a path is
+    # (edge, rest of the path) back to the debtor, or None at the debtor
+    arriving = {}
+    transfers = {}
+
+    def pay(debtor, creditor, pieces):
+        into = settles.setdefault((debtor, creditor), {})
+        for cents, path in pieces:
+            transfers[(debtor, creditor)] = transfers.get((debtor, creditor), 0) + cents
+            legs = []
+            while path:
+                paid, (paying, path) = path
+                legs.append((paying, paid))
+            _settle(legs, cents, into)
+
+    for node in order:
+        parcels = arriving.pop(node, {})
+        if excess[node] > 0:
+            parcels[node] = [excess[node], [(excess[node], None)]]
+        ranked = sorted(parcels.items(), key=lambda item: -item[1][0])
+        owed = -excess[node]
+        if owed > 0:
+            for debtor, parcel in ranked:
+                if parcel[0] <= owed:
+                    owed -= parcel[0]
+                    pay(debtor, node, _split(parcel, parcel[0]))
+            for debtor, parcel in ranked:
+                if owed and parcel[0]:
+                    cents = min(owed, parcel[0])
+                    owed -= cents
+                    pay(debtor, node, _split(parcel, cents))
+            ranked = [(debtor, parcel) for debtor, parcel in ranked if parcel[0]]
+            ranked.sort(key=lambda item: -item[1][0])
+
+        # Edges are only paid down once money reaches a creditor below, so they are whole here
+        edges_out = sorted(out.get(node, ()), key=lambda edge: -edge.cents)
+        room = [edge.cents for edge in edges_out]
+        i = j = 0
+        while i < len(ranked) and j < len(edges_out):
+            debtor, parcel = ranked[i]
+            edge = edges_out[j]
+            cents = min(parcel[0], room[j])
+            onward = arriving.setdefault(edge.target, {}).setdefault(debtor, [0, []])
+            onward[0] += cents
+            onward[1] += [(part, (edge, path)) for part, path in _split(parcel, cents)]
+            room[j] -= cents
+            if not parcel[0]:
+                i += 1
+            if not room[j]:
+                j += 1
+        for edge in edges_out:
+            waiting[edge.target] -= 1
+            if not waiting[edge.target]:
+                order.append(edge.target)
+    return transfers
+
+
+def _by_group(edges, settles):
+    """Each group settled on its own, largest debtor to largest creditor; (debtor, creditor) -> cents"""
+    groups = {}
+    for edge in edges:
+        paying, paid = groups.setdefault(edge.group_id, ([], []))
+        (paid if isinstance(edge.source, tuple) else paying).append(edge)
+    transfers = {}
+    for paying, paid in groups.values():
+        paying.sort(key=lambda edge: -edge.cents)
+        paid.sort(key=lambda edge: -edge.cents)
+        i = j = 0
+        while i < len(paying) and j < len(paid):
+            cents = min(paying[i].cents, paid[j].cents)
+            pair = (paying[i].source, paid[j].target)
+            transfers[pair] = transfers.get(pair, 0) + cents
+            _settle([(paying[i], paid[j])], cents, settles.setdefault(pair, {}))
+            if not paying[i].cents:
+                i += 1
+            if not paid[j].cents:
+                j += 1
+    return transfers
+
+
+def _groups_on_cycles(edges):
+    """Groups that are the group end of a back edge of a depth-first search: every cycle goes through one"""
+    out = {}
+    for edge in edges:
+        out.setdefault(edge.source, []).append(edge)
+    state = {}
+    looped = set()
+    for root in out:
+        if root in state:
+            continue
+        # (node, its edges not followed yet)
+        stack = [(root, iter(out[root]))]
+        state[root] = 1
+        while stack:
+            node, rest = stack[-1]
+            edge = next(rest, None)
+            if edge is None:
+                state[node] = 2
+                stack.pop()
+            elif state.get(edge.target) == 1:
+                looped.add(edge.group_id)
+            elif edge.target not in state:
+                state[edge.target] = 1
+                stack.append((edge.target, iter(out.get(edge.target, ()))))
+    return looped
+
+
+def _group_transfers(cents_by_transfer):
+    return [{'groupId': group_id, 'from': debtor, 'to': creditor, 'amount': cents / 100}
+            for (group_id, debtor, creditor), cents in sorted(cents_by_transfer.items())]
+
+
+def net(debts, budget=BUDGET_SECONDS):
+    """Transfers that settle (debtor, creditor, group_id, amount) debts across groups.
+
+    Returns {'transfers': [{'from', 'to', 'amount', 'settles': [group transfers]}],
+    'offsets': [group transfers cancelled out], 'complete'}.
+    """
+    deadline = time.perf_counter() + budget
+    offsets = {}
+    edges = _graph(debts)
+    complete = _cancel_cycles(edges, offsets, deadline)
+    edges = [edge for edge in edges if edge.cents]
+
+    settles = {}
+    transfers = {}
+    if not complete:
+        # Out of time with cycles left: settle the groups they run through on their own
+        looped = _groups_on_cycles(edges)
+        transfers = _by_group([edge for edge in edges if edge.group_id in looped], settles)
+        edges = [edge for edge in edges if edge.group_id not in looped]
+    for pair, cents in _carry(edges, settles).items():
+        transfers[pair] = transfers.get(pair, 0) + cents
+
+    return {
+        'transfers': [{'from': debtor, 'to': creditor, 'amount': cents / 100,
+                       'settles': _group_transfers(settles[(debtor, creditor)])}
+                      for (debtor, creditor), cents in sorted(transfers.items(), key=lambda t: (-t[1], t[0]))],
+        'offsets': _group_transfers(offsets),
+        'complete': complete,
+    }
+
+
+if __name__ == '__main__':
+    import storage
+
+    if len(sys.argv) < 2:
+        sys.exit('usage: python netting.py <user> [component]')
+    user = sys.argv[1]
+    with storage.session(pin=('user', user)) as repo:
+        if sys.argv[2:] == ['component']:
+            debts, truncated = debt_component(repo, user)
+        else:
+            debts, truncated = repo.ledger_debts([user]), False
+    started = time.perf_counter()
+    plan = net(debts)
+    elapsed = time.perf_counter() - started
+    for transfer in plan['transfers']:
+        print(f"{transfer['from']} -> {transfer['to']}: {transfer['amount']:.2f} "
+              f"({len(transfer['settles'])} group transfers)")
+    print(f"{len(debts)} group debts{' (truncated)' if truncated else ''} -> {len(plan['transfers'])} transfers "
+          f"and {len(plan['offsets'])} offsets in {elapsed:.3f}s{'' if plan['complete'] else ', cycles left'}")
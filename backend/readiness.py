@@ -0,0 +1,185 @@
+"""Readiness checks behind /api/ready.
+
+/api/health only says the process answers. /api/ready says whether this
+worker should be sent traffic, checking each dependency against a threshold:
+
+- database: a SELECT 1 round trip through the connection pool (to each
+  shard, if DB_SHARDS is set), slower than READY_DB_LATENCY_MS fails;
+- pool: primary connections in use over READY_POOL_SATURATION of the pool
+  fails (MySQL only; SQLite opens connections as needed);
+- ocr_queue, ai_queue: requests waiting for the receipt route or either AI
+  summary route, plain or streamed (see admission.py), reaching
+  READY_QUEUE_DEPTH, by default the route's whole queue, fails; the
+  fuller of the two AI queues is reported;
+- errors: more than READY_ERROR_RATE of the responses of the last
+  READY_ERROR_WINDOW seconds being 5xx fails, once there are at least
+  READY_ERROR_MIN_REQUESTS of them.
+
+The result is cached for READY_CACHE_SECONDS, and concurrent probes share one
+run, so a load balancer polling every worker costs at most one query per
+interval. Like the metrics, it describes one worker process.
+
+    python readiness.py          # run the checks once and print the result
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from flask import request
+
+DB_LATENCY_MS = float(os.getenv('READY_DB_LATENCY_MS', '250'))
+POOL_SATURATION = float(os.getenv('READY_POOL_SATURATION', '0.9'))
+QUEUE_DEPTH = int(os.getenv('READY_QUEUE_DEPTH', '0'))
+ERROR_RATE = float(os.getenv('READY_ERROR_RATE', '0.2'))
+ERROR_WINDOW = int(os.getenv('READY_ERROR_WINDOW', '60'))
+ERROR_MIN_REQUESTS = int(os.getenv('READY_ERROR_MIN_REQUESTS', '20'))
+CACHE_SECONDS = float(os.getenv('READY_CACHE_SECONDS', '2'))
+
+# Check name -> endpoints whose admission queues it watches
+QUEUES = {
+    'ocr_queue': ('receipts.process_receipt',),
+    'ai_queue': ('summary.summary_ai', 'summary.summary_ai_stream'),
+}
+
+
+class ResponseWindow:
+    """Responses and 5xx responses per second over the last `seconds` seconds"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        # [second, responses, errors], oldest first
+        self._buckets = deque()
+        self._lock = threading.Lock()
+
+    def record(self, status):
+        now = int(time.monotonic())
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] != now:
+                self._buckets.append([now, 0, 0])
+                self._expire(now)
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += status >= 500
+
+    def totals(self):
+        """(responses, errors) in the window"""
+        with self._lock:
+            self._expire(int(time.monotonic()))
+            return sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets)
+
+    def _expire(self, now):
+        while self._buckets and self._buckets[0][0] <= now - self.seconds:
+            self._buckets.popleft()
+
+
+responses = ResponseWindow(ERROR_WINDOW)
+
+
+# Probes are left out of the error rate, or a 503 from /api/ready would keep it failing
+UNCOUNTED = {'health.health', 'health.ready', 'health.metrics_endpoint'}
+
+
+def init_app(app):
+    @app.after_request
+    def _record_status(response):
+        if request.endpoint not in UNCOUNTED:
+            responses.record(response.status_code)
+        return response
+
+
+def _check_database():
+    import storage
+
+    started = time.perf_counter()
+    try:
+        for database in storage.get_database().databases():
+            with database.session() as repo:
+                repo.cur.execute('SELECT 1')
+                repo.cur.fetchone()
+    except Exception as e:
+        return {'status': 'fail', 'error': str(e), 'ms': round((time.perf_counter() - started) * 1000, 2)}
+    ms = round((time.perf_counter() - started) * 1000, 2)
+    return {'status': 'ok' if ms <= DB_LATENCY_MS else 'fail', 'ms': ms, 'thresholdMs': DB_LATENCY_MS}
+
+
+def _check_pool():
+    import storage
+
+    usage = storage.get_database().pool_usage()
+    if usage is None:
+        return {'status': 'ok', 'pooled': False}
+    in_use, size = usage
+    saturation = in_use / size if size else 0.0
+    return {'status': 'ok' if saturation <= POOL_SATURATION else 'fail', 'inUse': in_use, 'size': size,
+            'saturation': round(saturation, 3), 'threshold': POOL_SATURATION}
+
+
+def _check_queue(admission, endpoints):
+    if admission is None:
+        return {'status': 'ok', 'limited': False}
+    worst = None
+    for endpoint in endpoints:
+        running, waiting, capacity = admission.queue_depth(endpoint)
+        limit = QUEUE_DEPTH or capacity
+        check = {'status': 'ok' if waiting < limit else 'fail', 'route': endpoint, 'running': running,
+                 'waiting': waiting, 'threshold': limit}
+        # The fullest queue, relative to its threshold, speaks for the check
+        if worst is None or waiting / max(limit, 1) > worst['waiting'] / max(worst['threshold'], 1):
+            worst = check
+    return worst
+
+
+def _check_errors():
+    total, errors = responses.totals()
+    rate = errors / total if total else 0.0
+    failing = total >= ERROR_MIN_REQUESTS and rate > ERROR_RATE
+    return {'status': 'fail' if failing else 'ok', 'responses': total, 'errors': errors,
+            'rate': round(rate, 3), 'threshold': ERROR_RATE, 'windowSeconds': ERROR_WINDOW}
+
+
+def run_checks(admission=None):
+    """{'ready': bool, 'checks': {name: {'status': 'ok' | 'fail', 'ms': ..., ...}}}"""
+    checks = {}
+    runs = [('database', _check_database), ('pool', _check_pool)]
+    runs += [(name, lambda endpoints=endpoints: _check_queue(admission, endpoints))
+             for name, endpoints in QUEUES.items()]
+    runs.append(('errors', _check_errors))
+    for name, check in runs:
+        started = time.perf_counter()
+        checks[name] = check()
+        checks[name].setdefault('ms', round((time.perf_counter() - started) * 1000, 2))
+    return {'ready': all(c['status'] == 'ok' for c in checks.values()), 'checks': checks}
+
+
+class Probe:
+    """run_checks() at most once per `ttl` seconds; concurrent callers wait for the same run"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._result = None
+        self._expires = 0.0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def result(self, admission=None):
+        """(result, age in seconds)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._result is None or now >= self._expires:
+                self._result = run_checks(admission)
+                self._expires = now + self.ttl
+                self._checked = now
+            return self._result, time.monotonic() - self._checked
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+
+
+probe = Probe(CACHE_SECONDS)
+
+
+if __name__ == '__main__':
+    print(json.dumps(run_checks(), indent=2))
@@ -0,0 +1,68 @@
+"""Daily spend rollups behind /api/analytics/timeseries.
+
+daily_spend keeps one row per (group, day, payer) with the total and count
+of its expenses, and daily_category_spend the same per (group, day, category). create_expense adds to it and delete_expense
+takes back, in the same transaction, so a series over any range reads at
+most one row per day per group instead of scanning expenses. Weeks (starting
+Monday) and months are built from the days, and empty periods are filled
+with zeros.
+
+Recompute the rollups from expenses, e.g. after a bulk import, with:
+
+    python rollups.py
+"""
+from datetime import date, timedelta
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def period_of(day, granularity):
+    """Label of the period a 'YYYY-MM-DD' day falls in"""
+    if granularity == 'day':
+        return day
+    if granularity == 'month':
+        return day[:7]
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def periods(start, end, granularity):
+    """Every period label from start to end (date objects), in order"""
+    if granularity == 'month':
+        year, month = start.year, start.month
+        labels = []
+        while (year, month) <= (end.year, end.month):
+            labels.append(f'{year:04d}-{month:02d}')
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return labels
+    step = 7 if granularity == 'week' else 1
+    current = start - timedelta(days=start.weekday()) if granularity == 'week' else start
+    labels = []
+    while current <= end:
+        labels.append(current.isoformat())
+        current += timedelta(days=step)
+    return labels
+
+
+def fill(rows, start, end, granularity):
+    """Gap-filled series from (bucket, key, total) rows of Repository.spend_series"""
+    totals = {label: 0.0 for label in periods(start, end, granularity)}
+    breakdown = {label: {} for label in totals}
+    for bucket, key, total in rows:
+        label = period_of(bucket, granularity) if granularity == 'week' else bucket
+        if label not in totals:
+            continue
+        totals[label] += total
+        if key is not None:
+            breakdown[label][key] = breakdown[label].get(key, 0.0) + total
+    return [(label, totals[label], breakdown[label]) for label in totals]
+
+
+if __name__ == '__main__':
+    import storage
+
+    rows = 0
+    for database in storage.get_database().databases():
+        with database.transaction() as repo:
+            rows += repo.rebuild_daily_spend()
+    print(f"Rebuilt daily spend rollups: {rows} rows")
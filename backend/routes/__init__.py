@@ -0,0 +1,9 @@
+"""HTTP routes, one blueprint per area of the API"""
+from routes import analytics, expenses, export, groups, health, payments, receipts, summary, sync, users
+
+BLUEPRINTS = (users, groups, expenses, payments, receipts, analytics, summary, export, sync, health)
+
+
+def register_blueprints(app):
+    for module in BLUEPRINTS:
+        app.register_blueprint(module.bp)
@@ -0,0 +1,197 @@
+from flask import Blueprint, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from routes.common import conditional_get, group_or_user_scope, user_scope
+from routes.payments import settlements_for_user
+from serialize import json_response
+from datetime import date, timedelta
+import rollups
+import stats
+import storage
+import contextvars
+import os
+import time
+
+bp = Blueprint('analytics', __name__)
+
+#=================Analytics Endpoint====================
+
+@bp.route('/api/analytics/overview', methods=['GET'])
+@conditional_get(user_scope)
+def analytics_overview():
+    user = (request.args.get('user') or '').strip()
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+    try:
+        with storage.session(pin=('user', user)) as repo:
+            total_spend = repo.total_spend(user)
+            by_group = repo.spend_by_group(user)
+            by_payer = repo.spend_by_payer(user)
+            monthly = repo.monthly_spend(user)  # oldest -> newest for chart
+
+        return jsonify({
+            'totals': {'totalSpend': total_spend},
+            'byGroup': by_group,
+            'byPayer': by_payer,
+            'monthly': monthly
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ==================== DASHBOARD ENDPOINT ====================
+
+DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', '4'))
+DASHBOARD_TIMEOUT = float(os.getenv('DASHBOARD_TIMEOUT', '10'))
+
+# Shared by all requests so concurrent dashboards cannot exhaust the DB pool
+_dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+
+def _settlement_counts(repo, user):
+    suggestions = settlements_for_user(repo, user)
+    transfers = [t for s in suggestions for t in s['transfers']]
+    return {
+        'groups': sum(1 for s in suggestions if s['transfers']),
+        'transfers': len(transfers),
+        'yours': sum(1 for t in transfers if user in (t['from'], t['to']))
+    }
+
+def _summary_totals(repo, user):
+    by_group = repo.spend_by_group(user)
+    return {'total': float(sum(g['total'] for g in by_group)), 'byGroup': by_group}
+
+DASHBOARD_SECTIONS = {
+    'groups': lambda repo, user: repo.groups_for_user(user),
+    'recent': lambda repo, user: repo.recent_expenses(user).dicts(),
+    'pending': lambda repo, user: repo.pending_totals(user),
+    'settlements': _settlement_counts,
+    'summary': _summary_totals,
+}
+
+def _timed_section(fn, user):
+    """Run one dashboard section on its own pooled connection"""
+    start = time.perf_counter()
+    with storage.session(pin=('user', user)) as repo:
+        result = fn(repo, user)
+    return result, (time.perf_counter() - start) * 1000
+
+@bp.route('/api/dashboard', methods=['GET'])
+def dashboard():
+    """Everything the home/dashboard pages need, with sections queried in parallel"""
+    user = (request.args.get('user') or '').strip()
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+
+    start = time.perf_counter()
+    # Pool threads do not inherit the request's context vars, e.g. its read-your-writes pin;
+    # each section runs in its own copy, as one context cannot be entered by two threads
+    futures = {name: _dashboard_executor.submit(contextvars.copy_context().run, _timed_section, fn, user)
+               for name, fn in DASHBOARD_SECTIONS.items()}
+    data = {}
+    timings = []
+    try:
+        for name, future in futures.items():
+            remaining = DASHBOARD_TIMEOUT - (time.perf_counter() - start)
+            data[name], ms = future.result(timeout=max(remaining, 0))
+            timings.append(f'{name};dur={ms:.1f}')
+    except Exception as e:
+        for future in futures.values():
+            future.cancel()
+        return jsonify({'error': str(e) or type(e).__name__}), 500
+
+    timings.append(f'total;dur={(time.perf_counter() - start) * 1000:.1f}')
+    response = json_response(data)
+    response.headers['Server-Timing'] = ', '.join(timings)
+    return response, 200
+
+# ==================== TIME SERIES ENDPOINT ====================
+
+TIMESERIES_MAX_POINTS = 5000
+TIMESERIES_DEFAULT_SPAN = {'day': 30, 'week': 7 * 12, 'month': 365}
+
+def _default_end():
+    """The day an open-ended window ends on, which moves at midnight with no write"""
+    return '' if request.args.get('end') else date.today().isoformat()
+
+@bp.route('/api/analytics/timeseries', methods=['GET'])
+@conditional_get(user_scope, vary=_default_end)
+def analytics_timeseries():
+    """
+    Spending per day, week or month over [start, end], from daily rollups.
+    Optional: groupId to restrict to one group, breakdown=group|payer|category.
+    """
+    user = (request.args.get('user') or '').strip()
+    granularity = (request.args.get('granularity') or 'day').strip()
+    breakdown = (request.args.get('breakdown') or '').strip() or None
+    group_id = (request.args.get('groupId') or '').strip() or None
+
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+    if granularity not in rollups.GRANULARITIES:
+        return jsonify({'error': 'granularity must be day, week or month'}), 400
+    if breakdown not in (None, 'group', 'payer', 'category'):
+        return jsonify({'error': 'breakdown must be group, payer or category'}), 400
+
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start = (date.fromisoformat(request.args['start']) if request.args.get('start')
+                 else end - timedelta(days=TIMESERIES_DEFAULT_SPAN[granularity]))
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    if len(rollups.periods(start, end, granularity)) > TIMESERIES_MAX_POINTS:
+        return jsonify({'error': f'At most {TIMESERIES_MAX_POINTS} points per series'}), 400
+
+    try:
+        with storage.session(pin=('user', user)) as repo:
+            rows = repo.spend_series(user, start.isoformat(), end.isoformat(),
+                                     monthly=granularity == 'month', breakdown=breakdown, group_id=group_id)
+
+        series = []
+        for period, total, parts in rollups.fill(rows, start, end, granularity):
+            point = {'period': period, 'total': round(total, 2)}
+            if breakdown:
+                point['breakdown'] = {k: round(v, 2) for k, v in parts.items()}
+            series.append(point)
+
+        return jsonify({
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'breakdown': breakdown,
+            'series': series
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ==================== STATISTICS ENDPOINT ====================
+
+@bp.route('/api/analytics/stats', methods=['GET'])
+@conditional_get(group_or_user_scope)
+def analytics_stats():
+    """
+    Percentiles, rolling average, month-over-month deltas, outliers and
+    per-member fairness for a group (groupId) or everything a user sees (user).
+    Optional: window (days, default 7), months (default 12).
+    """
+    gid = (request.args.get('groupId') or '').strip()
+    user = (request.args.get('user') or '').strip()
+    if not gid and not user:
+        return jsonify({'error': 'Provide groupId or user'}), 400
+
+    window = min(max(request.args.get('window', 7, type=int), 1), 365)
+    months = min(max(request.args.get('months', 12, type=int), 1), 120)
+
+    try:
+        with storage.session(pin=('group', gid) if gid else ('user', user)) as repo:
+            frame = stats.SpendFrame.from_rows(repo.spend_rows(username=user, group_id=gid))
+            split_totals = repo.split_totals(username=user, group_id=gid)
+
+        return jsonify({
+            **frame.summary(),
+            'rolling': {'window': window, 'series': frame.rolling_average(window)},
+            'monthOverMonth': frame.month_over_month(months),
+            'outliers': frame.outliers(),
+            'fairness': frame.fairness(split_totals)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,75 @@
+"""Helpers shared by the route blueprints"""
+from functools import wraps
+import json
+from urllib.parse import urlencode
+from flask import request, Response, make_response
+import storage
+import versions
+
+#----------------------- Conditional GET -----------------------
+
+def conditional_get(scope, vary=None):
+    """Answer If-None-Match with 304 using the version counters of a scope.
+
+    scope() returns a (kind, id) tuple for the request, or None to skip the
+    check. The version is read before the view runs, so a write racing the
+    query can only make the body newer than its ETag, never older. The ETag
+    also covers the query string, and vary(), if given, for anything else
+    the body depends on.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = scope()
+            if not key:
+                return view(*args, **kwargs)
+            try:
+                with storage.session(pin=key) as repo:
+                    token = repo.version_token(*key)
+            except Exception:
+                return view(*args, **kwargs)
+            
+            variant = urlencode(sorted(request.args.items(multi=True)))
+            if vary:
+                variant += f'|{vary()}'
+            etag = versions.etag(request.path, key[0], key[1], token, variant)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def group_scope():
+    group_id = (request.args.get('groupId') or '').strip()
+    return ('group', group_id) if group_id else None
+
+def group_or_user_scope():
+    group_id = (request.args.get('groupId') or '').strip()
+    if group_id:
+        return ('group', group_id)
+    username = (request.args.get('user') or '').strip()
+    return ('user', username) if username else None
+
+def user_scope():
+    username = (request.args.get('user') or '').strip()
+    return ('user', username) if username else None
+
+#----------------------- Long-running responses -----------------------
+
+def long_running(view):
+    """Mark a view whose responses may outlive the request timeout, e.g. a stream (see gunicorn.conf.py)"""
+    view.long_running = True
+    return view
+
+#----------------------- Server-Sent Events -----------------------
+
+def sse(event_type, data, event_id=None):
+    """Format one Server-Sent Events frame"""
+    frame = f"id: {event_id}\n" if event_id else ''
+    return frame + f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
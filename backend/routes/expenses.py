@@ -0,0 +1,164 @@
+from flask import Blueprint, request, jsonify
+from events import bus
+from routes.common import conditional_get, group_scope
+from serialize import json_response
+import search
+import storage
+import uuid
+
+bp = Blueprint('expenses', __name__)
+
+# ==================== EXPENSE ENDPOINTS ====================
+
+@bp.route('/api/expenses/create', methods=['POST'])
+def create_expense():
+    """Create a new expense"""
+    data = request.json
+    group_id = data.get('groupId')
+    title = data.get('title', '').strip()
+    amount = data.get('amount')
+    date = data.get('date', '').strip()
+    paid_by = data.get('paidBy', '').strip()
+    notes = data.get('notes', '').strip()
+    split_type = data.get('split', {}).get('type', 'equal')
+    
+    # Validation
+    if not group_id or not title or amount is None:
+        return jsonify({'error': 'Group ID, title, and amount required'}), 400
+    
+    if amount <= 0:
+        return jsonify({'error': 'Amount must be greater than 0'}), 400
+    
+    try:
+        expense_id = str(uuid.uuid4())
+        with storage.transaction(pin=('user', paid_by), group=group_id) as repo:
+            expense = repo.create_expense(expense_id, group_id, title, amount, date, paid_by, notes, split_type)
+        
+        bus.publish([f'group:{group_id}'], 'expense.created', expense)
+        
+        return jsonify({
+            'message': 'Expense created',
+            'id': expense_id,
+            'title': title,
+            'amount': amount,
+            'group_id': group_id
+        }), 201
+        
+    except storage.NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/expenses/list', methods=['GET'])
+@conditional_get(group_scope)
+def list_expenses():
+    """Get expenses for a group"""
+    group_id = request.args.get('groupId', '').strip()
+    
+    if not group_id:
+        return jsonify({'error': 'Group ID required'}), 400
+    
+    try:
+        with storage.session(stream=True, pin=('group', group_id)) as repo:
+            return json_response(repo.list_expenses(group_id))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/expenses/delete', methods=['POST'])
+def delete_expense():
+    """Delete an expense"""
+    data = request.json
+    expense_id = data.get('expenseId')
+    
+    if not expense_id:
+        return jsonify({'error': 'Expense ID required'}), 400
+    
+    try:
+        with storage.transaction(expense=expense_id) as repo:
+            group_id = repo.delete_expense(expense_id)
+        
+        if group_id:
+            bus.publish([f'group:{group_id}'], 'expense.deleted', {'id': expense_id, 'groupId': group_id})
+        
+        return jsonify({'message': 'Expense deleted'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/expenses/recent', methods=['GET'])
+def recent_expenses():
+    """Get recent expenses for a user"""
+    username = request.args.get('user', '').strip()
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    
+    try:
+        with storage.session(stream=True, pin=('user', username)) as repo:
+            return json_response(repo.recent_expenses(username))
+        
+    except Exception as e:
+        print(f"Error in recent_expenses: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+ACTIVITY_LIMIT_MAX = 100
+
+@bp.route('/api/activity', methods=['GET'])
+def activity_feed():
+    """Latest expenses and payments in the user's groups, newest first"""
+    username = request.args.get('user', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), ACTIVITY_LIMIT_MAX)
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    
+    try:
+        with storage.session(stream=True, pin=('user', username)) as repo:
+            return json_response(repo.activity(username, limit))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_PAGE_MAX = 100
+
+@bp.route('/api/expenses/search', methods=['GET'])
+def search_expenses():
+    """Full-text search over the user's expenses, ranked and paginated"""
+    username = request.args.get('user', '').strip()
+    terms = search.tokenize(request.args.get('q', ''))[:search.MAX_QUERY_TERMS]
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    if not terms:
+        return jsonify({'error': 'Search query required'}), 400
+    
+    try:
+        min_amount = request.args.get('minAmount', type=float)
+        max_amount = request.args.get('maxAmount', type=float)
+        limit = min(max(request.args.get('limit', SEARCH_PAGE_DEFAULT, type=int), 1), SEARCH_PAGE_MAX)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        with storage.session(pin=('user', username)) as repo:
+            results = repo.search_expenses(
+                username, terms,
+                group_id=request.args.get('groupId', '').strip() or None,
+                payer=request.args.get('paidBy', '').strip() or None,
+                date_from=request.args.get('from', '').strip() or None,
+                date_to=request.args.get('to', '').strip() or None,
+                min_amount=min_amount,
+                max_amount=max_amount,
+                limit=limit,
+                offset=offset
+            )
+        
+        has_more = len(results) > limit
+        return jsonify({
+            'results': results[:limit],
+            'hasMore': has_more,
+            'nextOffset': offset + limit if has_more else None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,87 @@
+from flask import Blueprint, request, jsonify, Response
+from routes.common import long_running
+import storage
+import csv
+import io
+import json
+
+bp = Blueprint('export', __name__)
+
+# ==================== EXPORT ENDPOINTS ====================
+
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def _export_rows(kind, group_id, username):
+    """Yield rows one at a time; an abandoned download drops its unbuffered connection.
+
+    The first next() opens the session and runs the query, yielding None, so
+    the route can report a failure before it has sent a 200.
+    """
+    pin = ('group', group_id) if group_id else ('user', username)
+    with storage.session(stream=True, pin=pin) as repo:
+        rows = repo.export_rows(kind, group_id=group_id, username=username)
+        first = next(rows, None)
+        yield None
+        if first is not None:
+            yield first
+            yield from rows
+
+def _csv_chunks(columns, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def _ndjson_chunks(columns, rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), default=str)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_CHUNK_BYTES:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            size = 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+@bp.route('/api/export/<kind>', methods=['GET'])
+@long_running
+def export_data(kind):
+    """Stream expenses, splits or payments for a group or user as CSV or NDJSON"""
+    group_id = (request.args.get('groupId') or '').strip()
+    username = (request.args.get('user') or '').strip()
+    fmt = (request.args.get('format') or 'csv').strip().lower()
+    
+    if kind not in storage.EXPORTS:
+        return jsonify({'error': f'Unknown export {kind}'}), 400
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    if not group_id and not username:
+        return jsonify({'error': 'Provide groupId or user'}), 400
+    
+    columns = storage.EXPORTS[kind][0]
+    rows = _export_rows(kind, group_id, username)
+    try:
+        next(rows)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if fmt == 'csv':
+        body = _csv_chunks(columns, rows)
+        mimetype = 'text/csv'
+    else:
+        body = _ndjson_chunks(columns, rows)
+        mimetype = 'application/x-ndjson'
+    
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={kind}.{fmt}',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,124 @@
+from flask import Blueprint, request, jsonify
+from events import bus
+from routes.common import conditional_get, user_scope
+import storage
+import uuid
+
+bp = Blueprint('groups', __name__)
+
+# Largest number of names one /api/groups/members request may add and remove
+MEMBERS_BATCH_MAX = 500
+
+# ==================== GROUP ENDPOINTS ====================
+
+@bp.route('/api/groups/create', methods=['POST'])
+def create_group():
+    """Create a new group"""
+    data = request.json
+    group_name = data.get('groupName', '').strip()
+    username = data.get('username', '').strip()
+    
+    if not group_name or not username:
+        return jsonify({'error': 'Group name and username required'}), 400
+    
+    try:
+        group_id = str(uuid.uuid4())
+        with storage.transaction(pin=('user', username), group=group_id) as repo:
+            repo.create_group(group_id, group_name, username)
+        
+        bus.publish([f'user:{username}'], 'group.created',
+                    {'groupId': group_id, 'name': group_name, 'owner': username})
+        
+        return jsonify({
+            'message': 'Group created',
+            'id': group_id,
+            'name': group_name,
+            'owner': username
+        }), 201
+        
+    except storage.NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/groups/list', methods=['GET'])
+@conditional_get(user_scope)
+def list_groups():
+    """Get all groups for a user"""
+    username = request.args.get('user', '').strip()
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    
+    try:
+        with storage.session(pin=('user', username)) as repo:
+            groups = repo.groups_for_user(username)
+        
+        return jsonify(groups), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/groups/add-member', methods=['POST'])
+def add_member_to_group():
+    """Add a member to a group"""
+    data = request.json
+    group_id = data.get('groupId')
+    member_name = data.get('memberName', '').strip()
+    
+    if not group_id or not member_name:
+        return jsonify({'error': 'Group ID and member name required'}), 400
+    
+    try:
+        with storage.transaction(group=group_id) as repo:
+            repo.add_member(group_id, member_name)
+        
+        bus.publish([f'group:{group_id}', f'user:{member_name}'], 'member.added',
+                    {'groupId': group_id, 'username': member_name})
+        
+        return jsonify({'message': 'Member added', 'groupId': group_id, 'username': member_name}), 201
+        
+    except storage.NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except storage.Conflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/groups/members', methods=['POST'])
+def update_group_members():
+    """Add and remove many members of a group in one request"""
+    data = request.json or {}
+    group_id = data.get('groupId')
+    add = [name.strip() for name in data.get('add') or [] if isinstance(name, str) and name.strip()]
+    remove = [name.strip() for name in data.get('remove') or [] if isinstance(name, str) and name.strip()]
+
+    if not group_id or not (add or remove):
+        return jsonify({'error': 'Group ID and members to add or remove required'}), 400
+    if len(add) + len(remove) > MEMBERS_BATCH_MAX:
+        return jsonify({'error': f'At most {MEMBERS_BATCH_MAX} members per request'}), 400
+
+    try:
+        with storage.transaction(pin=('group', group_id)) as repo:
+            results = repo.update_members(group_id, add, remove)
+
+        added = [name for name, status in results.items() if status == 'added']
+        removed = [name for name, status in results.items() if status == 'removed']
+        if added or removed:
+            bus.publish([f'group:{group_id}'] + [f'user:{name}' for name in added + removed], 'members.updated',
+                        {'groupId': group_id, 'added': added, 'removed': removed})
+
+        return jsonify({
+            'groupId': group_id,
+            'added': len(added),
+            'removed': len(removed),
+            'results': [{'username': name, 'action': 'add' if name in add else 'remove', 'status': status}
+                        for name, status in results.items()]
+        }), 200
+
+    except storage.NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except storage.Conflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,27 @@
+from flask import Blueprint, current_app, jsonify, Response
+import metrics
+import readiness
+
+bp = Blueprint('health', __name__)
+
+# ==================== HEALTH CHECK ====================
+
+@bp.route('/api/health', methods=['GET'])
+def health():
+    """Health check endpoint"""
+    return jsonify({'status': 'ok'}), 200
+
+@bp.route('/api/ready', methods=['GET'])
+def ready():
+    """Whether this worker should get traffic: 200 if every dependency check passes, else 503"""
+    result, age = readiness.probe.result(current_app.extensions.get('admission'))
+    return jsonify({
+        'status': 'ready' if result['ready'] else 'not_ready',
+        'ageSeconds': round(age, 2),
+        'checks': result['checks']
+    }), 200 if result['ready'] else 503
+
+@bp.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Counters and gauges in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,246 @@
+from flask import Blueprint, request, jsonify
+from datetime import date, datetime, timezone
+from events import bus
+import netting
+from routes.common import conditional_get, group_or_user_scope, user_scope
+from serialize import json_response
+import storage
+
+bp = Blueprint('payments', __name__)
+
+# ==================== PAYMENT ENDPOINTS ====================
+
+@bp.route('/api/payments/pending', methods=['GET'])
+def get_pending_payments():
+    """Get all pending payments for a user"""
+    username = request.args.get('user')
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    
+    try:
+        # Get all unpaid splits for the user
+        with storage.session(pin=('user', username)) as repo:
+            all_payments = repo.payment_splits(username)
+        
+        # Separate pending and paid
+        pending = [p for p in all_payments if p['payment_status'] == 'pending']
+        
+        return jsonify({
+            'pending': pending,
+            'total_owed': sum(p['amount_owed'] for p in pending)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/payments/pay', methods=['POST'])
+def make_payment():
+    """Mark a payment as paid"""
+    data = request.json
+    expense_id = data.get('expenseId')
+    username = data.get('username')
+    amount = data.get('amount')
+    
+    if not all([expense_id, username, amount]):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        with storage.transaction(pin=('user', username), expense=expense_id) as repo:
+            group_id = repo.make_payment(expense_id, username, amount)
+        
+        if group_id:
+            bus.publish([f'group:{group_id}'], 'payment.recorded', {
+                'expenseId': expense_id,
+                'groupId': group_id,
+                'username': username,
+                'amount': amount
+            })
+        
+        return jsonify({'message': 'Payment recorded'}), 200
+    except storage.Conflict as e:
+        return jsonify({'error': str(e)}), 400
+    except storage.NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/payments/history', methods=['GET'])
+def payment_history():
+    """Get payment history for a user"""
+    username = request.args.get('user')
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    
+    try:
+        with storage.session(stream=True, pin=('user', username)) as repo:
+            return json_response(repo.payment_history(username))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ----------------------- Settlement Suggestions -----------------------
+def settle_balances(bal):
+    """Greedy minimal transfers for a {name: balance} dict (positive = should receive)"""
+    creditors = [{"name": n, "amt": round(v, 2)} for n, v in bal.items() if v > 0.005]
+    debtors = [{"name": n, "amt": round(-v, 2)} for n, v in bal.items() if v < -0.005]
+    creditors.sort(key=lambda x: -x["amt"])
+    debtors.sort(key=lambda x: -x["amt"])
+
+    transfers = []
+    i, j = 0, 0
+    while i < len(debtors) and j < len(creditors):
+        pay = min(debtors[i]["amt"], creditors[j]["amt"])
+        if pay > 0:
+            transfers.append({"from": debtors[i]["name"], "to": creditors[j]["name"], "amount": round(pay, 2)})
+            debtors[i]["amt"] -= pay
+            creditors[j]["amt"] -= pay
+        if debtors[i]["amt"] <= 0.005:
+            i += 1
+        if creditors[j]["amt"] <= 0.005:
+            j += 1
+    return transfers
+
+def as_of_param():
+    """?asOf= as a UTC 'YYYY-MM-DD HH:MM:SS', or None; a bare date means the end of that day.
+    Raises ValueError if it is neither a date nor an ISO 8601 date-time."""
+    raw = (request.args.get('asOf') or '').strip()
+    if not raw:
+        return None
+    if len(raw) == 10:
+        return f"{date.fromisoformat(raw).isoformat()} 23:59:59"
+    moment = datetime.fromisoformat(raw.replace('Z', '+00:00'))
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def _settle_group(repo, group_id, as_of=None):
+    """Minimal cash transfers that settle one group, now or as of a past moment.
+
+    Both come from the ledger, so payments made by then count; a past
+    moment is replayed from its snapshots.
+    """
+    if as_of:
+        transfers = settle_balances(repo.group_balances_as_of(group_id, as_of))
+        return {"groupId": group_id, "groupName": repo.group_name(group_id), "asOf": as_of, "transfers": transfers}
+    transfers = settle_balances(repo.group_ledger_balances(group_id))
+    return {"groupId": group_id, "groupName": repo.group_name(group_id), "transfers": transfers}
+
+def settlements_for_user(repo, user, as_of=None):
+    """Settlement suggestions for every group the user belongs to"""
+    return [_settle_group(repo, gx, as_of) for gx in repo.group_ids_for_user(user)]
+
+@bp.route("/api/settlements/suggest", methods=["GET"])
+@conditional_get(group_or_user_scope)
+def settlements_suggest():
+    """
+    If groupId is provided -> return minimal cash transfers for that group.
+    Else if user is provided -> return suggestions per group the user belongs to.
+    &asOf=   -> what they were at that date (end of day) or UTC date-time
+    """
+    gid = (request.args.get("groupId") or "").strip()
+    user = (request.args.get("user") or "").strip()
+
+    if not gid and not user:
+        return jsonify({"error": "Provide groupId or user"}), 400
+    try:
+        as_of = as_of_param()
+    except ValueError:
+        return jsonify({"error": "asOf must be YYYY-MM-DD or an ISO 8601 date-time"}), 400
+
+    try:
+        with storage.session(pin=('group', gid) if gid else ('user', user)) as repo:
+            if gid:
+                return jsonify(_settle_group(repo, gid, as_of)), 200
+
+            # user view: all groups the user belongs to
+            return jsonify(settlements_for_user(repo, user, as_of)), 200
+
+    except storage.NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/api/settlements/network", methods=["GET"])
+def settlements_network():
+    """
+    Transfers that settle the user's debts across all their groups at once (see netting.py).
+    ?user=             -> the user's own debts
+    &scope=component   -> every debt among the users connected to them by debts
+    """
+    user = (request.args.get("user") or "").strip()
+    scope = (request.args.get("scope") or "user").strip()
+
+    if not user:
+        return jsonify({"error": "Username required"}), 400
+    if scope not in ("user", "component"):
+        return jsonify({"error": "scope must be user or component"}), 400
+
+    try:
+        with storage.session(pin=('user', user)) as repo:
+            if scope == "component":
+                debts, truncated = netting.debt_component(repo, user)
+            else:
+                debts, truncated = repo.ledger_debts([user]), False
+
+        plan = netting.net(debts)
+        return jsonify({
+            "user": user,
+            "scope": scope,
+            "users": len({name for debt in debts for name in debt[:2]}),
+            "debts": len(debts),
+            "truncated": truncated,
+            **plan
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ----------------------- Pairwise Balances -----------------------
+@bp.route('/api/balances', methods=['GET'])
+@conditional_get(user_scope)
+def balances():
+    """
+    Net balances across all groups from the pairwise ledger.
+    ?user=   -> one entry per counterparty
+    &with=   -> that one counterparty, broken down by group
+    &asOf=   -> as they stood at that date (end of day) or UTC date-time
+    Positive amounts are what the user owes; negative ones are owed to them.
+    """
+    user = (request.args.get('user') or '').strip()
+    other = (request.args.get('with') or '').strip()
+
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+    try:
+        as_of = as_of_param()
+    except ValueError:
+        return jsonify({'error': 'asOf must be YYYY-MM-DD or an ISO 8601 date-time'}), 400
+    stamp = {'asOf': as_of} if as_of else {}
+
+    try:
+        with storage.session(pin=('user', user)) as repo:
+            if other:
+                groups = repo.balance_with_as_of(user, other, as_of) if as_of else repo.balance_with(user, other)
+                return jsonify({
+                    'user': user,
+                    'with': other,
+                    **stamp,
+                    'net': round(sum(amount for _, _, amount in groups), 2),
+                    'byGroup': [{'groupId': gid, 'groupName': name, 'amount': round(amount, 2)}
+                                for gid, name, amount in groups]
+                }), 200
+
+            rows = repo.balances_as_of(user, as_of) if as_of else repo.balances(user)
+
+        return jsonify({
+            'user': user,
+            **stamp,
+            'youOwe': round(sum(a for _, a in rows if a > 0), 2),
+            'owedToYou': round(-sum(a for _, a in rows if a < 0), 2),
+            'balances': [{'with': name, 'net': round(amount, 2)} for name, amount in rows]
+        }), 200
+
+    except storage.NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,123 @@
+from flask import Blueprint, request, jsonify
+from clients import get_vision_client
+from datetime import datetime
+import re
+
+bp = Blueprint('receipts', __name__)
+
+# ==================== RECEIPT ENDPOINTS ====================
+
+@bp.route('/api/receipts/process', methods=['POST'])
+def process_receipt():
+    """Process receipt image and extract info"""
+    try:
+        # Get image from request
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image provided'}), 400
+        
+        image_file = request.files['image']
+        
+        if image_file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        # Read image file
+        image_data = image_file.read()
+        
+        # Call Google Vision API
+        client = get_vision_client()
+        from google.cloud import vision  # already loaded by get_vision_client()
+        image = vision.Image(content=image_data)
+        response = client.text_detection(image=image)
+        
+        if not response.text_annotations:
+            return jsonify({'error': 'No text found in image'}), 400
+        
+        # Extract full text
+        full_text = response.text_annotations[0].description
+        
+        # Parse receipt with simple regex patterns
+        receipt_data = parse_receipt(full_text)
+        
+        return jsonify(receipt_data), 200
+        
+    except Exception as e:
+        print(f"Error processing receipt: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def parse_receipt(text):
+    """Parse receipt text and extract amount, date, items"""
+    
+    # Extract amount (look for $ or common patterns)
+    amount_match = re.search(r'(?:total|amount|sum)[\s:]*\$?([\d,]+\.?\d{0,2})', text, re.IGNORECASE)
+    amount = float(amount_match.group(1).replace(',', '')) if amount_match else 0.0
+    
+    # If no total found, try to find any large currency amount
+    if amount == 0:
+        currency_matches = re.findall(r'\$?([\d,]+\.\d{2})', text)
+        if currency_matches:
+            amounts = [float(m.replace(',', '')) for m in currency_matches]
+            amount = max(amounts)  # Assume largest is total
+    
+    # Extract date
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    date_match = re.search(r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{2,4})', text)
+    if date_match:
+        day, month, year = date_match.groups()
+        if len(year) == 2:
+            year = '20' + year
+        try:
+            date_obj = datetime(int(year), int(month), int(day))
+            date_str = date_obj.strftime('%Y-%m-%d')
+        except:
+            pass
+    
+    # Extract category/merchant name (usually at top of receipt)
+    lines = text.split('\n')
+    category = 'Purchase'
+    for line in lines[:5]:  # Check first 5 lines
+        line = line.strip()
+        if len(line) > 3 and len(line) < 50:
+            category = line
+            break
+    
+    # Extract line items
+    line_items = extract_line_items(text)
+    
+    return {
+        'amount': round(amount, 2),
+        'date': date_str,
+        'category': category[:50],  # Limit length
+        'lineItems': line_items,
+        'rawText': text[:500]  # First 500 chars for debugging
+    }
+
+def extract_line_items(text):
+    """Extract line items from receipt text"""
+    items = []
+    
+    # Pattern: item name followed by price
+    # Looks for: "Item Name    $12.99" or "Item Name 12.99"
+    pattern = r'([a-zA-Z\s\-]{3,}?)\s{2,}(\$?)(\d+\.?\d{0,2})'
+    matches = re.findall(pattern, text)
+    
+    for match in matches:
+        item_name = match[0].strip()
+        price = float(match[2])
+        
+        # Filter out common receipt artifacts
+        if price > 0 and len(item_name) > 2 and price < 10000:
+            items.append({
+                'name': item_name[:50],
+                'price': round(price, 2)
+            })
+    
+    # Remove duplicates and limit to 20 items
+    seen = set()
+    unique_items = []
+    for item in items:
+        key = (item['name'], item['price'])
+        if key not in seen:
+            seen.add(key)
+            unique_items.append(item)
+    
+    return unique_items[:20]
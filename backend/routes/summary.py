@@ -0,0 +1,186 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from clients import get_llm_session
+from routes.common import long_running, sse
+import llm
+import metrics
+import storage
+import time
+
+bp = Blueprint('summary', __name__)
+
+# ===== Summary helpers =====
+def _summary_data_for_user(user):
+    with storage.session(pin=('user', user)) as repo:
+        total = repo.total_spend(user)
+        by_group = repo.spend_by_group(user)
+        recent = repo.recent_for_summary(user)  # recent 10
+
+    quick = {}
+    if recent:
+        avg = sum(x['amount'] for x in recent) / len(recent)
+        quick = {
+            'countRecent': len(recent),
+            'avgRecent': round(avg, 2),
+            'topGroup': by_group[0]['group'] if by_group else None
+        }
+
+    return {
+        'total': total,
+        'byGroup': by_group,
+        'recent': recent,
+        'quick': quick
+    }
+
+@bp.route('/api/summary', methods=['GET'])
+def summary_plain():
+    user = (request.args.get('user') or '').strip()
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+    try:
+        data = _summary_data_for_user(user)
+        return jsonify(data), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _ai_messages(user, ctx):
+    """Chat messages asking for a summary of the user's spending"""
+    by_group_str = ", ".join(f"{g['group']}: ${g['total']:.2f}" for g in ctx.get('byGroup', [])[:5]) or "none"
+    recent_lines = []
+    for r in ctx.get('recent', [])[:10]:
+        recent_lines.append(f"{r['date']} • ${r['amount']:.2f} • {r['title']} • {r['group']}")
+    recent_str = "\n".join(recent_lines) or "none"
+    quick = ctx.get('quick', {})
+    quick_str = f"countRecent={quick.get('countRecent', 0)}, avgRecent=${quick.get('avgRecent', 0):.2f}, topGroup={quick.get('topGroup')}"
+    plain_context = (
+        f"User: {user}\n"
+        f"Total spending: ${ctx.get('total', 0):.2f}\n"
+        f"By group: {by_group_str}\n"
+        f"Quick: {quick_str}\n"
+        f"Recent:\n{recent_str}\n"
+    )
+    return [
+        {'role': 'system', 'content': 'You are a concise financial analyst for a bill-splitting app. Output 3 to 6 short bullets. Use simple language. No emojis.'},
+        {'role': 'user', 'content': f"Summarize this user's spending and give quick suggestions.\n\nContext:\n{plain_context}"}
+    ]
+
+def _has_data(ctx):
+    return ctx.get('total', 0) > 0 or ctx.get('recent')
+
+NO_DATA_TEXT = 'No expenses yet. Add a few and I will summarize trends for you.'
+
+@bp.route('/api/summary/ai', methods=['GET'])
+def summary_ai():
+    user = (request.args.get('user') or '').strip()
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+
+    try:
+        ctx = _summary_data_for_user(user)
+    except Exception as e:
+        return jsonify({'error': f'Failed to load summary data: {e}'}), 500
+
+    # If there is no data, return a friendly message
+    if not _has_data(ctx):
+        return jsonify({'text': NO_DATA_TEXT}), 200
+
+    # Build a compact textual context for the LLM
+    try:
+        messages = _ai_messages(user, ctx)
+    except Exception as e:
+        return jsonify({'error': f'Failed to build AI context: {e}'}), 500
+
+    try:
+        headers = llm.headers()
+    except llm.ProviderError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    # Call OpenAI chat completions with defensive error handling
+    import requests  # loaded on the first AI request rather than at worker boot
+    try:
+        resp = get_llm_session().post(llm.OPENAI_URL, headers=headers, json=llm.request_body(messages), timeout=30)
+        if resp.status_code != 200:
+            # return the error so the UI can show it
+            return jsonify({'error': f'OpenAI error {resp.status_code}', 'details': resp.text[:500]}), 502
+        data = resp.json()
+        text = data.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
+        if not text:
+            return jsonify({'error': 'OpenAI returned empty content'}), 502
+        return jsonify({'text': text}), 200
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': f'OpenAI request failed: {e}'}), 502
+    except Exception as e:
+        return jsonify({'error': f'Unexpected AI error: {e}'}), 500
+
+# ===== Streamed AI summary =====
+first_token_seconds = metrics.histogram('summary_ai_first_token_seconds',
+                                        'Time from the request to the first AI summary token sent')
+stream_seconds = metrics.histogram('summary_ai_stream_seconds',
+                                   'Time from the request to the end of an AI summary stream, by outcome', ('outcome',))
+streams_open = metrics.gauge('summary_ai_streams_open', 'AI summary streams being relayed')
+
+@bp.route('/api/summary/ai/stream', methods=['GET'])
+@long_running
+def summary_ai_stream():
+    """
+    The AI summary as Server-Sent Events, sent on token by token as the provider writes it.
+    event: token -> {"text": next piece of the summary}
+    event: done  -> {"text": whole summary, "firstTokenSeconds", "seconds"}
+    event: error -> {"error"}, when the provider fails part way; the stream then ends
+    Errors before the stream starts are JSON, as from /api/summary/ai.
+    If the client goes away, the provider's response is closed so it stops generating.
+    """
+    started = time.perf_counter()
+    user = (request.args.get('user') or '').strip()
+    if not user:
+        return jsonify({'error': 'Username required'}), 400
+
+    try:
+        ctx = _summary_data_for_user(user)
+    except Exception as e:
+        return jsonify({'error': f'Failed to load summary data: {e}'}), 500
+
+    if not _has_data(ctx):
+        completion = llm.TextStream(NO_DATA_TEXT)
+    else:
+        try:
+            completion = llm.open_stream(_ai_messages(user, ctx))
+        except llm.ProviderError as e:
+            return jsonify({'error': str(e), 'details': e.details}), e.status
+        except Exception as e:
+            return jsonify({'error': f'Unexpected AI error: {e}'}), 500
+
+    def generate():
+        streams_open.inc()
+        # Unless the loop below finishes, the client went away mid-stream
+        outcome = 'cancelled'
+        first = None
+        parts = []
+        try:
+            for token in completion:
+                if first is None:
+                    first = time.perf_counter() - started
+                    first_token_seconds.observe(first)
+                parts.append(token)
+                yield sse('token', {'text': token})
+            text = ''.join(parts).strip()
+            if not text:
+                outcome = 'error'
+                yield sse('error', {'error': 'OpenAI returned empty content'})
+                return
+            outcome = 'completed'
+            yield sse('done', {'text': text, 'firstTokenSeconds': round(first, 3),
+                               'seconds': round(time.perf_counter() - started, 3)})
+        except Exception as e:
+            outcome = 'error'
+            yield sse('error', {'error': f'AI stream failed: {e}'})
+        finally:
+            # Also reached on GeneratorExit, when the server closes the response early
+            completion.close()
+            streams_open.dec()
+            stream_seconds.observe(time.perf_counter() - started, outcome=outcome)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # A response closed before its first frame never runs generate()'s cleanup
+    response.call_on_close(completion.close)
+    return response
@@ -0,0 +1,139 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from events import bus
+from routes.common import long_running, sse
+import storage
+import os
+import time
+
+bp = Blueprint('sync', __name__)
+
+# ==================== SYNC ENDPOINTS ====================
+
+SYNC_BATCH_DEFAULT = 500
+SYNC_BATCH_MAX = 1000
+
+@bp.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """Return changes since a cursor, or a full snapshot when the cursor is missing or too old.
+
+    The cursor is the seq of the last change returned (its id in the
+    response), numbered in commit order; see changelog.py.
+
+    Clients should apply inserts as upserts. A member insert naming the caller
+    means they joined a group whose earlier history is not in their feed, so
+    that group should be loaded once with /api/expenses/list; a member
+    delete naming the caller means they were removed, so the group and its
+    expenses should be dropped.
+    """
+    username = (request.args.get('user') or '').strip()
+    since = request.args.get('since', '0').strip()
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    if not since.isdigit():
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    since = int(since)
+    limit = min(request.args.get('limit', SYNC_BATCH_DEFAULT, type=int) or SYNC_BATCH_DEFAULT, SYNC_BATCH_MAX)
+    
+    try:
+        with storage.session(pin=('user', username)) as repo:
+            if since == 0 or since < repo.change_floor():
+                # Take the cursor before reading so nothing written meanwhile is skipped
+                cursor_id = repo.change_head()
+                snapshot = repo.sync_snapshot(username)
+                return jsonify({'reset': True, 'cursor': cursor_id, 'hasMore': False, **snapshot}), 200
+            
+            changes = repo.changes_for_user(username, since, limit + 1)
+        
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return jsonify({
+            'reset': False,
+            'cursor': changes[-1]['id'] if changes else since,
+            'hasMore': has_more,
+            'changes': changes
+        }), 200
+        
+    except storage.Unsupported as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ==================== STREAM ENDPOINTS ====================
+
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', '15'))
+
+@bp.route('/api/stream', methods=['GET'])
+@long_running
+def stream_changes():
+    """Stream change events for every group the user belongs to"""
+    username = (request.args.get('user') or '').strip()
+    
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    
+    try:
+        with storage.session(pin=('user', username)) as repo:
+            group_ids = repo.group_ids_for_user(username)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    channels = {f'user:{username}'} | {f'group:{gid}' for gid in group_ids}
+    
+    # EventSource sends Last-Event-ID on reconnect; the query param covers the first connect
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    start = bus.parse_event_id(last_event_id) if last_event_id else None
+    resync = last_event_id is not None and start is None
+    
+    def resubscribe(event):
+        """Follow the user into groups they join and out of groups they leave; True if channels changed"""
+        if f'user:{username}' not in event.channels:
+            return False
+        if event.type == 'members.updated':
+            joined, left = username in event.data['added'], username in event.data['removed']
+        else:
+            joined, left = event.type in ('member.added', 'group.created'), False
+        if not (joined or left):
+            return False
+        channel = f"group:{event.data['groupId']}"
+        before = len(channels)
+        if joined:
+            channels.add(channel)
+        else:
+            channels.discard(channel)
+        return len(channels) != before
+    
+    def generate():
+        seq = bus.last_seq if start is None else start
+        yield 'retry: 3000\n\n'
+        if resync:
+            yield sse('resync', {'reason': 'unknown event id'}, f'{bus.boot}-{seq}')
+        
+        last_write = time.monotonic()
+        while True:
+            timeout = max(0.0, STREAM_HEARTBEAT_SECONDS - (time.monotonic() - last_write))
+            events, seq, complete = bus.wait(seq, channels, timeout)
+            
+            if not complete:
+                # Some events were evicted before we could send them
+                yield sse('resync', {'reason': 'history exhausted'}, f'{bus.boot}-{seq}')
+                last_write = time.monotonic()
+                continue
+            
+            for event in events:
+                yield sse(event.type, event.data, event.id)
+                last_write = time.monotonic()
+                if resubscribe(event):
+                    # The rest of the batch was picked by the old channels; read it again
+                    seq = event.seq
+                    break
+            
+            if time.monotonic() - last_write >= STREAM_HEARTBEAT_SECONDS:
+                yield ': heartbeat\n\n'
+                last_write = time.monotonic()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,52 @@
+from flask import Blueprint, request, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+import storage
+
+bp = Blueprint('users', __name__)
+
+# ==================== USER ENDPOINTS ====================
+
+@bp.route('/api/users/register', methods=['POST'])
+def register_user():
+    """Register a new user"""
+    data = request.json
+    username = data.get('username')
+    password = data.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'Username and password required'}), 400
+    
+    try:
+        hashed_password = generate_password_hash(password)
+        with storage.transaction(pin=('user', username)) as repo:
+            repo.create_user(username, hashed_password)
+        
+        return jsonify({'message': 'User created', 'username': username}), 201
+    except storage.Conflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/users/login', methods=['POST'])
+def login_user():
+    """Login a user"""
+    data = request.json
+    username = data.get('username')
+    password = data.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'Username and password required'}), 400
+    
+    try:
+        with storage.session(pin=('user', username)) as repo:
+            password_hash = repo.password_hash(username)
+        
+        if not password_hash:
+            return jsonify({'error': 'User not found'}), 404
+        
+        if check_password_hash(password_hash, password):
+            return jsonify({'message': 'Login successful', 'username': username}), 200
+        else:
+            return jsonify({'error': 'Invalid password'}), 401
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,58 @@
+"""Inverted index behind /api/expenses/search.
+
+Each expense is split into lowercase word terms from its title, note, payer
+and group name, stored one row per (term, expense) in expense_terms with the
+best field weight the term appeared in. Rows are written with the expense and
+deleted with it. The primary key leads with group_id, so a query term is a
+range scan over the terms it prefixes within each of the searcher's groups:
+its cost follows the size of those groups, not of the whole table, and no
+LIKE '%...%' scan is needed.
+
+Rebuild the index for rows written before it existed with:
+
+    python search.py
+"""
+import re
+
+# Best field wins when a term appears in several
+FIELD_WEIGHTS = {'title': 4, 'payer': 3, 'group': 2, 'note': 1}
+# An exact word match ranks above a prefix match
+EXACT_BONUS = 2
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 5
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Lowercase word tokens of text, in order, without duplicates"""
+    seen = []
+    for word in _WORD.findall((text or '').lower()):
+        word = word[:MAX_TERM_LENGTH]
+        if word not in seen:
+            seen.append(word)
+    return seen
+
+
+def expense_terms(title, note, payer, group):
+    """{term: weight} for one expense"""
+    terms = {}
+    for field, text in (('title', title), ('note', note), ('payer', payer), ('group', group)):
+        for term in tokenize(text):
+            terms[term] = max(terms.get(term, 0), FIELD_WEIGHTS[field])
+    return terms
+
+
+def prefix_range(term):
+    """[low, high) bounds of the strings that start with term"""
+    return term, term[:-1] + chr(ord(term[-1]) + 1)
+
+
+if __name__ == '__main__':
+    import storage
+
+    indexed = 0
+    for database in storage.get_database().databases():
+        with database.transaction() as repo:
+            indexed += repo.reindex_expenses()
+    print(f"Indexed {indexed} expenses")
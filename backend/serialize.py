@@ -0,0 +1,103 @@
+"""Fast JSON responses for the list endpoints, written from cursor tuples.
+
+json_response() encodes a storage Rows result as it is fetched, one chunk of
+cursor tuples at a time. Each chunk becomes dicts only for as long as it
+takes to encode it, so peak memory is little more than the output, instead
+of every row as a tuple and a dict plus the encoded string. orjson is used
+when it is installed, else the standard json module with compact
+separators. Values come out as jsonify would write them: dates as HTTP
+dates, Decimals as strings.
+
+Bodies of COMPRESS_MIN_BYTES or more are compressed when the client's
+Accept-Encoding allows it: with brotli if that is installed, else with gzip.
+RESPONSE_COMPRESSION=0 turns this off, e.g. behind a proxy that already
+compresses.
+"""
+import decimal
+import gzip
+import io
+import json
+import os
+import uuid
+from datetime import date
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+from storage.rows import Rows
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION = os.getenv('RESPONSE_COMPRESSION', '1') != '0'
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '16384'))
+# Fast levels: these bodies are compressed per request, not once and cached
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '5'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+
+def _default(value):
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), default=_default)
+
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        return _encoder.encode(obj).encode('utf-8')
+
+
+def encode_rows(rows):
+    """JSON array of objects for a Rows result, encoded a chunk at a time"""
+    keys = rows.row_type.json_keys
+    out = io.BytesIO()
+    out.write(b'[')
+    separator = b''
+    for batch in rows.chunks():
+        out.write(separator)
+        # Each chunk is a JSON array; write its items without the brackets
+        out.write(memoryview(dumps([dict(zip(keys, row)) for row in batch]))[1:-1])
+        separator = b','
+    out.write(b']')
+    return out.getvalue()
+
+
+def _compress(body):
+    """(body, content encoding) in the best encoding the client accepts"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if accepted['gzip']:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
+
+
+def json_response(obj, status=200):
+    """Response with obj, a Rows result or any JSON-serializable value, encoded as JSON"""
+    body = encode_rows(obj) if isinstance(obj, Rows) else dumps(obj)
+    encoding = None
+    large = COMPRESSION and len(body) >= COMPRESS_MIN_BYTES
+    if large:
+        body, encoding = _compress(body)
+    response = Response(body, status=status, mimetype='application/json')
+    if large:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
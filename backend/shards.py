@@ -0,0 +1,210 @@
+"""Moving groups between the shards of a sharded database (DB_SHARDS).
+
+A group lives on the shard expenseDB.ShardRouter assigns it: its place on
+the consistent-hash ring, unless the group_shards directory on the home
+shard names another. `move` puts one group on a chosen shard and records
+the choice in the directory. `rebalance` moves every group that is not on
+the shard it routes to, e.g. the groups the ring hands to a newly added
+shard.
+
+A move copies the group's rows to the target in one transaction, repoints
+the directory, then deletes them from the source. Auto-increment ids are
+renumbered on the target, along with the columns that point at them (split
+rules' member_seq, ledger snapshots' last_entry), and the change log gets
+the target's next sync seqs, so clients see the moved changes once more. A move interrupted half
+way can simply be run again. Workers re-read the directory every
+DB_SHARD_DIRECTORY_SECONDS and route by the ring of their own DB_SHARDS, so
+move groups while they are quiet, and add a shard to every worker before
+rebalancing onto it: a write routed the old way lands on the old shard and
+is deleted with it.
+
+    python shards.py status
+    python shards.py rebalance [--dry-run]
+    python shards.py move <group id> <shard>
+"""
+import sys
+
+# (table, the group's rows, whether its id is renumbered), in foreign key order
+GROUP_TABLES = (
+    ('`groups`', 'id = %s', False),
+    ('group_members', 'group_id = %s', True),
+    ('expenses', 'group_id = %s', False),
+    ('expense_split', 'expense_id IN (SELECT id FROM expenses WHERE group_id = %s)', False),
+    ('expense_split_rule', 'group_id = %s', False),
+    ('expense_terms', 'group_id = %s', False),
+    ('payments', 'expense_id IN (SELECT id FROM expenses WHERE group_id = %s)', True),
+    ('daily_spend', 'group_id = %s', False),
+    ('daily_category_spend', 'group_id = %s', False),
+    ('balance_ledger', 'group_id = %s', False),
+    ('ledger_entries', 'group_id = %s', True),
+    ('ledger_snapshots', 'group_id = %s', True),
+    ('ledger_heads', 'group_id = %s', False),
+    ('entity_versions', "kind = 'group' AND entity_id = %s", False),
+    ('change_log', 'group_id = %s', True),
+    ('activity_feed', 'group_id = %s', True),
+)
+
+# (table, column) -> the renumbered table whose ids the column holds
+ID_COLUMNS = {
+    ('expense_split_rule', 'member_seq'): 'group_members',
+    ('ledger_snapshots', 'last_entry'): 'ledger_entries',
+}
+
+# (table, column) numbered afresh on the target when the transaction commits
+SEQUENCED = {('change_log', 'seq')}
+
+
+def _insert(repo, table, columns, rows):
+    repo.cur.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+        rows
+    )
+
+
+def copy_users(source, target):
+    """Insert the users that source has and target lacks; returns how many"""
+    target.cur.execute('SELECT username FROM users')
+    present = {row[0] for row in target.cur.fetchall()}
+    source.cur.execute('SELECT username, password, created_at FROM users')
+    missing = [row for row in source.cur.fetchall() if row[0] not in present]
+    if missing:
+        _insert(target, 'users', ('username', 'password', 'created_at'), missing)
+    return len(missing)
+
+
+def delete_group(repo, group_id):
+    """Delete every row of the group; returns how many"""
+    deleted = 0
+    for table, where, _ in reversed(GROUP_TABLES):
+        repo.cur.execute(f'DELETE FROM {table} WHERE {where}', (group_id,))
+        deleted += repo.cur.rowcount
+    return deleted
+
+
+def copy_group(source, target, group_id):
+    """Insert the group's rows from source into target; returns how many"""
+    copied = 0
+    # Renumbered table -> [(old id, new id)] in id order
+    new_ids = {}
+    for table, where, renumbered in GROUP_TABLES:
+        order = ' ORDER BY id' if renumbered else ''
+        source.cur.execute(f'SELECT * FROM {table} WHERE {where}{order}', (group_id,))
+        columns = [c[0] for c in source.cur.description]
+        rows = source.cur.fetchall()
+        if not rows:
+            continue
+        if renumbered:
+            # New ids are handed out in the old ids' order
+            at = columns.index('id')
+            old_ids = [row[at] for row in rows]
+            columns = columns[:at] + columns[at + 1:]
+            rows = [row[:at] + row[at + 1:] for row in rows]
+        for owner, column in SEQUENCED:
+            if owner == table:
+                at = columns.index(column)
+                columns = columns[:at] + columns[at + 1:]
+                rows = [row[:at] + row[at + 1:] for row in rows]
+                target.changes_pending = True
+        for (owner, column), ids_of in ID_COLUMNS.items():
+            if owner == table:
+                at = columns.index(column)
+                rows = [row[:at] + (_renumber(new_ids.get(ids_of, []), row[at]),) + row[at + 1:] for row in rows]
+        _insert(target, table, columns, rows)
+        copied += len(rows)
+        if renumbered:
+            target.cur.execute(f'SELECT id FROM {table} WHERE {where} ORDER BY id', (group_id,))
+            new_ids[table] = list(zip(old_ids, [row[0] for row in target.cur.fetchall()]))
+    return copied
+
+
+def _renumber(ids, upto):
+    """The new id of the newest row whose old id is at most `upto`; such
+    columns mean "every row up to this one", e.g. the members a split rule covers"""
+    covered = [new for old, new in ids if old <= upto]
+    return covered[-1] if covered else 0
+
+
+def set_directory(database, group_id, shard):
+    """Route the group to `shard`, through the directory unless the ring already does"""
+    with database.home.transaction() as repo:
+        repo.cur.execute('DELETE FROM group_shards WHERE group_id = %s', (group_id,))
+        if shard != database.router.ring_shard(group_id):
+            repo.cur.execute('INSERT INTO group_shards (group_id, shard) VALUES (%s, %s)', (group_id, shard))
+    database.router.refresh()
+
+
+def groups_by_shard(database):
+    """{shard: [group ids stored there]}"""
+    found = {}
+    for shard, db in database.shards.items():
+        with db.session() as repo:
+            repo.cur.execute('SELECT id FROM `groups`')
+            found[shard] = [row[0] for row in repo.cur.fetchall()]
+    return found
+
+
+def move_group(database, group_id, target, source=None):
+    """Move a group to shard `target`; returns the number of rows moved"""
+    if source is None:
+        source = next((shard for shard, ids in groups_by_shard(database).items()
+                       if group_id in ids and shard != target), None)
+    if source is None:
+        # Already there (or nowhere): only the route may need fixing
+        set_directory(database, group_id, target)
+        return 0
+    with database.home.session() as home, database.shards[target].transaction() as repo:
+        copy_users(home, repo)
+        # Whatever an interrupted earlier move left behind
+        delete_group(repo, group_id)
+        with database.shards[source].session() as src:
+            moved = copy_group(src, repo, group_id)
+    set_directory(database, group_id, target)
+    with database.shards[source].transaction() as repo:
+        delete_group(repo, group_id)
+    return moved
+
+
+def misplaced(database):
+    """[(group id, shard it is on, shard it routes to)] for groups on the wrong shard"""
+    return [(group_id, shard, database.router.shard_for(group_id))
+            for shard, ids in groups_by_shard(database).items()
+            for group_id in ids if database.router.shard_for(group_id) != shard]
+
+
+def rebalance(database, dry_run=False):
+    """Move every misplaced group to the shard it routes to; returns the moves"""
+    moves = misplaced(database)
+    if not dry_run:
+        for group_id, source, target in moves:
+            move_group(database, group_id, target, source)
+    return moves
+
+
+if __name__ == '__main__':
+    import storage
+    from storage.sharded import ShardedDatabase
+
+    database = storage.get_database()
+    if not isinstance(database, ShardedDatabase):
+        sys.exit('DB_SHARDS is not set: there is one database and nothing to move')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'status':
+        stored = groups_by_shard(database)
+        for shard, ids in stored.items():
+            print(f"{shard}: {len(ids)} groups")
+        print(f"{len(misplaced(database))} groups to rebalance, "
+              f"{len(database.router.directory())} placed by the directory")
+    elif command == 'rebalance':
+        dry_run = '--dry-run' in sys.argv[2:]
+        moves = rebalance(database, dry_run)
+        for group_id, source, target in moves:
+            print(f"{group_id}: {source} -> {target}")
+        print(f"{'Would move' if dry_run else 'Moved'} {len(moves)} groups")
+    elif command == 'move' and len(sys.argv) == 4:
+        group_id, target = sys.argv[2], sys.argv[3]
+        if target not in database.shards:
+            sys.exit(f"Unknown shard {target!r}; DB_SHARDS has {', '.join(database.shards)}")
+        rows = move_group(database, group_id, target)
+        print(f"Moved group {group_id} to {target}: {rows} rows")
+    else:
+        sys.exit('usage: python shards.py status | rebalance [--dry-run] | move <group id> <shard>')
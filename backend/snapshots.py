@@ -0,0 +1,51 @@
+"""Point-in-time balances behind ?asOf= on /api/balances and /api/settlements/suggest.
+
+Every change to the pairwise ledger (see ledger.py) is also appended to
+ledger_entries, in the same transaction, as a (debtor, creditor, amount)
+delta. Every so often a group's whole ledger is copied into a
+ledger_snapshots row: once EVERY_WRITES ledger writes have piled up since
+its last snapshot, or on the first write EVERY_DAYS after it. The balances
+of a group as of a moment are then its newest snapshot taken by then plus
+the few entries written after that snapshot and by that moment, instead of a
+replay of every expense and payment.
+
+Snapshots are compacted: all of the last KEEP_DAYS days are kept, then the
+last one of each month for KEEP_MONTHS months. Older snapshots go, along
+with the entries before the oldest one left, which becomes the group's
+floor: asking for balances before a floor is an error. So is asking about a
+group whose ledger predates the journal, before its first snapshot.
+
+    python snapshots.py take       # snapshot every group with new entries
+    python snapshots.py compact [keep days] [keep months]
+"""
+import os
+import sys
+
+EVERY_WRITES = int(os.getenv('SNAPSHOT_EVERY_WRITES', '200'))
+EVERY_DAYS = int(os.getenv('SNAPSHOT_EVERY_DAYS', '1'))
+KEEP_DAYS = int(os.getenv('SNAPSHOT_KEEP_DAYS', '35'))
+KEEP_MONTHS = int(os.getenv('SNAPSHOT_KEEP_MONTHS', '24'))
+
+
+if __name__ == '__main__':
+    import storage
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'take'
+    if command == 'take':
+        taken = 0
+        for database in storage.get_database().databases():
+            with database.transaction() as repo:
+                taken += repo.take_snapshots()
+        print(f"Took {taken} ledger snapshots")
+    elif command == 'compact':
+        keep_days = int(sys.argv[2]) if len(sys.argv) > 2 else KEEP_DAYS
+        keep_months = int(sys.argv[3]) if len(sys.argv) > 3 else KEEP_MONTHS
+        snapshots, entries = 0, 0
+        for database in storage.get_database().databases():
+            with database.transaction() as repo:
+                removed = repo.compact_snapshots(keep_days, keep_months)
+            snapshots += removed[0]
+            entries += removed[1]
+        print(f"Removed {snapshots} ledger snapshots and {entries} ledger entries")
+    else:
+        sys.exit('usage: python snapshots.py take | compact [keep days] [keep months]')
@@ -0,0 +1,40 @@
+"""Rule-based split storage behind pending payments, balances and settlements.
+
+An equal split used to be one expense_split row per member who owes the
+payer, so every expense in a 500-member group wrote 499 rows. Now it is one
+expense_split_rule row: the share, the payer, and member_seq, the newest
+group_members id when the expense was created. The members owing it are
+everyone in the group with an id up to member_seq, except the payer;
+members who join later have higher ids and are left out. expense_split only
+holds exceptions, a member's own amount (0 takes them out), plus every split
+of an expense without a rule. Readers resolve both through
+Repository.split_source().
+
+A member leaving a group takes their membership id with them, so removing
+members first writes their rule shares out as expense_split rows.
+
+Convert databases written before rules existed, a transaction per batch of
+expenses (safe to run again):
+
+    python splits.py compact [batch]
+"""
+import sys
+
+
+if __name__ == '__main__':
+    import storage
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'compact'
+    if command != 'compact':
+        sys.exit('usage: python splits.py compact [batch]')
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    converted, removed = 0, 0
+    for database in storage.get_database().databases():
+        last = ''
+        while last is not None:
+            # One transaction per batch keeps each one's locks short
+            with database.transaction() as repo:
+                last, done, rows = repo.compact_splits(last, batch)
+            converted += done
+            removed += rows
+    print(f"Converted {converted} expenses to split rules, removing {removed} split rows")
@@ -0,0 +1,157 @@
+"""Vectorized spending statistics behind /api/analytics/stats.
+
+A SpendFrame holds one user's or group's expenses as NumPy columns, loaded
+once from the database. Every statistic is then an array operation over
+those columns:
+- percentiles of expense amounts;
+- a rolling average of daily spend;
+- month-over-month deltas;
+- robust outliers, by median/MAD z-score;
+- each member's fairness ratio, meaning what they paid over their share.
+No statistic iterates rows in Python.
+benchmarks/analytics.py compares this with the equivalent pure-Python loops.
+"""
+import numpy as np
+
+PERCENTILES = (50, 75, 90, 95, 99)
+# Iglewicz & Hoaglin: modified z-scores above 3.5 are outliers
+OUTLIER_THRESHOLD = 3.5
+
+
+def _days(dates):
+    """'YYYY-MM-DD' strings as datetime64[D]; blank or malformed dates become NaT"""
+    try:
+        return np.array(dates, dtype='datetime64[D]')
+    except ValueError:
+        out = np.empty(len(dates), dtype='datetime64[D]')
+        for i, value in enumerate(dates):
+            try:
+                out[i] = np.datetime64(value, 'D')
+            except ValueError:
+                out[i] = np.datetime64('NaT')
+        return out
+
+
+class SpendFrame:
+    """Columnar view of a set of expenses"""
+    __slots__ = ('ids', 'titles', 'amounts', 'days', 'payer_names', 'payers', 'owed_by_others')
+
+    def __init__(self, ids, titles, amounts, dates, payers, owed_by_others):
+        self.ids = ids
+        self.titles = titles
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.days = _days(dates)
+        # Dictionary-encode payers; np.unique over Python strings sorts objects and is far slower
+        codes = {}
+        self.payers = np.fromiter((codes.setdefault(p, len(codes)) for p in payers), dtype=np.intp, count=len(payers))
+        self.payer_names = list(codes)
+        self.owed_by_others = np.asarray(owed_by_others, dtype=np.float64)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From (id, title, amount, date, paid_by, owed_by_others) rows"""
+        if not rows:
+            return cls([], [], [], [], [], [])
+        ids, titles, amounts, dates, payers, owed = zip(*rows)
+        return cls(list(ids), list(titles), amounts, [str(d) for d in dates], payers, owed)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def summary(self):
+        if not len(self):
+            return {'count': 0, 'total': 0.0, 'mean': 0.0, 'std': 0.0, 'percentiles': {}}
+        values = np.percentile(self.amounts, PERCENTILES)
+        return {
+            'count': int(len(self)),
+            'total': float(self.amounts.sum()),
+            'mean': float(self.amounts.mean()),
+            'std': float(self.amounts.std()),
+            'percentiles': {f'p{q}': float(v) for q, v in zip(PERCENTILES, values)}
+        }
+
+    def _dated(self):
+        valid = ~np.isnat(self.days)
+        return self.days[valid], self.amounts[valid]
+
+    def rolling_average(self, window=7, points=90):
+        """Mean daily spend over a trailing window, for the last `points` days of data"""
+        days, amounts = self._dated()
+        if not len(days):
+            return []
+        first, last = days.min(), days.max()
+        start = max(first, last - np.timedelta64(points + window - 2, 'D'))
+        keep = days >= start
+        offsets = (days[keep] - start).astype(np.int64)
+        daily = np.bincount(offsets, weights=amounts[keep], minlength=int((last - start).astype(np.int64)) + 1)
+
+        # Days before `start` never contribute, so the earliest windows are partial sums
+        sums = np.cumsum(np.concatenate(([0.0], daily)))
+        lo = np.maximum(np.arange(1, len(daily) + 1) - window, 0)
+        averages = (sums[1:] - sums[lo]) / window
+        labels = np.arange(start, last + np.timedelta64(1, 'D'))
+        return [{'date': str(d), 'average': round(float(a), 2)}
+                for d, a in zip(labels[-points:], averages[-points:])]
+
+    def month_over_month(self, months=12):
+        """Monthly totals with the change from the previous month"""
+        days, amounts = self._dated()
+        if not len(days):
+            return []
+        month = days.astype('datetime64[M]')
+        first = month.min()
+        totals = np.bincount((month - first).astype(np.int64), weights=amounts)
+        previous = np.concatenate(([np.nan], totals[:-1]))
+        delta = totals - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(previous > 0, delta / previous, np.nan)
+        labels = np.arange(first, first + np.timedelta64(len(totals), 'M'))
+        return [{
+            'month': str(m),
+            'total': round(float(t), 2),
+            'delta': None if np.isnan(d) else round(float(d), 2),
+            'change': None if np.isnan(c) else round(float(c), 4)
+        } for m, t, d, c in zip(labels[-months:], totals[-months:], delta[-months:], change[-months:])]
+
+    def outliers(self, threshold=OUTLIER_THRESHOLD, limit=10):
+        """Expenses whose modified z-score exceeds the threshold, largest first"""
+        if len(self) < 3:
+            return []
+        median = np.median(self.amounts)
+        deviation = np.abs(self.amounts - median)
+        mad = np.median(deviation)
+        if mad == 0:
+            # Over half the amounts are identical; fall back to the mean deviation
+            mad = deviation.mean() / 0.7979
+            if mad == 0:
+                return []
+        scores = 0.6745 * deviation / mad
+        flagged = np.flatnonzero(scores > threshold)
+        top = flagged[np.argsort(-scores[flagged], kind='stable')][:limit]
+        return [{
+            'id': self.ids[i],
+            'title': self.titles[i],
+            'amount': float(self.amounts[i]),
+            'date': None if np.isnat(self.days[i]) else str(self.days[i]),
+            'score': round(float(scores[i]), 2)
+        } for i in top]
+
+    def fairness(self, split_totals):
+        """Per member: amount paid, fair share and their ratio (1.0 = paid exactly their share).
+
+        split_totals maps each member to the split amounts they owe others;
+        a payer's own share of an expense is whatever the splits leave over.
+        """
+        count = len(self.payer_names)
+        paid = np.bincount(self.payers, weights=self.amounts, minlength=count)
+        own_share = np.bincount(self.payers, weights=self.amounts - self.owed_by_others, minlength=count)
+        members = {name: (float(p), float(s)) for name, p, s in zip(self.payer_names, paid, own_share)}
+        for name, owed in split_totals.items():
+            p, s = members.get(name, (0.0, 0.0))
+            members[name] = (p, s + float(owed))
+        return sorted(({
+            'member': name,
+            'paid': round(p, 2),
+            'share': round(s, 2),
+            'ratio': round(p / s, 3) if s > 0 else None
+        } for name, (p, s) in members.items()), key=lambda m: m['member'])
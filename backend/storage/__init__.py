@@ -0,0 +1,76 @@
+"""Data access layer shared by every endpoint.
+
+    with storage.session() as repo:        # reads
+        repo.list_expenses(group_id)
+    with storage.transaction() as repo:    # writes, committed on exit
+        repo.create_expense(...)
+
+Sessions ask for read intent, which the MySQL backend may serve from a
+replica (expenseDB.DB_REPLICAS). Pass pin=('user', name) or ('group', id) so
+a client that just wrote reads its own writes from the primary.
+
+The backend is chosen by configure(), which create_app() calls with
+app.config['DB_BACKEND'], or else by the DB_BACKEND environment variable:
+'mysql' (default) or 'sqlite' (file at SQLITE_PATH).
+
+With DB_SHARDS set (MySQL 'host[:port][/database]' entries or SQLite file
+paths) groups are spread over several databases; see storage/sharded.py.
+Pass group= (or expense=) to session() and transaction() for work on one
+group so it runs on that group's shard.
+"""
+import os
+
+import existence
+from storage.base import EXPORTS
+from storage.errors import NotFound, Conflict, Unsupported
+
+__all__ = ['configure', 'get_database', 'after_fork', 'session', 'transaction', 'EXPORTS', 'NotFound', 'Conflict',
+           'Unsupported']
+
+_database = None
+
+
+def _open(backend, location=None):
+    if backend == 'mysql':
+        from storage.mysql import MySQLDatabase
+        return MySQLDatabase(location)
+    if backend == 'sqlite':
+        from storage.sqlite import SQLiteDatabase
+        return SQLiteDatabase(location or os.getenv('SQLITE_PATH', 'expense_tracker.sqlite3'))
+    raise ValueError(f'Unknown DB_BACKEND {backend!r}')
+
+
+def configure(backend=None, sqlite_path=None, shards=None):
+    global _database
+    backend = backend or os.getenv('DB_BACKEND', 'mysql')
+    if shards is None:
+        shards = [s.strip() for s in os.getenv('DB_SHARDS', '').split(',') if s.strip()]
+    if shards:
+        from storage.sharded import ShardedDatabase
+        database = ShardedDatabase({shard: _open(backend, shard) for shard in shards})
+    else:
+        database = _open(backend, sqlite_path)
+    _database = database
+    # Answers about one database say nothing about another
+    existence.cache.clear()
+    return database
+
+
+def get_database():
+    if _database is None:
+        configure()
+    return _database
+
+
+def after_fork():
+    """Give a forked worker its own connections (see gunicorn.conf.py)"""
+    if _database is not None:
+        _database.after_fork()
+
+
+def session(**kwargs):
+    return get_database().session(**kwargs)
+
+
+def transaction(**kwargs):
+    return get_database().transaction(**kwargs)
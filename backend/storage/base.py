@@ -0,0 +1,1623 @@
+"""SQL shared by every storage backend.
+
+A Repository is bound to one open connection for the length of a
+storage.session() or storage.transaction() block. Statements use %s
+placeholders and portable SQL; backends subclass Repository only for the few
+clauses whose syntax differs (upserts, date arithmetic, unbuffered cursors).
+"""
+import json
+import random
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+import consistency
+import existence
+import feed
+import search
+import snapshots
+from storage.errors import NotFound, Conflict
+from storage.rows import ActivityRow, ExpenseRow, PaymentRow, RecentExpenseRow, Rows
+
+def _safe_float(v, default=0.0):
+    try:
+        return float(v)
+    except Exception:
+        return float(default)
+
+# Scope of Repository.split_source() -> (condition on the explicit rows, condition on the rule's members)
+SPLIT_SCOPES = {
+    None: ('1 = 1', '1 = 1'),
+    'expense': ('o.expense_id = %s', 'r.expense_id = %s'),
+    'user': ('o.username = %s', 'gm.username = %s'),
+    'group': ('o.expense_id IN (SELECT id FROM expenses WHERE group_id = %s)', 'r.group_id = %s'),
+    'member_of': (
+        '''o.expense_id IN (SELECT e.id FROM expenses e
+                            JOIN group_members m ON m.group_id = e.group_id WHERE m.username = %s)''',
+        'r.group_id IN (SELECT group_id FROM group_members WHERE username = %s)',
+    ),
+}
+
+# What a split `es` still owes after its payment `p`, by the ledger's rule: a
+# payment counts only against its payer's split on the expense, and only up
+# to that split, so one with no split or above it leaves the ledger as it is
+STILL_OWED = '''CASE WHEN COALESCE(p.amount, 0) < es.split_amount
+                   THEN es.split_amount - COALESCE(p.amount, 0) ELSE 0 END'''
+
+# kind -> (column names, query joined to the group or membership filter)
+EXPORTS = {
+    'expenses': (
+        ['id', 'group_id', 'group_name', 'date', 'time', 'title', 'note', 'amount', 'paid_by', 'status'],
+        '''
+        SELECT e.id, e.group_id, g.name, e.date, e.time, e.category, e.note, e.amount, e.paid_by, e.status
+        FROM expenses e
+        JOIN `groups` g ON g.id = e.group_id
+        '''
+    ),
+    'splits': (
+        ['expense_id', 'group_id', 'username', 'split_amount'],
+        '''
+        SELECT es.expense_id, e.group_id, es.username, es.split_amount
+        FROM {splits} es
+        JOIN expenses e ON es.expense_id = e.id
+        '''
+    ),
+    'payments': (
+        ['id', 'expense_id', 'group_id', 'username', 'amount', 'paid_at', 'payment_method'],
+        '''
+        SELECT p.id, p.expense_id, e.group_id, p.username, p.amount, p.paid_at, p.payment_method
+        FROM payments p
+        JOIN expenses e ON p.expense_id = e.id
+        '''
+    ),
+}
+
+
+class Repository:
+    # Driver exception raised on constraint violations
+    IntegrityError = Exception
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cur = conn.cursor()
+        # Version scopes written in this unit of work
+        self.touched = set()
+        # (kind, key) rows it created, remembered by the existence cache once it commits
+        self.created = set()
+        # Change log rows inserted but not yet numbered by sequence_changes()
+        self.changes_pending = False
+
+    def close(self):
+        self.cur.close()
+
+    def _dicts(self):
+        columns = [c[0] for c in self.cur.description]
+        return [dict(zip(columns, row)) for row in self.cur.fetchall()]
+
+    # ----------------------- Dialect hooks -----------------------
+
+    def upsert(self, keys):
+        """Clause that turns an INSERT into an upsert on the given key columns;
+        'col = expr' assignments follow it and may refer to the existing row"""
+        raise NotImplementedError
+
+    def inserted(self, column):
+        """The value an upsert tried to insert into column, for use after upsert()"""
+        raise NotImplementedError
+
+    def days_ago(self):
+        """SQL expression for the timestamp %s days before now"""
+        raise NotImplementedError
+
+    def share_lock(self):
+        """Suffix for a SELECT whose rows (and gaps) others may not change until commit"""
+        raise NotImplementedError
+
+    def violated(self, error):
+        """'unique' or 'foreign_key': the kind of constraint an IntegrityError reports"""
+        raise NotImplementedError
+
+    def stream_cursor(self):
+        """Cursor that fetches rows lazily as it is iterated"""
+        return self.conn.cursor()
+
+    def _rows(self, row_type, query, args):
+        """Rows of a query, read from its own unbuffered cursor"""
+        cursor = self.stream_cursor()
+        cursor.execute(query, args)
+        return Rows(row_type, cursor)
+
+    # ----------------------- Existence -----------------------
+
+    def _known(self, kind, key):
+        """Whether a user, group or (group, member) exists, if the existence cache knows"""
+        return existence.cache.get(kind, key)
+
+    def _learned(self, kind, key, exists):
+        """Cache an answer the database gave; rows this unit of work created wait for its commit"""
+        if not exists or (kind, key) not in self.created:
+            existence.cache.put(kind, key, exists)
+
+    def _created(self, *found):
+        for kind, key in found:
+            existence.cache.forget(kind, key)
+        self.created.update(found)
+
+    def _exists(self, kind, key, query, args):
+        known = self._known(kind, key)
+        if known is not None:
+            return known
+        self.cur.execute(query, args)
+        found = self.cur.fetchone() is not None
+        self._learned(kind, key, found)
+        return found
+
+    # ----------------------- Users -----------------------
+
+    def user_exists(self, username):
+        return self._exists('user', username, "SELECT username FROM users WHERE username = %s", (username,))
+
+    def create_user(self, username, password_hash):
+        if self._known('user', username):
+            raise Conflict('Username already exists')
+        try:
+            self.cur.execute(
+                "INSERT INTO users (username, password) VALUES (%s, %s)",
+                (username, password_hash)
+            )
+        except self.IntegrityError:
+            self._learned('user', username, True)
+            raise Conflict('Username already exists')
+        self._created(('user', username))
+        self.bump_versions(('user', username))
+
+    def put_user(self, username, password_hash):
+        """Insert the user, or overwrite their password hash if they exist; a registration retried on a shard"""
+        self.cur.execute(f'''
+            INSERT INTO users (username, password) VALUES (%s, %s)
+            {self.upsert('username')} password = {self.inserted('password')}
+        ''', (username, password_hash))
+        self.bump_versions(('user', username))
+
+    def password_hash(self, username):
+        """The user's password hash, or None if there is no such user"""
+        if self._known('user', username) is False:
+            return None
+        self.cur.execute("SELECT password FROM users WHERE username = %s", (username,))
+        row = self.cur.fetchone()
+        self._learned('user', username, row is not None)
+        return row[0] if row else None
+
+    # ----------------------- Groups -----------------------
+
+    def create_group(self, group_id, name, owner):
+        # The owner's foreign key is the existence check
+        if self._known('user', owner) is False:
+            raise NotFound('User not found')
+        try:
+            self.cur.execute(
+                "INSERT INTO `groups` (id, name, created_by) VALUES (%s, %s, %s)",
+                (group_id, name, owner)
+            )
+        except self.IntegrityError as e:
+            if self.violated(e) == 'foreign_key':
+                self._learned('user', owner, False)
+                raise NotFound('User not found')
+            raise
+        # Add creator as member
+        self.cur.execute(
+            "INSERT INTO group_members (group_id, username) VALUES (%s, %s)",
+            (group_id, owner)
+        )
+        self._created(('group', group_id), ('member', (group_id, owner)))
+        self.bump_versions(('group', group_id), ('user', owner))
+        self.record_change(group_id, 'member', owner, 'insert', {'username': owner})
+
+    def group_exists(self, group_id):
+        return self._exists('group', group_id, "SELECT id FROM `groups` WHERE id = %s", (group_id,))
+
+    def group_name(self, group_id):
+        self.cur.execute("SELECT name FROM `groups` WHERE id = %s", (group_id,))
+        row = self.cur.fetchone()
+        return row[0] if row else None
+
+    def group_ids_for_user(self, username):
+        self.cur.execute("SELECT group_id FROM group_members WHERE username = %s", (username,))
+        return [row[0] for row in self.cur.fetchall()]
+
+    def groups_for_user(self, username):
+        """Groups the user belongs to, newest first, with their members"""
+        self.cur.execute('''
+            SELECT g.id, g.name, g.created_by as owner
+            FROM `groups` g
+            INNER JOIN group_members gm ON g.id = gm.group_id
+            WHERE gm.username = %s
+            ORDER BY g.created_at DESC
+        ''', (username,))
+        groups = [{'id': row[0], 'name': row[1], 'owner': row[2], 'members': []} for row in self.cur.fetchall()]
+        by_id = {g['id']: g for g in groups}
+
+        # Fetch members of all those groups in one query
+        self.cur.execute('''
+            SELECT m.group_id, m.username
+            FROM group_members m
+            INNER JOIN group_members gm ON m.group_id = gm.group_id
+            WHERE gm.username = %s
+        ''', (username,))
+        for group_id, member in self.cur.fetchall():
+            by_id[group_id]['members'].append(member)
+        return groups
+
+    def add_member(self, group_id, username):
+        # Foreign keys check the group and user, the unique key the membership;
+        # only a failed insert pays for the query that tells which was missing
+        if self._known('group', group_id) is False:
+            raise NotFound('Group not found')
+        if self._known('user', username) is False:
+            raise NotFound('User not found')
+        if self._known('member', (group_id, username)):
+            raise Conflict('User is already a member')
+        try:
+            self.cur.execute(
+                "INSERT INTO group_members (group_id, username) VALUES (%s, %s)",
+                (group_id, username)
+            )
+        except self.IntegrityError as e:
+            if self.violated(e) == 'unique':
+                self._learned('member', (group_id, username), True)
+                raise Conflict('User is already a member')
+            if self.violated(e) == 'foreign_key':
+                if not self.group_exists(group_id):
+                    raise NotFound('Group not found')
+                self._learned('user', username, False)
+                raise NotFound('User not found')
+            raise
+        self._created(('member', (group_id, username)))
+        self.backfill_feed(group_id, [username])
+        self.bump_versions(('group', group_id), ('user', username))
+        self.record_change(group_id, 'member', username, 'insert', {'username': username})
+
+    def update_members(self, group_id, add=(), remove=()):
+        """Add and remove many members with a fixed number of statements.
+
+        Returns {username: status} for every name given: 'added',
+        'already_member' or 'not_found' for additions; 'removed',
+        'not_member', 'owner' or 'unsettled' (they still owe or are owed
+        money in the group) for removals.
+        """
+        self.cur.execute("SELECT created_by FROM `groups` WHERE id = %s", (group_id,))
+        row = self.cur.fetchone()
+        self._learned('group', group_id, row is not None)
+        if row is None:
+            raise NotFound('Group not found')
+        owner = row[0]
+
+        # One query tells which names are users and which of them are members already
+        names = list(dict.fromkeys(list(add) + list(remove)))
+        placeholders = ', '.join(['%s'] * len(names))
+        self.cur.execute(f'''
+            SELECT u.username, gm.username
+            FROM users u
+            LEFT JOIN group_members gm ON gm.group_id = %s AND gm.username = u.username
+            WHERE u.username IN ({placeholders})
+        ''', [group_id] + names)
+        members = {}
+        for username, member in self.cur.fetchall():
+            members[username] = member is not None
+            self._learned('user', username, True)
+            self._learned('member', (group_id, username), member is not None)
+
+        results = {}
+        for username in add:
+            if username not in members:
+                results[username] = 'not_found'
+            elif members[username]:
+                results[username] = 'already_member'
+            else:
+                results[username] = 'added'
+        for username in remove:
+            if username in results:
+                continue
+            if not members.get(username):
+                results[username] = 'not_member'
+            elif username == owner:
+                results[username] = 'owner'
+            else:
+                results[username] = 'removed'
+
+        removing = [u for u in results if results[u] == 'removed']
+        if removing:
+            # Both orientations of a balance are stored, so the debtor side covers money owed either way
+            placeholders = ', '.join(['%s'] * len(removing))
+            self.cur.execute(f'''
+                SELECT DISTINCT debtor FROM balance_ledger
+                WHERE group_id = %s AND debtor IN ({placeholders})
+                    AND (amount > 0.005 OR amount < -0.005)
+            ''', [group_id] + removing)
+            for (username,) in self.cur.fetchall():
+                results[username] = 'unsettled'
+            removing = [u for u in removing if results[u] == 'removed']
+        adding = [u for u in results if results[u] == 'added']
+
+        if adding:
+            # The unique key still catches a member added concurrently since the query above
+            try:
+                self.cur.executemany(
+                    "INSERT INTO group_members (group_id, username) VALUES (%s, %s)",
+                    [(group_id, username) for username in adding]
+                )
+            except self.IntegrityError as e:
+                if self.violated(e) == 'unique':
+                    raise Conflict('Members changed while updating, try again')
+                raise
+            self._created(*[('member', (group_id, username)) for username in adding])
+            self.backfill_feed(group_id, adding)
+        if removing:
+            # Their shares of earlier expenses stay, though the rules no longer reach them
+            self.pin_split_shares(group_id, removing)
+            placeholders = ', '.join(['%s'] * len(removing))
+            self.cur.execute(
+                f"DELETE FROM group_members WHERE group_id = %s AND username IN ({placeholders})",
+                [group_id] + removing
+            )
+            self.cur.execute(
+                f"DELETE FROM activity_feed WHERE group_id = %s AND username IN ({placeholders})",
+                [group_id] + removing
+            )
+            for username in removing:
+                existence.cache.forget('member', (group_id, username))
+
+        if adding or removing:
+            self.bump_versions(('group', group_id), *[('user', u) for u in adding + removing])
+            self.record_changes(group_id, [('member', u, 'insert', {'username': u}) for u in adding]
+                                + [('member', u, 'delete', None) for u in removing])
+        return results
+
+    # ----------------------- Expenses -----------------------
+
+    def create_expense(self, expense_id, group_id, title, amount, date, paid_by, notes, split_type='equal'):
+        """Insert an expense, its splits and search terms; returns the expense as the API shows it"""
+        if self._known('group', group_id) is False:
+            raise NotFound('Group not found')
+        if self._known('user', paid_by) is False:
+            raise NotFound(f'User {paid_by} not found')
+
+        current_time = datetime.now().strftime('%H:%M')
+        # Selecting from the group inserts nothing if it does not exist; the payer's foreign key checks them
+        try:
+            self.cur.execute('''
+                INSERT INTO expenses (id, group_id, amount, category, note, date, time, paid_by)
+                SELECT %s, id, %s, %s, %s, %s, %s, %s FROM `groups` WHERE id = %s
+            ''', (expense_id, amount, title, notes, date, current_time, paid_by, group_id))
+        except self.IntegrityError as e:
+            if self.violated(e) == 'foreign_key':
+                self._learned('user', paid_by, False)
+                raise NotFound(f'User {paid_by} not found')
+            raise
+        if self.cur.rowcount == 0:
+            self._learned('group', group_id, False)
+            raise NotFound('Group not found')
+
+        # Group name and all members for splitting, in one query; the share
+        # lock keeps a member from joining (with a lower id) until this commits
+        self.cur.execute(f'''
+            SELECT g.name, gm.username, gm.id
+            FROM `groups` g
+            LEFT JOIN group_members gm ON gm.group_id = g.id
+            WHERE g.id = %s
+            {self.share_lock()}
+        ''', (group_id,))
+        rows = self.cur.fetchall()
+        group_name = rows[0][0]
+        members = [row[1] for row in rows if row[1] is not None]
+
+        # Equal split among ALL members (including payer) for fairness,
+        # but only OTHERS owe the payer. One rule row stands for every
+        # member's share: members up to the newest one now, except the payer.
+        if split_type == 'equal' and members:
+            share = amount / len(members)               # everyone’s fair share
+            self.cur.execute('''
+                INSERT INTO expense_split_rule (expense_id, group_id, paid_by, share, member_seq)
+                VALUES (%s, %s, %s, %s, %s)
+            ''', (expense_id, group_id, paid_by, share, max(row[2] for row in rows if row[1] is not None)))
+            self.adjust_ledger(group_id, paid_by, [(member, share) for member in members])
+
+        expense = {
+            'id': expense_id,
+            'groupId': group_id,
+            'amount': amount,
+            'title': title,
+            'note': notes,
+            'date': date,
+            'paidBy': paid_by
+        }
+        self.index_expense(expense_id, group_id, search.expense_terms(title, notes, paid_by, group_name))
+        self.roll_up_spend(group_id, date, paid_by, title, amount, 1)
+        self.fan_out(group_id, [
+            (member, 'expense', expense_id, group_id, group_name, paid_by, title, notes, amount, date)
+            for member in members
+        ])
+        self.bump_versions(('group', group_id))
+        self.record_change(group_id, 'expense', expense_id, 'insert', expense)
+        return expense
+
+    def list_expenses(self, group_id):
+        return self._rows(ExpenseRow, '''
+            SELECT id, amount, category, note, date, paid_by
+            FROM expenses
+            WHERE group_id = %s
+            ORDER BY date DESC, time DESC
+        ''', (group_id,))
+
+    def delete_expense(self, expense_id):
+        """Delete an expense with its splits; returns its group id, or None if it did not exist"""
+        self.cur.execute('SELECT group_id, paid_by, date, category, amount FROM expenses WHERE id = %s', (expense_id,))
+        row = self.cur.fetchone()
+
+        if row:
+            self.roll_up_spend(row[0], row[2], row[1], row[3], -float(row[4]), -1)
+            # Take back whatever is still owed on it
+            splits, args = self.split_source('expense', expense_id)
+            self.cur.execute(f'''
+                SELECT es.username, {STILL_OWED}
+                FROM {splits} es
+                LEFT JOIN payments p ON p.expense_id = es.expense_id AND p.username = es.username
+            ''', args)
+            self.adjust_ledger(row[0], row[1], [(debtor, -float(owed)) for debtor, owed in self.cur.fetchall()])
+
+        # Delete the splits first (foreign key constraint)
+        self.cur.execute('DELETE FROM expense_split WHERE expense_id = %s', (expense_id,))
+        self.cur.execute('DELETE FROM expense_split_rule WHERE expense_id = %s', (expense_id,))
+        self.cur.execute('DELETE FROM expense_terms WHERE expense_id = %s', (expense_id,))
+        self.cur.execute('DELETE FROM activity_feed WHERE ref_id = %s', (expense_id,))
+        self.cur.execute('DELETE FROM expenses WHERE id = %s', (expense_id,))
+
+        if not row:
+            return None
+        self.bump_versions(('group', row[0]))
+        self.record_change(row[0], 'expense', expense_id, 'delete')
+        return row[0]
+
+    def recent_expenses(self, username, limit=5):
+        """Latest expenses from groups where user is a member, from their activity feed"""
+        return self._rows(RecentExpenseRow, '''
+            SELECT ref_id, amount, title, note, date, actor, group_name
+            FROM activity_feed
+            WHERE username = %s AND kind = 'expense'
+            ORDER BY date DESC, id DESC
+            LIMIT %s
+        ''', (username, limit))
+
+    # ----------------------- Search -----------------------
+
+    def index_expense(self, expense_id, group_id, terms):
+        self.cur.executemany('''
+            INSERT INTO expense_terms (term, group_id, expense_id, weight)
+            VALUES (%s, %s, %s, %s)
+        ''', [(term, group_id, expense_id, weight) for term, weight in terms.items()])
+
+    def reindex_expenses(self, batch=1000):
+        """Rebuild expense_terms from scratch; returns the number of expenses indexed"""
+        self.cur.execute("DELETE FROM expense_terms")
+        self.cur.execute('''
+            SELECT e.id, e.group_id, e.category, e.note, e.paid_by, g.name
+            FROM expenses e
+            JOIN `groups` g ON g.id = e.group_id
+        ''')
+        rows = self.cur.fetchall()
+        for start in range(0, len(rows), batch):
+            self.cur.executemany('''
+                INSERT INTO expense_terms (term, group_id, expense_id, weight)
+                VALUES (%s, %s, %s, %s)
+            ''', [(term, group_id, expense_id, weight)
+                  for expense_id, group_id, title, note, payer, group in rows[start:start + batch]
+                  for term, weight in search.expense_terms(title, note, payer, group).items()])
+        return len(rows)
+
+    def search_expenses(self, username, terms, group_id=None, payer=None, date_from=None,
+                        date_to=None, min_amount=None, max_amount=None, limit=20, offset=0):
+        """Expenses in the user's groups matching every term as a word prefix.
+
+        Ranked by the summed field weights of the matches, newest first on
+        ties. Returns up to limit + 1 rows so the caller can tell whether
+        another page follows.
+        """
+        group_ids = self.group_ids_for_user(username)
+        if group_id:
+            group_ids = [g for g in group_ids if g == group_id]
+        if not group_ids or not terms:
+            return []
+        in_groups = ', '.join(['%s'] * len(group_ids))
+
+        # One sub-select per query term: its best-scoring match in each expense
+        parts, args = [], []
+        for term in terms:
+            low, high = search.prefix_range(term)
+            parts.append(f'''
+                SELECT expense_id, MAX(CASE WHEN term = %s THEN weight * {search.EXACT_BONUS} ELSE weight END) AS score
+                FROM expense_terms
+                WHERE term >= %s AND term < %s AND group_id IN ({in_groups})
+                GROUP BY expense_id
+            ''')
+            args += [term, low, high, *group_ids]
+
+        filters = []
+        for clause, value in (('e.paid_by = %s', payer), ('e.date >= %s', date_from), ('e.date <= %s', date_to),
+                              ('e.amount >= %s', min_amount), ('e.amount <= %s', max_amount)):
+            if value is not None:
+                filters.append(clause)
+                args.append(value)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ''
+
+        self.cur.execute(f'''
+            SELECT e.id, e.group_id, g.name, e.amount, e.category, e.note, e.date, e.paid_by, SUM(m.score) AS score
+            FROM ({' UNION ALL '.join(parts)}) m
+            JOIN expenses e ON e.id = m.expense_id
+            JOIN `groups` g ON g.id = e.group_id
+            {where}
+            GROUP BY e.id, e.group_id, g.name, e.amount, e.category, e.note, e.date, e.paid_by
+            HAVING COUNT(*) = %s
+            ORDER BY score DESC, e.date DESC, e.id
+            LIMIT %s OFFSET %s
+        ''', (*args, len(terms), limit + 1, offset))
+        return [{
+            'id': row[0],
+            'groupId': row[1],
+            'group': row[2],
+            'amount': row[3],
+            'title': row[4],
+            'note': row[5],
+            'date': row[6],
+            'paidBy': row[7],
+            'score': int(row[8])
+        } for row in self.cur.fetchall()]
+
+    # ----------------------- Analytics -----------------------
+
+    def total_spend(self, user):
+        """Total spend across groups the user is in"""
+        self.cur.execute("""
+            SELECT COALESCE(SUM(e.amount),0)
+            FROM expenses e
+            JOIN `groups` g ON g.id = e.group_id
+            JOIN group_members gm ON gm.group_id = g.id
+            WHERE gm.username = %s
+        """, (user,))
+        return float(self.cur.fetchone()[0] or 0)
+
+    def spend_by_group(self, user):
+        """Total spend per group across the groups the user is in, largest first"""
+        self.cur.execute("""
+            SELECT g.name, COALESCE(SUM(e.amount),0) AS total
+            FROM expenses e
+            JOIN `groups` g ON g.id = e.group_id
+            JOIN group_members gm ON gm.group_id = g.id
+            WHERE gm.username = %s
+            GROUP BY g.name
+            ORDER BY total DESC
+        """, (user,))
+        return [{'group': r[0], 'total': float(r[1])} for r in self.cur.fetchall()]
+
+    def spend_by_payer(self, user):
+        self.cur.execute("""
+            SELECT e.paid_by, COALESCE(SUM(e.amount),0) AS total
+            FROM expenses e
+            JOIN `groups` g ON g.id = e.group_id
+            JOIN group_members gm ON gm.group_id = g.id
+            WHERE gm.username = %s
+            GROUP BY e.paid_by
+            ORDER BY total DESC
+        """, (user,))
+        return [{'payer': r[0], 'total': float(r[1])} for r in self.cur.fetchall()]
+
+    def monthly_spend(self, user, months=6):
+        """Spend per 'YYYY-MM' for the latest months, oldest first"""
+        # Read from the daily rollups; days are 'YYYY-MM-DD' strings, so the first 7 chars are the month
+        self.cur.execute("""
+            SELECT SUBSTR(d.day, 1, 7) AS ym, COALESCE(SUM(d.total),0) AS total
+            FROM daily_spend d
+            JOIN group_members gm ON gm.group_id = d.group_id
+            WHERE gm.username = %s
+            GROUP BY ym
+            HAVING SUM(d.expenses) > 0
+            ORDER BY ym DESC
+            LIMIT %s
+        """, (user, months))
+        monthly = [{'month': r[0], 'total': float(r[1])} for r in self.cur.fetchall()]
+        return list(reversed(monthly))
+
+    def recent_for_summary(self, user, limit=10):
+        self.cur.execute("""
+            SELECT title, amount, date, group_name
+            FROM activity_feed
+            WHERE username = %s AND kind = 'expense'
+            ORDER BY date DESC, id DESC
+            LIMIT %s
+        """, (user, limit))
+        return [{'title': r[0], 'amount': float(r[1]), 'date': str(r[2]), 'group': r[3]} for r in self.cur.fetchall()]
+
+    def spend_rows(self, username=None, group_id=None):
+        """(id, title, amount, date, paid_by, owed_by_others) for a group's or user's expenses"""
+        scope, args = self._expense_scope(username, group_id)
+        splits, split_args = self._scoped_splits(username, group_id)
+        self.cur.execute(f'''
+            SELECT e.id, e.category, e.amount, e.date, e.paid_by, COALESCE(s.owed, 0)
+            FROM expenses e
+            LEFT JOIN (
+                SELECT es.expense_id, SUM(es.split_amount) AS owed FROM {splits} es GROUP BY es.expense_id
+            ) s ON s.expense_id = e.id
+            {scope}
+        ''', split_args + args)
+        return self.cur.fetchall()
+
+    def split_totals(self, username=None, group_id=None):
+        """{member: total of the splits they owe} over a group's or user's expenses"""
+        splits, args = self._scoped_splits(username, group_id)
+        self.cur.execute(f'''
+            SELECT es.username, SUM(es.split_amount)
+            FROM {splits} es
+            GROUP BY es.username
+        ''', args)
+        return {row[0]: float(row[1]) for row in self.cur.fetchall()}
+
+    def _expense_scope(self, username, group_id):
+        if group_id:
+            return 'WHERE e.group_id = %s', (group_id,)
+        return 'JOIN group_members gm ON gm.group_id = e.group_id WHERE gm.username = %s', (username,)
+
+    # ----------------------- Splits -----------------------
+
+    def split_source(self, scope=None, value=None):
+        """Derived table of the splits owed, (expense_id, username, split_amount), and its args.
+
+        An equal split is one expense_split_rule row: every member of the
+        group whose membership id is at most member_seq owes `share`, except
+        the payer. expense_split rows override it for one member each (0 takes
+        them out), and hold every split of expenses without a rule. `scope`
+        is a key of SPLIT_SCOPES, filtering both halves by `value`.
+        """
+        explicit, rule = SPLIT_SCOPES[scope]
+        sql = f'''(
+            SELECT o.expense_id, o.username, o.split_amount
+            FROM expense_split o
+            WHERE o.split_amount <> 0 AND {explicit}
+            UNION ALL
+            SELECT r.expense_id, gm.username, r.share
+            FROM expense_split_rule r
+            JOIN group_members gm ON gm.group_id = r.group_id AND gm.id <= r.member_seq
+            WHERE gm.username <> r.paid_by AND {rule}
+                AND NOT EXISTS (
+                    SELECT 1 FROM expense_split x WHERE x.expense_id = r.expense_id AND x.username = gm.username
+                )
+        )'''
+        return sql, () if scope is None else (value, value)
+
+    def _scoped_splits(self, username, group_id):
+        return self.split_source('group', group_id) if group_id else self.split_source('member_of', username)
+
+    def pin_split_shares(self, group_id, usernames):
+        """Write the shares rules give these members as expense_split rows, so they outlive the membership"""
+        placeholders = ', '.join(['%s'] * len(usernames))
+        self.cur.execute(f'''
+            INSERT INTO expense_split (expense_id, username, split_amount)
+            SELECT r.expense_id, gm.username, r.share
+            FROM expense_split_rule r
+            JOIN group_members gm ON gm.group_id = r.group_id AND gm.id <= r.member_seq
+            WHERE r.group_id = %s AND gm.username IN ({placeholders}) AND gm.username <> r.paid_by
+                AND NOT EXISTS (
+                    SELECT 1 FROM expense_split x WHERE x.expense_id = r.expense_id AND x.username = gm.username
+                )
+        ''', [group_id] + list(usernames))
+
+    def compact_splits(self, after='', batch=500):
+        """Replace the per-member split rows of up to `batch` expenses with ids above `after` by rules.
+
+        Each expense without a rule gets one sharing the most common amount
+        among its rows, covering the current members up to the newest one
+        who has a row. Members it covers without a row get a 0 override; rows
+        for anyone else, or another amount, stay. Expenses that would not
+        shrink are left alone. Returns (last expense id looked at, or None
+        when there are no more, expenses converted, rows removed).
+        """
+        self.cur.execute('''
+            SELECT e.id, e.group_id, e.paid_by
+            FROM expenses e
+            WHERE e.id > %s
+                AND EXISTS (SELECT 1 FROM expense_split es WHERE es.expense_id = e.id)
+                AND NOT EXISTS (SELECT 1 FROM expense_split_rule r WHERE r.expense_id = e.id)
+            ORDER BY e.id
+            LIMIT %s
+        ''', (after, batch))
+        expenses = self.cur.fetchall()
+        if not expenses:
+            return None, 0, 0
+        ids = [row[0] for row in expenses]
+        placeholders = ', '.join(['%s'] * len(ids))
+
+        self.cur.execute(
+            f"SELECT expense_id, username, split_amount FROM expense_split WHERE expense_id IN ({placeholders})",
+            ids
+        )
+        rows = {}
+        for expense_id, username, amount in self.cur.fetchall():
+            rows.setdefault(expense_id, {})[username] = amount
+        self.cur.execute(f'''
+            SELECT group_id, username, id FROM group_members
+            WHERE group_id IN (SELECT group_id FROM expenses WHERE id IN ({placeholders}))
+        ''', ids)
+        members = {}
+        for group_id, username, seq in self.cur.fetchall():
+            members.setdefault(group_id, {})[username] = seq
+
+        rules, matched, exclusions = [], [], []
+        for expense_id, group_id, paid_by in expenses:
+            splits = rows[expense_id]
+            seqs = members.get(group_id, {})
+            share = Counter(splits.values()).most_common(1)[0][0]
+            holders = [seqs[u] for u, amount in splits.items() if amount == share and u in seqs]
+            if not holders:
+                continue
+            member_seq = max(holders)
+            covered = [u for u, seq in seqs.items() if seq <= member_seq and u != paid_by]
+            same = [u for u in covered if splits.get(u) == share]
+            missing = [u for u in covered if u not in splits]
+            if len(same) <= len(missing):
+                continue
+            rules.append((expense_id, group_id, paid_by, share, member_seq))
+            matched += [(expense_id, u) for u in same]
+            exclusions += [(expense_id, u, 0) for u in missing]
+
+        if rules:
+            self.cur.executemany('''
+                INSERT INTO expense_split_rule (expense_id, group_id, paid_by, share, member_seq)
+                VALUES (%s, %s, %s, %s, %s)
+            ''', rules)
+            self.cur.executemany("DELETE FROM expense_split WHERE expense_id = %s AND username = %s", matched)
+            if exclusions:
+                self.cur.executemany(
+                    "INSERT INTO expense_split (expense_id, username, split_amount) VALUES (%s, %s, %s)",
+                    exclusions
+                )
+        return ids[-1], len(rules), len(matched) - len(exclusions)
+
+    # ----------------------- Payments -----------------------
+
+    def payment_splits(self, username):
+        """Every split the user owes someone else, with its payment status"""
+        splits, args = self.split_source('user', username)
+        self.cur.execute(f"""
+            SELECT
+                e.id as expense_id,
+                e.category as title,
+                e.date,
+                e.paid_by,
+                e.amount as total_amount,
+                es.split_amount as amount_owed,
+                g.name as group_name,
+                g.id as group_id,
+                CASE
+                    WHEN p.id IS NOT NULL THEN 'paid'
+                    ELSE 'pending'
+                END as payment_status
+            FROM {splits} es
+            JOIN expenses e ON es.expense_id = e.id
+            JOIN `groups` g ON e.group_id = g.id
+            LEFT JOIN payments p ON es.expense_id = p.expense_id AND es.username = p.username
+            WHERE e.paid_by <> %s
+            ORDER BY e.date DESC
+        """, args + (username,))
+        return self._dicts()
+
+    def pending_totals(self, user):
+        splits, args = self.split_source('user', user)
+        self.cur.execute(f"""
+            SELECT COUNT(*), COALESCE(SUM(es.split_amount),0)
+            FROM {splits} es
+            JOIN expenses e ON es.expense_id = e.id
+            LEFT JOIN payments p ON es.expense_id = p.expense_id AND es.username = p.username
+            WHERE e.paid_by <> %s
+                AND p.id IS NULL
+        """, args + (user,))
+        count, owed = self.cur.fetchone()
+        return {'count': int(count), 'totalOwed': float(owed or 0)}
+
+    def make_payment(self, expense_id, username, amount):
+        """Record a payment and update the expense status; returns the expense's group id"""
+        try:
+            self.cur.execute("""
+                INSERT INTO payments (expense_id, username, amount, payment_method)
+                VALUES (%s, %s, %s, 'manual')
+            """, (expense_id, username, amount))
+        except self.IntegrityError as e:
+            if self.violated(e) == 'unique':
+                raise Conflict('Already paid')
+            if self.violated(e) == 'foreign_key':
+                self.cur.execute("SELECT id FROM expenses WHERE id = %s", (expense_id,))
+                if not self.cur.fetchone():
+                    raise NotFound('Expense not found')
+                self._learned('user', username, False)
+                raise NotFound('User not found')
+            raise
+
+        self.cur.execute("SELECT group_id, paid_by FROM expenses WHERE id = %s", (expense_id,))
+        group_row = self.cur.fetchone()
+        splits, args = self.split_source('expense', expense_id)
+        if group_row:
+            # Counted as expected_ledger() counts it, up to the payer's split (see STILL_OWED)
+            self.cur.execute(f"SELECT SUM(es.split_amount) FROM {splits} es WHERE es.username = %s",
+                             args + (username,))
+            owed = float(self.cur.fetchone()[0] or 0)
+            self.adjust_ledger(group_row[0], group_row[1], [(username, -max(0.0, min(float(amount), owed)))])
+            self.fan_out_payment(group_row[0], expense_id, username, amount)
+
+        # Check if all members have paid
+        self.cur.execute(f"""
+            SELECT COUNT(DISTINCT es.username) as total_members,
+                   COUNT(DISTINCT p.username) as paid_members
+            FROM {splits} es
+            LEFT JOIN payments p ON es.expense_id = p.expense_id AND es.username = p.username
+        """, args)
+        result = self.cur.fetchone()
+        if result and result[0] == result[1]:
+            status = 'paid'
+            self.cur.execute("UPDATE expenses SET status = 'paid' WHERE id = %s", (expense_id,))
+        else:
+            status = 'partial'
+            self.cur.execute(
+                "UPDATE expenses SET status = 'partial' WHERE id = %s AND status = 'pending'",
+                (expense_id,)
+            )
+
+        if not group_row:
+            return None
+        group_id = group_row[0]
+        self.bump_versions(('group', group_id))
+        self.record_changes(group_id, [
+            ('payment', f'{expense_id}:{username}', 'insert',
+             {'expenseId': expense_id, 'username': username, 'amount': amount}),
+            ('expense', expense_id, 'update', {'status': status}),
+        ])
+        return group_id
+
+    def payment_history(self, username, limit=20):
+        return self._rows(PaymentRow, """
+            SELECT
+                p.id,
+                p.amount,
+                p.paid_at,
+                p.payment_method,
+                e.category as expense_title,
+                g.name as group_name
+            FROM payments p
+            JOIN expenses e ON p.expense_id = e.id
+            JOIN `groups` g ON e.group_id = g.id
+            WHERE p.username = %s
+            ORDER BY p.paid_at DESC
+            LIMIT %s
+        """, (username, limit))
+
+    def group_balances(self, group_id):
+        """Net balance per member: positive should RECEIVE, negative OWES"""
+        bal = {}
+        # Who paid how much total in the group
+        self.cur.execute(
+            "SELECT e.paid_by, COALESCE(SUM(e.amount),0) FROM expenses e WHERE e.group_id = %s GROUP BY e.paid_by",
+            (group_id,)
+        )
+        for payer, total_paid in self.cur.fetchall():
+            bal[payer] = bal.get(payer, 0.0) + _safe_float(total_paid)
+
+        # How much each user owes (their splits)
+        splits, args = self.split_source('group', group_id)
+        self.cur.execute(f"""
+            SELECT es.username, COALESCE(SUM(es.split_amount),0)
+            FROM {splits} es
+            GROUP BY es.username
+        """, args)
+        for uname, owed in self.cur.fetchall():
+            bal[uname] = bal.get(uname, 0.0) - _safe_float(owed)
+        return bal
+
+    # ----------------------- Daily rollups -----------------------
+
+    # Rollup table -> the column it is broken down by besides group and day.
+    # Categories are free-text titles, so they get their own table to keep
+    # daily_spend at a handful of rows per group per day.
+    ROLLUPS = {'daily_spend': 'paid_by', 'daily_category_spend': 'category'}
+
+    def roll_up_spend(self, group_id, day, paid_by, category, amount, count):
+        """Add an expense (count=1) or take one back (count=-1) in the daily rollups"""
+        for table, column in self.ROLLUPS.items():
+            self.cur.execute(f'''
+                INSERT INTO {table} (group_id, day, {column}, total, expenses) VALUES (%s, %s, %s, %s, %s)
+                {self.upsert(f'group_id, day, {column}')}
+                    total = total + {self.inserted('total')}, expenses = expenses + {self.inserted('expenses')}
+            ''', (group_id, day, paid_by if column == 'paid_by' else category, amount, count))
+
+    def rebuild_daily_spend(self):
+        """Recompute the daily rollups from expenses; returns the daily_spend row count"""
+        counts = {}
+        for table, column in self.ROLLUPS.items():
+            self.cur.execute(f"DELETE FROM {table}")
+            self.cur.execute(f'''
+                INSERT INTO {table} (group_id, day, {column}, total, expenses)
+                SELECT group_id, date, {column}, SUM(amount), COUNT(*)
+                FROM expenses
+                GROUP BY group_id, date, {column}
+            ''')
+            counts[table] = self.cur.rowcount
+        return counts['daily_spend']
+
+    def spend_series(self, username, start, end, monthly=False, breakdown=None, group_id=None):
+        """[(bucket, key, total)] for the user's groups between two 'YYYY-MM-DD' days.
+
+        bucket is the day, or 'YYYY-MM' when monthly. key is the group name,
+        payer or category for a breakdown, else None.
+        """
+        table = 'daily_category_spend' if breakdown == 'category' else 'daily_spend'
+        bucket = 'SUBSTR(d.day, 1, 7)' if monthly else 'd.day'
+        key = {'group': 'g.name', 'payer': 'd.paid_by', 'category': 'd.category'}.get(breakdown, 'NULL')
+        query = f'''
+            SELECT {bucket} AS bucket, {key} AS k, SUM(d.total)
+            FROM {table} d
+            JOIN group_members gm ON gm.group_id = d.group_id AND gm.username = %s
+            {'JOIN `groups` g ON g.id = d.group_id' if breakdown == 'group' else ''}
+            WHERE d.day >= %s AND d.day <= %s
+        '''
+        args = [username, start, end]
+        if group_id:
+            query += ' AND d.group_id = %s'
+            args.append(group_id)
+        self.cur.execute(query + ' GROUP BY bucket, k', args)
+        return [(row[0], row[1], float(row[2])) for row in self.cur.fetchall()]
+
+    # ----------------------- Ledger -----------------------
+
+    def adjust_ledger(self, group_id, creditor, debts):
+        """Add each (debtor, amount) to what debtor owes creditor in the group.
+
+        Both orientations are stored, (debtor, creditor, +x) and
+        (creditor, debtor, -x), so either user's balances are one index range.
+        The change is journaled too, for point-in-time balances.
+        """
+        rows, entries = [], []
+        for debtor, amount in debts:
+            if debtor != creditor and amount:
+                rows += [(debtor, creditor, group_id, amount), (creditor, debtor, group_id, -amount)]
+                entries.append((group_id, debtor, creditor, amount))
+        if rows:
+            self._journal_ledger(group_id, entries)
+            self.cur.executemany(f'''
+                INSERT INTO balance_ledger (debtor, creditor, group_id, amount) VALUES (%s, %s, %s, %s)
+                {self.upsert('debtor, creditor, group_id')} amount = amount + {self.inserted('amount')}
+            ''', rows)
+            if self._snapshot_due(group_id):
+                self.snapshot_ledger(group_id)
+
+    def balances(self, username):
+        """Net amount the user owes each counterparty across all groups (negative: they owe the user)"""
+        self.cur.execute('''
+            SELECT creditor, SUM(amount)
+            FROM balance_ledger
+            WHERE debtor = %s
+            GROUP BY creditor
+            HAVING SUM(amount) > 0.005 OR SUM(amount) < -0.005
+        ''', (username,))
+        return [(row[0], float(row[1])) for row in self.cur.fetchall()]
+
+    def balance_with(self, username, other):
+        """Per-group amounts the user owes `other` (negative: other owes the user)"""
+        self.cur.execute('''
+            SELECT l.group_id, g.name, l.amount
+            FROM balance_ledger l
+            JOIN `groups` g ON g.id = l.group_id
+            WHERE l.debtor = %s AND l.creditor = %s
+                AND (l.amount > 0.005 OR l.amount < -0.005)
+        ''', (username, other))
+        return [(row[0], row[1], float(row[2])) for row in self.cur.fetchall()]
+
+    def ledger_debts(self, usernames, batch=500):
+        """Every (debtor, creditor, group_id, amount) debt owed by or to one of the users, for netting.py"""
+        found = set()
+        for start in range(0, len(usernames), batch):
+            names = usernames[start:start + batch]
+            # A user's rows hold both what they owe (positive) and are owed (negative)
+            self.cur.execute(f'''
+                SELECT debtor, creditor, group_id, amount
+                FROM balance_ledger
+                WHERE debtor IN ({', '.join(['%s'] * len(names))})
+                    AND (amount > 0.005 OR amount < -0.005)
+            ''', names)
+            for debtor, creditor, group_id, amount in self.cur.fetchall():
+                amount = float(amount)
+                found.add((debtor, creditor, group_id, amount) if amount > 0 else (creditor, debtor, group_id, -amount))
+        return list(found)
+
+    def expected_ledger(self):
+        """{(debtor, creditor, group_id): amount} recomputed from splits and payments (see STILL_OWED)"""
+        splits, args = self.split_source()
+        self.cur.execute(f'''
+            SELECT es.username, e.paid_by, e.group_id, SUM({STILL_OWED})
+            FROM {splits} es
+            JOIN expenses e ON e.id = es.expense_id
+            LEFT JOIN payments p ON p.expense_id = es.expense_id AND p.username = es.username
+            WHERE es.username <> e.paid_by
+            GROUP BY es.username, e.paid_by, e.group_id
+        ''', args)
+        expected = {}
+        for debtor, creditor, group_id, amount in self.cur.fetchall():
+            amount = float(amount)
+            expected[(debtor, creditor, group_id)] = expected.get((debtor, creditor, group_id), 0.0) + amount
+            expected[(creditor, debtor, group_id)] = expected.get((creditor, debtor, group_id), 0.0) - amount
+        return expected
+
+    def audit_ledger(self, tolerance=0.01):
+        """Ledger rows that disagree with splits and payments: [(key, stored, expected)]"""
+        expected = self.expected_ledger()
+        self.cur.execute("SELECT debtor, creditor, group_id, amount FROM balance_ledger")
+        stored = {(d, c, g): float(a) for d, c, g, a in self.cur.fetchall()}
+        return [(key, stored.get(key, 0.0), expected.get(key, 0.0))
+                for key in sorted(set(stored) | set(expected))
+                if abs(stored.get(key, 0.0) - expected.get(key, 0.0)) > tolerance]
+
+    def rebuild_ledger(self):
+        """Replace the ledger with one recomputed from splits and payments; returns the row count"""
+        expected = self.expected_ledger()
+        self.cur.execute("SELECT debtor, creditor, group_id, amount FROM balance_ledger")
+        stored = {(d, c, g): float(a) for d, c, g, a in self.cur.fetchall()}
+        # Journal the corrections, so balances as of later moments include them
+        corrections = {}
+        for debtor, creditor, group_id in set(stored) | set(expected):
+            change = expected.get((debtor, creditor, group_id), 0.0) - stored.get((debtor, creditor, group_id), 0.0)
+            if debtor < creditor and abs(change) > 1e-9:
+                corrections.setdefault(group_id, []).append((group_id, debtor, creditor, change))
+        for group_id, entries in corrections.items():
+            self._journal_ledger(group_id, entries)
+
+        self.cur.execute("DELETE FROM balance_ledger")
+        self.cur.executemany('''
+            INSERT INTO balance_ledger (debtor, creditor, group_id, amount) VALUES (%s, %s, %s, %s)
+        ''', [(d, c, g, amount) for (d, c, g), amount in expected.items()])
+        return len(expected)
+
+    # ----------------------- Ledger history -----------------------
+
+    def _journal_ledger(self, group_id, entries):
+        """Append (group_id, debtor, creditor, amount) changes to the ledger journal"""
+        # The head row is written first: it keeps the group's other ledger
+        # writers out until commit, so no snapshot can miss their entries
+        self.cur.execute(f'''
+            INSERT INTO ledger_heads (group_id, pending) VALUES (%s, 1)
+            {self.upsert('group_id')} pending = pending + 1
+        ''', (group_id,))
+        self.cur.executemany(
+            "INSERT INTO ledger_entries (group_id, debtor, creditor, amount) VALUES (%s, %s, %s, %s)",
+            entries
+        )
+
+    def _snapshot_due(self, group_id):
+        self.cur.execute(f'''
+            SELECT pending >= %s OR snapshot_at < {self.days_ago()}
+            FROM ledger_heads WHERE group_id = %s
+        ''', (snapshots.EVERY_WRITES, snapshots.EVERY_DAYS, group_id))
+        row = self.cur.fetchone()
+        return bool(row and row[0])
+
+    @staticmethod
+    def _replay(owed, entries):
+        """Add (debtor, creditor, amount) changes to {(debtor, creditor): amount}, both orientations"""
+        for debtor, creditor, amount in entries:
+            owed[(debtor, creditor)] = owed.get((debtor, creditor), 0.0) + float(amount)
+            owed[(creditor, debtor)] = owed.get((creditor, debtor), 0.0) - float(amount)
+        return owed
+
+    def _journal(self, group_id, after=0, as_of=None):
+        query = "SELECT debtor, creditor, amount FROM ledger_entries WHERE group_id = %s AND id > %s"
+        args = [group_id, after]
+        if as_of is not None:
+            query += " AND created_at <= %s"
+            args.append(as_of)
+        self.cur.execute(query + " ORDER BY id", args)
+        return self.cur.fetchall()
+
+    def _journal_complete(self, group_id, owed):
+        """Whether replaying the whole journal gives the ledger `owed`, i.e. it
+        goes back to the group's first ledger write"""
+        replayed = self._replay({}, self._journal(group_id))
+        return all(abs(replayed.get(pair, 0.0) - owed.get(pair, 0.0)) <= 0.01 for pair in set(replayed) | set(owed))
+
+    def snapshot_ledger(self, group_id):
+        """Copy the group's current ledger into a new snapshot"""
+        self.cur.execute(f'''
+            INSERT INTO ledger_heads (group_id, pending, snapshot_at) VALUES (%s, 0, CURRENT_TIMESTAMP)
+            {self.upsert('group_id')} pending = 0, snapshot_at = CURRENT_TIMESTAMP
+        ''', (group_id,))
+        # Locking reads see every committed write, whenever this transaction began
+        self.cur.execute(
+            f"SELECT MAX(id) FROM ledger_entries WHERE group_id = %s {self.share_lock()}", (group_id,)
+        )
+        last_entry = self.cur.fetchone()[0] or 0
+        self.cur.execute(
+            f"SELECT debtor, creditor, amount FROM balance_ledger WHERE group_id = %s AND amount > 0 {self.share_lock()}",
+            (group_id,)
+        )
+        rows = sorted((debtor, creditor, float(amount)) for debtor, creditor, amount in self.cur.fetchall())
+
+        self.cur.execute("SELECT id FROM ledger_snapshots WHERE group_id = %s LIMIT 1", (group_id,))
+        # A first snapshot the journal cannot reproduce is of a ledger older than the journal
+        is_floor = self.cur.fetchone() is None and not self._journal_complete(group_id, self._replay({}, rows))
+        self.cur.execute('''
+            INSERT INTO ledger_snapshots (group_id, last_entry, is_floor, balances) VALUES (%s, %s, %s, %s)
+        ''', (group_id, last_entry, int(is_floor), json.dumps(rows)))
+
+    def take_snapshots(self):
+        """Snapshot every group with ledger writes since its last snapshot, or none yet; returns how many"""
+        self.cur.execute('''
+            SELECT DISTINCT l.group_id
+            FROM balance_ledger l
+            LEFT JOIN ledger_heads h ON h.group_id = l.group_id
+            WHERE h.group_id IS NULL OR h.pending > 0
+        ''')
+        group_ids = [row[0] for row in self.cur.fetchall()]
+        for group_id in group_ids:
+            self.snapshot_ledger(group_id)
+        return len(group_ids)
+
+    def ledger_as_of(self, group_id, as_of):
+        """{(debtor, creditor): amount} of the group's ledger at `as_of`, a
+        'YYYY-MM-DD HH:MM:SS' UTC timestamp, in both orientations.
+
+        Raises NotFound when the group's history does not reach back that far.
+        """
+        self.cur.execute('''
+            SELECT last_entry, balances FROM ledger_snapshots
+            WHERE group_id = %s AND taken_at <= %s
+            ORDER BY taken_at DESC, id DESC
+            LIMIT 1
+        ''', (group_id, as_of))
+        row = self.cur.fetchone()
+        if row:
+            return self._replay(self._replay({}, json.loads(row[1])), self._journal(group_id, row[0], as_of))
+
+        self.cur.execute(
+            "SELECT taken_at, is_floor FROM ledger_snapshots WHERE group_id = %s ORDER BY taken_at, id LIMIT 1",
+            (group_id,)
+        )
+        first = self.cur.fetchone()
+        if first and first[1]:
+            raise NotFound(f'No balance history for this group before {first[0]}')
+        if not first:
+            self.cur.execute("SELECT debtor, creditor, amount FROM balance_ledger WHERE group_id = %s", (group_id,))
+            if not self._journal_complete(group_id, {(d, c): float(a) for d, c, a in self.cur.fetchall()}):
+                raise NotFound('No balance history for this group yet')
+        return self._replay({}, self._journal(group_id, 0, as_of))
+
+    def group_ledger_balances(self, group_id):
+        """Net balance per member from the ledger, so after payments: positive should RECEIVE"""
+        self.cur.execute(
+            "SELECT creditor, SUM(amount) FROM balance_ledger WHERE group_id = %s GROUP BY creditor", (group_id,)
+        )
+        return {row[0]: float(row[1]) for row in self.cur.fetchall()}
+
+    def group_balances_as_of(self, group_id, as_of):
+        """group_ledger_balances() at `as_of`"""
+        net = {}
+        for (debtor, creditor), amount in self.ledger_as_of(group_id, as_of).items():
+            net[creditor] = net.get(creditor, 0.0) + amount
+        return net
+
+    def _ledger_group_ids(self, username):
+        self.cur.execute("SELECT DISTINCT group_id FROM balance_ledger WHERE debtor = %s", (username,))
+        return [row[0] for row in self.cur.fetchall()]
+
+    def balances_as_of(self, username, as_of):
+        """balances() at `as_of`"""
+        net = {}
+        for group_id in self._ledger_group_ids(username):
+            for (debtor, creditor), amount in self.ledger_as_of(group_id, as_of).items():
+                if debtor == username:
+                    net[creditor] = net.get(creditor, 0.0) + amount
+        return [(other, amount) for other, amount in sorted(net.items()) if abs(amount) > 0.005]
+
+    def balance_with_as_of(self, username, other, as_of):
+        """balance_with() at `as_of`"""
+        groups = []
+        for group_id in self._ledger_group_ids(username):
+            amount = self.ledger_as_of(group_id, as_of).get((username, other), 0.0)
+            if abs(amount) > 0.005:
+                groups.append((group_id, self.group_name(group_id), amount))
+        return groups
+
+    def compact_snapshots(self, keep_days, keep_months):
+        """Apply the retention policy in snapshots.py; returns (snapshots, entries) removed"""
+        self.cur.execute(f'''
+            SELECT id, group_id, taken_at, last_entry, taken_at >= {self.days_ago()}, taken_at >= {self.days_ago()}
+            FROM ledger_snapshots
+            ORDER BY group_id, taken_at, id
+        ''', (keep_days, keep_months * 31))
+        by_group = {}
+        for snapshot_id, group_id, taken_at, last_entry, recent, retained in self.cur.fetchall():
+            by_group.setdefault(group_id, []).append((snapshot_id, str(taken_at)[:7], last_entry, recent, retained))
+
+        dropped, entries = [], 0
+        for group_id, taken in by_group.items():
+            month_ends = {month: snapshot_id for snapshot_id, month, _, _, retained in taken if retained}
+            # The newest snapshot stays whatever its age: later balances start from it
+            keep = {s[0] for s in taken if s[3]} | set(month_ends.values()) | {taken[-1][0]}
+            kept = [s for s in taken if s[0] in keep]
+            dropped += [s[0] for s in taken if s[0] not in keep]
+            if kept[0] is not taken[0]:
+                # History before the oldest snapshot left is given up
+                self.cur.execute("UPDATE ledger_snapshots SET is_floor = 1 WHERE id = %s", (kept[0][0],))
+                self.cur.execute(
+                    "DELETE FROM ledger_entries WHERE group_id = %s AND id <= %s", (group_id, kept[0][2])
+                )
+                entries += self.cur.rowcount
+        if dropped:
+            self.cur.executemany("DELETE FROM ledger_snapshots WHERE id = %s", [(i,) for i in dropped])
+        return len(dropped), entries
+
+    # ----------------------- Activity feed -----------------------
+
+    FEED_COLUMNS = 'username, kind, ref_id, group_id, group_name, actor, title, note, amount, date'
+
+    def fan_out(self, group_id, items):
+        """Insert (username, kind, ref_id, group_id, group_name, actor, title, note, amount, date) feed items"""
+        if items:
+            self.cur.executemany(f'''
+                INSERT INTO activity_feed ({self.FEED_COLUMNS})
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', items)
+            self._sometimes_trim_feed(group_id)
+
+    def fan_out_payment(self, group_id, expense_id, username, amount):
+        """One payment item in the feed of every member of the expense's group"""
+        self.cur.execute(f'''
+            INSERT INTO activity_feed ({self.FEED_COLUMNS})
+            SELECT gm.username, 'payment', e.id, e.group_id, g.name, %s, e.category, NULL, %s, %s
+            FROM expenses e
+            JOIN `groups` g ON g.id = e.group_id
+            JOIN group_members gm ON gm.group_id = e.group_id
+            WHERE e.id = %s
+        ''', (username, amount, datetime.now().strftime('%Y-%m-%d'), expense_id))
+        self._sometimes_trim_feed(group_id)
+
+    def backfill_feed(self, group_id, usernames, keep=None):
+        """Give new members the group's latest expenses, oldest first so ids follow their order"""
+        placeholders = ', '.join(['%s'] * len(usernames))
+        self.cur.execute(f'''
+            INSERT INTO activity_feed ({self.FEED_COLUMNS})
+            SELECT u.username, 'expense', latest.id, latest.group_id, latest.name, latest.paid_by,
+                   latest.category, latest.note, latest.amount, latest.date
+            FROM (
+                SELECT e.id, e.group_id, g.name, e.paid_by, e.category, e.note, e.amount, e.date, e.time
+                FROM expenses e
+                JOIN `groups` g ON g.id = e.group_id
+                WHERE e.group_id = %s
+                ORDER BY e.date DESC, e.time DESC
+                LIMIT %s
+            ) latest
+            JOIN users u ON u.username IN ({placeholders})
+            ORDER BY latest.date, latest.time
+        ''', [group_id, keep or feed.RETENTION] + list(usernames))
+
+    def activity(self, username, limit=20):
+        """Latest feed items of every kind"""
+        return self._rows(ActivityRow, '''
+            SELECT kind, ref_id, amount, title, note, date, actor, group_name
+            FROM activity_feed
+            WHERE username = %s
+            ORDER BY date DESC, id DESC
+            LIMIT %s
+        ''', (username, limit))
+
+    def _sometimes_trim_feed(self, group_id):
+        # Trimming every write would add a statement to each; one in TRIM_EVERY keeps feeds bounded
+        if random.randrange(feed.TRIM_EVERY) == 0:
+            self.trim_feed(feed.RETENTION, group_id=group_id)
+
+    def trim_feed(self, keep, group_id=None):
+        """Drop feed items beyond the newest `keep` of each kind per user (of one group's members, if given)"""
+        scope, args = '', ()
+        if group_id:
+            scope, args = 'WHERE username IN (SELECT username FROM group_members WHERE group_id = %s)', (group_id,)
+        # The derived table is materialized first, as MySQL requires to delete from the table it reads
+        self.cur.execute(f'''
+            DELETE FROM activity_feed WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY username, kind ORDER BY date DESC, id DESC) AS n
+                    FROM activity_feed
+                    {scope}
+                ) ranked
+                WHERE n > %s
+            )
+        ''', args + (keep,))
+        return self.cur.rowcount
+
+    def rebuild_feed(self, keep):
+        """Recompute every feed from expenses and payments; returns the number of items"""
+        self.cur.execute('DELETE FROM activity_feed')
+        self.cur.execute(f'''
+            INSERT INTO activity_feed ({self.FEED_COLUMNS})
+            SELECT username, 'expense', id, group_id, name, paid_by, category, note, amount, date
+            FROM (
+                SELECT gm.username, e.id, e.group_id, g.name, e.paid_by, e.category, e.note, e.amount, e.date, e.time,
+                       ROW_NUMBER() OVER (PARTITION BY gm.username ORDER BY e.date DESC, e.time DESC) AS n
+                FROM expenses e
+                JOIN `groups` g ON g.id = e.group_id
+                JOIN group_members gm ON gm.group_id = e.group_id
+            ) ranked
+            WHERE n <= %s
+            ORDER BY date, time
+        ''', (keep,))
+        self.cur.execute(f'''
+            INSERT INTO activity_feed ({self.FEED_COLUMNS})
+            SELECT username, 'payment', expense_id, group_id, name, payer, category, NULL, amount, day
+            FROM (
+                SELECT gm.username, p.expense_id, e.group_id, g.name, p.username AS payer, e.category, p.amount,
+                       DATE(p.paid_at) AS day, p.paid_at,
+                       ROW_NUMBER() OVER (PARTITION BY gm.username ORDER BY p.paid_at DESC) AS n
+                FROM payments p
+                JOIN expenses e ON e.id = p.expense_id
+                JOIN `groups` g ON g.id = e.group_id
+                JOIN group_members gm ON gm.group_id = e.group_id
+            ) ranked
+            WHERE n <= %s
+            ORDER BY paid_at
+        ''', (keep,))
+        self.cur.execute('SELECT COUNT(*) FROM activity_feed')
+        return self.cur.fetchone()[0]
+
+    # ----------------------- Versions -----------------------
+
+    def bump_versions(self, *scopes):
+        """Increment the version of each (kind, id) scope, e.g. ('group', gid)"""
+        self.touched.update(scopes)
+        self.cur.executemany(f'''
+            INSERT INTO entity_versions (kind, entity_id, version) VALUES (%s, %s, 1)
+            {self.upsert('kind, entity_id')} version = version + 1
+        ''', scopes)
+
+    def version_token(self, kind, entity_id):
+        """Token that changes whenever data visible to the scope changes.
+
+        A group scope is just its own counter. A user scope combines the user's
+        counter (bumped on membership changes) with the sum of the counters of
+        every group the user is in, fetched in one round trip.
+        """
+        if kind == 'group':
+            self.cur.execute(
+                "SELECT version FROM entity_versions WHERE kind = 'group' AND entity_id = %s",
+                (entity_id,)
+            )
+            row = self.cur.fetchone()
+            return f"g{row[0] if row else 0}"
+
+        self.cur.execute('''
+            SELECT
+                (SELECT version FROM entity_versions WHERE kind = 'user' AND entity_id = %s),
+                (SELECT COALESCE(SUM(v.version), 0)
+                 FROM group_members gm
+                 JOIN entity_versions v ON v.kind = 'group' AND v.entity_id = gm.group_id
+                 WHERE gm.username = %s)
+        ''', (entity_id, entity_id))
+        user_version, groups_version = self.cur.fetchone()
+        return f"u{user_version or 0}.{int(groups_version or 0)}"
+
+    # ----------------------- Change log -----------------------
+
+    def record_change(self, group_id, entity, entity_id, op, data=None):
+        """Log an insert/update/delete of one entity in a group"""
+        self.record_changes(group_id, [(entity, entity_id, op, data)])
+
+    def record_changes(self, group_id, changes):
+        """Log (entity, entity_id, op, data) changes with one multi-row INSERT"""
+        self.cur.executemany('''
+            INSERT INTO change_log (group_id, entity, entity_id, op, payload)
+            VALUES (%s, %s, %s, %s, %s)
+        ''', [(group_id, entity, entity_id, op, json.dumps(data) if data is not None else None)
+              for entity, entity_id, op, data in changes])
+        self.changes_pending = True
+
+    def sequence_changes(self):
+        """Number the unsequenced change rows, just before the unit of work commits.
+
+        The seq of a row, not its auto-increment id, is the sync cursor. Ids
+        are taken at INSERT, so a transaction can commit a lower id after a
+        client has already read past it, and the client would skip it. Seqs
+        come from the ('changelog', 'seq') counter, whose row stays locked
+        until this unit of work commits: whoever takes later numbers commits
+        later, so a client that has seen seq n has seen everything below it.
+        """
+        self.cur.execute("SELECT id FROM change_log WHERE seq IS NULL ORDER BY id")
+        ids = [row[0] for row in self.cur.fetchall()]
+        self.changes_pending = False
+        if not ids:
+            return
+        self.cur.execute(f'''
+            INSERT INTO entity_versions (kind, entity_id, version) VALUES ('changelog', 'seq', %s)
+            {self.upsert('kind, entity_id')} version = version + %s
+        ''', (len(ids), len(ids)))
+        self.cur.execute("SELECT version FROM entity_versions WHERE kind = 'changelog' AND entity_id = 'seq'")
+        first = self.cur.fetchone()[0] - len(ids) + 1
+        self.cur.executemany("UPDATE change_log SET seq = %s WHERE id = %s",
+                             [(first + n, change_id) for n, change_id in enumerate(ids)])
+
+    def change_floor(self):
+        """Highest change seq that has been compacted away"""
+        self.cur.execute("SELECT version FROM entity_versions WHERE kind = 'changelog' AND entity_id = 'floor'")
+        row = self.cur.fetchone()
+        return row[0] if row else 0
+
+    def change_head(self):
+        """Newest change seq, used as the cursor of a full snapshot"""
+        self.cur.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+        return self.cur.fetchone()[0]
+
+    def changes_for_user(self, username, since, limit):
+        """Changes after seq `since` in groups the user belongs to, in commit order.
+
+        The user's own membership changes are included in groups they have
+        left too, so their client learns of the removal.
+        """
+        self.cur.execute('''
+            SELECT c.seq, c.group_id, c.entity, c.entity_id, c.op, c.payload
+            FROM change_log c
+            WHERE c.seq > %s AND (
+                c.group_id IN (SELECT group_id FROM group_members WHERE username = %s)
+                OR (c.entity = 'member' AND c.entity_id = %s))
+            ORDER BY c.seq
+            LIMIT %s
+        ''', (since, username, username, limit))
+        return [{
+            'id': row[0],
+            'groupId': row[1],
+            'entity': row[2],
+            'entityId': row[3],
+            'op': row[4],
+            'data': json.loads(row[5]) if row[5] else None
+        } for row in self.cur.fetchall()]
+
+    def compact_changes(self, days):
+        """Drop entries older than `days` and raise the floor past them"""
+        self.cur.execute(f"SELECT MAX(seq) FROM change_log WHERE created_at < {self.days_ago()}", (days,))
+        cutoff = self.cur.fetchone()[0]
+        if not cutoff:
+            return 0
+        # Rows up to the old floor are already gone, so the new cutoff is always higher
+        self.cur.execute(f'''
+            INSERT INTO entity_versions (kind, entity_id, version) VALUES ('changelog', 'floor', %s)
+            {self.upsert('kind, entity_id')} version = %s
+        ''', (cutoff, cutoff))
+        self.cur.execute("DELETE FROM change_log WHERE seq <= %s", (cutoff,))
+        return self.cur.rowcount
+
+    def sync_snapshot(self, username):
+        """Full state of the user's groups, for first sync or an expired cursor"""
+        groups = {g['id']: g for g in self.groups_for_user(username)}
+
+        self.cur.execute('''
+            SELECT e.id, e.group_id, e.amount, e.category, e.note, e.date, e.paid_by, e.status
+            FROM expenses e
+            JOIN group_members gm ON e.group_id = gm.group_id
+            WHERE gm.username = %s
+        ''', (username,))
+        expenses = [{
+            'id': row[0],
+            'groupId': row[1],
+            'amount': row[2],
+            'title': row[3],
+            'note': row[4],
+            'date': row[5],
+            'paidBy': row[6],
+            'status': row[7]
+        } for row in self.cur.fetchall()]
+
+        self.cur.execute('''
+            SELECT p.expense_id, e.group_id, p.username, p.amount
+            FROM payments p
+            JOIN expenses e ON p.expense_id = e.id
+            JOIN group_members gm ON e.group_id = gm.group_id
+            WHERE gm.username = %s
+        ''', (username,))
+        payments = [{'expenseId': row[0], 'groupId': row[1], 'username': row[2], 'amount': row[3]}
+                    for row in self.cur.fetchall()]
+
+        return {'groups': list(groups.values()), 'expenses': expenses, 'payments': payments}
+
+    # ----------------------- Export -----------------------
+
+    def export_rows(self, kind, group_id=None, username=None):
+        """Yield export rows one at a time without buffering the result"""
+        query = EXPORTS[kind][1]
+        if group_id:
+            query += " WHERE e.group_id = %s"
+            args = (group_id,)
+        else:
+            query += " JOIN group_members gm ON gm.group_id = e.group_id WHERE gm.username = %s"
+            args = (username,)
+        if kind == 'splits':
+            splits, split_args = self._scoped_splits(username, group_id)
+            query, args = query.format(splits=splits), split_args + args
+
+        cursor = self.stream_cursor()
+        cursor.execute(query, args)
+        for row in cursor:
+            yield row
+        cursor.close()
+
+
+class Database:
+    """Hands out connections and Repository objects bound to them"""
+    repository_class = Repository
+
+    def connect(self, intent='write', pin=None):
+        """DB-API connection whose close() releases it back to the backend.
+
+        intent='read' lets a backend serve the connection from a replica,
+        unless the scope `pin` was written to moments ago.
+        """
+        raise NotImplementedError
+
+    def pin(self, scopes):
+        """Route reads of these scopes to the primary for a short while"""
+
+    def abandon(self, conn):
+        """Release a connection whose result set was not fully read"""
+        conn.close()
+
+    def after_fork(self):
+        """Forget connections inherited from the parent process"""
+
+    def pool_usage(self):
+        """(connections in use, pool size) of the primary's pool, or None if not pooled"""
+        return None
+
+    def databases(self):
+        """The databases behind this one: itself, or each shard (see storage/sharded.py)"""
+        return [self]
+
+    @contextmanager
+    def session(self, stream=False, pin=None, group=None):
+        """Read-only unit of work, pinned to the primary if `pin` was just written.
+
+        `group` names the one group the work reads, which a sharded database
+        routes on; a group `pin` does the same.
+        """
+        conn = self.connect('read', pin)
+        repo = self.repository_class(conn)
+        finished = False
+        try:
+            yield repo
+            finished = True
+        finally:
+            if finished or not stream:
+                repo.close()
+                conn.close()
+            else:
+                self.abandon(conn)
+
+    @contextmanager
+    def transaction(self, pin=None, group=None, expense=None):
+        """Unit of work committed on exit, rolled back on any exception.
+
+        The scopes it bumped, plus `pin` (usually the acting user), read
+        from the primary for a while after the commit. `group`, or the group
+        of `expense`, is the one group it writes, for a sharded database.
+        """
+        conn = self.connect('write')
+        repo = self.repository_class(conn)
+        try:
+            yield repo
+            if repo.changes_pending:
+                repo.sequence_changes()
+            conn.commit()
+            existence.cache.remember(repo.created)
+            self.pin(repo.touched | {pin} if pin else repo.touched)
+            consistency.committed()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            repo.close()
+            conn.close()
@@ -0,0 +1,10 @@
+class NotFound(Exception):
+    """A referenced user, group or expense does not exist (HTTP 404)"""
+
+
+class Conflict(Exception):
+    """The write would duplicate an existing row (HTTP 409)"""
+
+
+class Unsupported(Exception):
+    """The request cannot be answered by this database layout, e.g. across shards (HTTP 400)"""
@@ -0,0 +1,59 @@
+"""MySQL backend: pooled pymysql connections from expenseDB"""
+import pymysql
+
+import expenseDB
+from expenseDB import get_connection, pin_primary, reset_pools
+from storage.base import Database, Repository
+
+
+class MySQLRepository(Repository):
+    IntegrityError = pymysql.err.IntegrityError
+
+    def upsert(self, keys):
+        return 'ON DUPLICATE KEY UPDATE'
+
+    def inserted(self, column):
+        return f'VALUES({column})'
+
+    def days_ago(self):
+        return 'NOW() - INTERVAL %s DAY'
+
+    def share_lock(self):
+        return 'LOCK IN SHARE MODE'
+
+    def violated(self, error):
+        code = error.args[0] if error.args else None
+        if code == 1062:
+            return 'unique'
+        if code in (1216, 1452):
+            return 'foreign_key'
+        return None
+
+    def stream_cursor(self):
+        # Unbuffered: rows are read off the socket as the caller iterates
+        return self.conn.cursor(pymysql.cursors.SSCursor)
+
+
+class MySQLDatabase(Database):
+    repository_class = MySQLRepository
+
+    def __init__(self, shard=None):
+        # A DB_SHARDS entry, or None for the DB_HOST primary and its replicas
+        self.shard = shard
+
+    def connect(self, intent='write', pin=None):
+        return get_connection(intent, pin, self.shard)
+
+    def pin(self, scopes):
+        pin_primary(*scopes, shard=self.shard)
+
+    def abandon(self, conn):
+        # Dropping the socket avoids draining unread rows of an SSCursor
+        conn.discard()
+
+    def after_fork(self):
+        reset_pools()
+
+    def pool_usage(self):
+        primary = expenseDB.shard_router(self.shard).primary if self.shard else expenseDB.pool
+        return primary.in_use, expenseDB.POOL_SIZE
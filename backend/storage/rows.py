@@ -0,0 +1,69 @@
+"""Compact results for the list endpoints.
+
+A row type is a namedtuple: a plain tuple with named fields and no per-row
+__dict__, whose json_keys name each field in API responses. Rows wraps the
+unbuffered cursor a query ran on and reads it CHUNK_ROWS tuples at a time,
+so serialize.json_response() can encode a large result while holding one
+chunk of it in memory rather than a dict per row of the whole result.
+
+Rows can be read once, and only inside the session that produced them; use
+storage.session(stream=True) so a response that fails half way releases its
+connection safely. dicts() reads them into the old list-of-dicts shape.
+"""
+from collections import namedtuple
+
+CHUNK_ROWS = 1000
+
+
+def row_type(name, fields):
+    """namedtuple class for ((attribute, json key), ...) pairs"""
+    cls = namedtuple(name, [attr for attr, _ in fields])
+    cls.json_keys = tuple(key for _, key in fields)
+    return cls
+
+
+ExpenseRow = row_type('ExpenseRow', (
+    ('id', 'id'), ('amount', 'amount'), ('title', 'title'), ('note', 'note'),
+    ('date', 'date'), ('paid_by', 'paidBy'),
+))
+
+RecentExpenseRow = row_type('RecentExpenseRow', (
+    ('id', 'id'), ('amount', 'amount'), ('title', 'title'), ('note', 'note'),
+    ('date', 'date'), ('paid_by', 'paidBy'), ('group', 'group'),
+))
+
+ActivityRow = row_type('ActivityRow', (
+    ('kind', 'kind'), ('id', 'id'), ('amount', 'amount'), ('title', 'title'), ('note', 'note'),
+    ('date', 'date'), ('actor', 'by'), ('group', 'group'),
+))
+
+PaymentRow = row_type('PaymentRow', (
+    ('id', 'id'), ('amount', 'amount'), ('paid_at', 'paid_at'), ('payment_method', 'payment_method'),
+    ('expense_title', 'expense_title'), ('group_name', 'group_name'),
+))
+
+
+class Rows:
+    """Rows of one row type, fetched from a cursor as they are read"""
+    __slots__ = ('row_type', 'cursor')
+
+    def __init__(self, row_type, cursor):
+        self.row_type = row_type
+        self.cursor = cursor
+
+    def chunks(self, size=CHUNK_ROWS):
+        """Lists of up to `size` cursor tuples; closes the cursor when exhausted"""
+        while True:
+            batch = self.cursor.fetchmany(size)
+            if not batch:
+                break
+            yield batch
+        self.cursor.close()
+
+    def __iter__(self):
+        for batch in self.chunks():
+            yield from map(self.row_type._make, batch)
+
+    def dicts(self):
+        keys = self.row_type.json_keys
+        return [dict(zip(keys, row)) for batch in self.chunks() for row in batch]
@@ -0,0 +1,351 @@
+"""Group-keyed sharding over several databases of one backend.
+
+Each shard is a whole database with the full schema. A group and
+everything under it (members, expenses, splits, payments, rollups, ledger,
+feed and change log rows) lives on the shard expenseDB.ShardRouter picks for
+the group's id. Users are written to every shard, since the group tables
+refer to them. The first shard is the home shard: it answers logins and
+holds the group_shards directory.
+
+- A unit of work for one group, given by group=, expense= (found by asking
+  each shard) or a ('group', id) pin, runs on that group's shard alone.
+- Any other session reads every shard through ScatterRepository, which
+  merges the per-shard answers of the user-scoped readers.
+- Any other transaction runs on every shard; registration is the one write
+  that needs it. The shards commit one after another, the home shard last,
+  so a user the home shard has is on every shard, and a registration that
+  failed half way succeeds when retried.
+- The sync change log is numbered per shard, so /api/sync is not offered;
+  clients of a sharded deployment follow /api/stream and the list endpoints.
+
+shards.py moves groups between shards.
+"""
+from contextlib import ExitStack, contextmanager
+
+from expenseDB import ShardRouter
+from storage.base import EXPORTS, Database, Repository
+from storage.errors import Unsupported
+from storage.rows import ActivityRow, PaymentRow, RecentExpenseRow, Rows
+
+
+class ShardedDatabase(Database):
+
+    def __init__(self, shards, router=None):
+        """shards: {name: Database}, the home shard first"""
+        self.shards = dict(shards)
+        self.home = next(iter(self.shards.values()))
+        self.router = router or ShardRouter(list(self.shards), load=self._load_directory)
+
+    def _load_directory(self):
+        with self.home.session() as repo:
+            repo.cur.execute('SELECT group_id, shard FROM group_shards')
+            return repo.cur.fetchall()
+
+    def databases(self):
+        return list(self.shards.values())
+
+    def shard_of(self, group_id):
+        return self.shards[self.router.shard_for(group_id)]
+
+    def _locate(self, pin, group, expense):
+        if group is None and pin and pin[0] == 'group':
+            group = pin[1]
+        if group is not None:
+            return self.shard_of(group)
+        if expense is None:
+            return None
+        for database in self.shards.values():
+            with database.session() as repo:
+                repo.cur.execute('SELECT group_id FROM expenses WHERE id = %s', (expense,))
+                row = repo.cur.fetchone()
+            if row:
+                return self.shard_of(row[0])
+        # Nowhere: let the home shard report it missing
+        return self.home
+
+    def after_fork(self):
+        for database in self.shards.values():
+            database.after_fork()
+        self.router.refresh()
+
+    def pool_usage(self):
+        usage = [u for u in (d.pool_usage() for d in self.shards.values()) if u is not None]
+        if not usage:
+            return None
+        return sum(in_use for in_use, _ in usage), sum(size for _, size in usage)
+
+    @contextmanager
+    def session(self, stream=False, pin=None, group=None):
+        database = self._locate(pin, group, None)
+        if database is not None:
+            with database.session(stream=stream, pin=pin) as repo:
+                yield repo
+            return
+        # Scattered reads are merged in memory, so nothing is left to stream
+        with ExitStack() as stack:
+            repos = {name: stack.enter_context(d.session(pin=pin)) for name, d in self.shards.items()}
+            yield ScatterRepository(self, repos)
+
+    @contextmanager
+    def transaction(self, pin=None, group=None, expense=None):
+        database = self._locate(pin, group, expense)
+        if database is not None:
+            with database.transaction(pin=pin) as repo:
+                yield repo
+            return
+        # One transaction per shard: all roll back if the work fails, but they
+        # commit one after another, not atomically, the home shard (entered
+        # first) last
+        with ExitStack() as stack:
+            repos = {name: stack.enter_context(d.transaction(pin=pin)) for name, d in self.shards.items()}
+            yield ScatterRepository(self, repos)
+
+
+class _Buffered:
+    """A list with the cursor methods Rows reads"""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._at = 0
+
+    def fetchmany(self, size):
+        batch = self._rows[self._at:self._at + size]
+        self._at += len(batch)
+        return batch
+
+    def close(self):
+        pass
+
+
+class ScatterRepository:
+    """The Repository methods that can be answered from every shard at once.
+
+    User-scoped readers ask each shard and merge the answers; readers of one
+    group ask that group's shard. Anything else needs a unit of work routed
+    to one group.
+    """
+
+    def __init__(self, database, repos):
+        self.database = database
+        # Shard name -> Repository on that shard
+        self.repos = repos
+
+    def __getattr__(self, name):
+        if hasattr(Repository, name):
+            raise Unsupported(f'{name} cannot be answered across shards')
+        raise AttributeError(name)
+
+    def _each(self, method, *args):
+        return [(shard, getattr(repo, method)(*args)) for shard, repo in self.repos.items()]
+
+    def _owner(self, group_id):
+        return self.repos[self.database.router.shard_for(group_id)]
+
+    def _owned(self, shard, group_id):
+        # Rows left behind on the old shard by an unfinished move are ignored
+        return self.database.router.shard_for(group_id) == shard
+
+    def _latest(self, method, row_type, key, username, limit):
+        rows = [row for _, found in self._each(method, username, limit) for row in found]
+        rows.sort(key=key, reverse=True)
+        return Rows(row_type, _Buffered(rows[:limit]))
+
+    @staticmethod
+    def _summed(results, key, field='total'):
+        totals = {}
+        for _, rows in results:
+            for row in rows:
+                totals[row[key]] = totals.get(row[key], 0.0) + row[field]
+        return totals
+
+    # ----------------------- Users -----------------------
+
+    def create_user(self, username, password_hash):
+        # The home shard, which answers logins, decides whether the name is
+        # taken; copies left on other shards by a failed attempt are overwritten
+        home, *others = self.repos.values()
+        home.create_user(username, password_hash)
+        for repo in others:
+            repo.put_user(username, password_hash)
+
+    def _home(self):
+        return next(iter(self.repos.values()))
+
+    def user_exists(self, username):
+        return self._home().user_exists(username)
+
+    def password_hash(self, username):
+        return self._home().password_hash(username)
+
+    # ----------------------- One group -----------------------
+
+    def group_exists(self, group_id):
+        return self._owner(group_id).group_exists(group_id)
+
+    def group_name(self, group_id):
+        return self._owner(group_id).group_name(group_id)
+
+    def group_balances(self, group_id):
+        return self._owner(group_id).group_balances(group_id)
+
+    def list_expenses(self, group_id):
+        return self._owner(group_id).list_expenses(group_id)
+
+    def group_ledger_balances(self, group_id):
+        return self._owner(group_id).group_ledger_balances(group_id)
+
+    def group_balances_as_of(self, group_id, as_of):
+        return self._owner(group_id).group_balances_as_of(group_id, as_of)
+
+    # ----------------------- One user, every shard -----------------------
+
+    def group_ids_for_user(self, username):
+        return [gid for shard, ids in self._each('group_ids_for_user', username)
+                for gid in ids if self._owned(shard, gid)]
+
+    def groups_for_user(self, username):
+        found = []
+        for shard, repo in self.repos.items():
+            groups = [g for g in repo.groups_for_user(username) if self._owned(shard, g['id'])]
+            if not groups:
+                continue
+            repo.cur.execute(
+                f"SELECT id, created_at FROM `groups` WHERE id IN ({', '.join(['%s'] * len(groups))})",
+                [g['id'] for g in groups]
+            )
+            created = dict(repo.cur.fetchall())
+            found += [(created[g['id']], g) for g in groups]
+        # Newest first, as on one database
+        found.sort(key=lambda pair: pair[0], reverse=True)
+        return [g for _, g in found]
+
+    def recent_expenses(self, username, limit=5):
+        return self._latest('recent_expenses', RecentExpenseRow, lambda r: r.date, username, limit)
+
+    def activity(self, username, limit=20):
+        return self._latest('activity', ActivityRow, lambda r: r.date, username, limit)
+
+    def payment_history(self, username, limit=20):
+        return self._latest('payment_history', PaymentRow, lambda r: r.paid_at, username, limit)
+
+    def recent_for_summary(self, user, limit=10):
+        rows = [row for _, found in self._each('recent_for_summary', user, limit) for row in found]
+        rows.sort(key=lambda r: r['date'], reverse=True)
+        return rows[:limit]
+
+    def total_spend(self, user):
+        return sum(total for _, total in self._each('total_spend', user))
+
+    def spend_by_group(self, user):
+        totals = self._summed(self._each('spend_by_group', user), 'group')
+        return [{'group': name, 'total': total}
+                for name, total in sorted(totals.items(), key=lambda item: item[1], reverse=True)]
+
+    def spend_by_payer(self, user):
+        totals = self._summed(self._each('spend_by_payer', user), 'payer')
+        return [{'payer': payer, 'total': total}
+                for payer, total in sorted(totals.items(), key=lambda item: item[1], reverse=True)]
+
+    def monthly_spend(self, user, months=6):
+        # Each shard's latest `months` months include every month of the overall latest
+        totals = self._summed(self._each('monthly_spend', user, months), 'month')
+        return [{'month': month, 'total': totals[month]} for month in sorted(totals)[-months:]]
+
+    def payment_splits(self, username):
+        rows = [row for _, found in self._each('payment_splits', username) for row in found]
+        rows.sort(key=lambda r: str(r['date']), reverse=True)
+        return rows
+
+    def pending_totals(self, user):
+        results = [totals for _, totals in self._each('pending_totals', user)]
+        return {'count': sum(t['count'] for t in results), 'totalOwed': sum(t['totalOwed'] for t in results)}
+
+    def balances(self, username):
+        return self._netted(self._each('balances', username))
+
+    def balances_as_of(self, username, as_of):
+        return self._netted(self._each('balances_as_of', username, as_of))
+
+    @staticmethod
+    def _netted(results):
+        net = {}
+        for _, rows in results:
+            for other, amount in rows:
+                net[other] = net.get(other, 0.0) + amount
+        return [(other, amount) for other, amount in net.items() if abs(amount) > 0.005]
+
+    def balance_with(self, username, other):
+        return [row for shard, rows in self._each('balance_with', username, other)
+                for row in rows if self._owned(shard, row[0])]
+
+    def balance_with_as_of(self, username, other, as_of):
+        return [row for shard, rows in self._each('balance_with_as_of', username, other, as_of)
+                for row in rows if self._owned(shard, row[0])]
+
+    def ledger_debts(self, usernames):
+        return [debt for shard, debts in self._each('ledger_debts', usernames)
+                for debt in debts if self._owned(shard, debt[2])]
+
+    # ----------------------- A group, or a user on every shard -----------------------
+
+    def spend_rows(self, username=None, group_id=None):
+        if group_id:
+            return self._owner(group_id).spend_rows(group_id=group_id)
+        return [row for _, rows in self._each('spend_rows', username) for row in rows]
+
+    def split_totals(self, username=None, group_id=None):
+        if group_id:
+            return self._owner(group_id).split_totals(group_id=group_id)
+        totals = {}
+        for _, found in self._each('split_totals', username):
+            for member, total in found.items():
+                totals[member] = totals.get(member, 0.0) + total
+        return totals
+
+    def spend_series(self, username, start, end, monthly=False, breakdown=None, group_id=None):
+        if group_id:
+            return self._owner(group_id).spend_series(username, start, end, monthly, breakdown, group_id)
+        # A bucket's key (a group name, payer or category) can have spend on several shards
+        totals = {}
+        for _, rows in self._each('spend_series', username, start, end, monthly, breakdown):
+            for bucket, key, total in rows:
+                totals[bucket, key] = totals.get((bucket, key), 0.0) + total
+        return [(bucket, key, total) for (bucket, key), total in totals.items()]
+
+    def search_expenses(self, username, terms, group_id=None, payer=None, date_from=None,
+                        date_to=None, min_amount=None, max_amount=None, limit=20, offset=0):
+        filters = dict(payer=payer, date_from=date_from, date_to=date_to, min_amount=min_amount,
+                       max_amount=max_amount)
+        if group_id:
+            return self._owner(group_id).search_expenses(username, terms, group_id=group_id, limit=limit,
+                                                         offset=offset, **filters)
+        # Each shard's first offset + limit + 1 hold every row of the merged page
+        found = [row for shard, repo in self.repos.items()
+                 for row in repo.search_expenses(username, terms, limit=offset + limit, offset=0, **filters)
+                 if self._owned(shard, row['groupId'])]
+        # Ranked as on one database: score, then newest, then id
+        found.sort(key=lambda r: r['id'])
+        found.sort(key=lambda r: (r['score'], str(r['date'])), reverse=True)
+        return found[offset:offset + limit + 1]
+
+    def export_rows(self, kind, group_id=None, username=None):
+        if group_id:
+            yield from self._owner(group_id).export_rows(kind, group_id=group_id)
+            return
+        at = EXPORTS[kind][0].index('group_id')
+        for shard, repo in self.repos.items():
+            for row in repo.export_rows(kind, username=username):
+                if self._owned(shard, row[at]):
+                    yield row
+
+    # ----------------------- Change log -----------------------
+
+    def _unsynced(self, *args):
+        raise Unsupported('Sync is not available on a sharded database; follow /api/stream instead')
+
+    change_floor = change_head = changes_for_user = sync_snapshot = _unsynced
+
+    def version_token(self, kind, entity_id):
+        if kind == 'group':
+            return self._owner(entity_id).version_token(kind, entity_id)
+        return '-'.join(token for _, token in self._each('version_token', kind, entity_id))
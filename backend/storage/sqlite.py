@@ -0,0 +1,315 @@
+"""Embedded SQLite backend for tests and single-node deployments.
+
+The database runs in WAL mode so readers never block the writer. Each thread
+keeps its own small stack of connections, because sqlite3 connections are
+not safe to share between threads. Statements written for pymysql (%s
+placeholders) are translated on the fly.
+"""
+import functools
+import sqlite3
+import threading
+from datetime import date
+
+from storage.base import Database, Repository
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',      # durable at checkpoints; safe with WAL
+    'PRAGMA foreign_keys = ON',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -32000',       # 32 MB page cache
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 268435456',
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    username VARCHAR(80) PRIMARY KEY,
+    password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS `groups` (
+    id VARCHAR(36) PRIMARY KEY,
+    name VARCHAR(120) NOT NULL,
+    created_by VARCHAR(80) NOT NULL REFERENCES users(username),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS group_members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id VARCHAR(36) NOT NULL REFERENCES `groups`(id),
+    username VARCHAR(80) NOT NULL REFERENCES users(username)
+);
+CREATE INDEX IF NOT EXISTS idx_group_members_group ON group_members(group_id);
+CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members(username);
+CREATE UNIQUE INDEX IF NOT EXISTS unique_member ON group_members(group_id, username);
+
+CREATE TABLE IF NOT EXISTS expenses (
+    id VARCHAR(36) PRIMARY KEY,
+    group_id VARCHAR(36) NOT NULL REFERENCES `groups`(id),
+    amount FLOAT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    note VARCHAR(255),
+    date VARCHAR(10) NOT NULL,
+    time VARCHAR(5) NOT NULL,
+    paid_by VARCHAR(80) NOT NULL REFERENCES users(username),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(20) DEFAULT 'pending'
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_group ON expenses(group_id);
+CREATE INDEX IF NOT EXISTS idx_expenses_paid_by ON expenses(paid_by);
+CREATE INDEX IF NOT EXISTS idx_expense_status ON expenses(status);
+
+CREATE TABLE IF NOT EXISTS expense_terms (
+    term VARCHAR(64) NOT NULL,
+    group_id VARCHAR(36) NOT NULL,
+    expense_id VARCHAR(36) NOT NULL,
+    weight SMALLINT NOT NULL,
+    PRIMARY KEY (group_id, term, expense_id)
+);
+CREATE INDEX IF NOT EXISTS idx_expense_terms_expense ON expense_terms(expense_id);
+
+CREATE TABLE IF NOT EXISTS expense_split (
+    expense_id VARCHAR(36) NOT NULL REFERENCES expenses(id),
+    username VARCHAR(80) NOT NULL REFERENCES users(username),
+    split_amount FLOAT NOT NULL,
+    PRIMARY KEY (expense_id, username)
+);
+CREATE INDEX IF NOT EXISTS idx_expense_split_user ON expense_split(username);
+
+CREATE TABLE IF NOT EXISTS expense_split_rule (
+    expense_id VARCHAR(36) PRIMARY KEY REFERENCES expenses(id),
+    group_id VARCHAR(36) NOT NULL,
+    paid_by VARCHAR(80) NOT NULL,
+    share FLOAT NOT NULL,
+    member_seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_expense_split_rule_group ON expense_split_rule(group_id, member_seq);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    expense_id VARCHAR(36) NOT NULL REFERENCES expenses(id) ON DELETE CASCADE,
+    username VARCHAR(80) NOT NULL REFERENCES users(username),
+    amount FLOAT NOT NULL,
+    paid_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    payment_method VARCHAR(50) DEFAULT 'manual',
+    UNIQUE (expense_id, username)
+);
+CREATE INDEX IF NOT EXISTS idx_payment_user ON payments(username);
+
+CREATE TABLE IF NOT EXISTS daily_spend (
+    group_id VARCHAR(36) NOT NULL,
+    day VARCHAR(10) NOT NULL,
+    paid_by VARCHAR(80) NOT NULL,
+    total DOUBLE NOT NULL DEFAULT 0,
+    expenses INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (group_id, day, paid_by)
+);
+
+CREATE TABLE IF NOT EXISTS daily_category_spend (
+    group_id VARCHAR(36) NOT NULL,
+    day VARCHAR(10) NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    total DOUBLE NOT NULL DEFAULT 0,
+    expenses INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (group_id, day, category)
+);
+
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    debtor VARCHAR(80) NOT NULL,
+    creditor VARCHAR(80) NOT NULL,
+    group_id VARCHAR(36) NOT NULL,
+    amount DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (debtor, creditor, group_id)
+);
+
+CREATE TABLE IF NOT EXISTS entity_versions (
+    kind VARCHAR(10) NOT NULL,
+    entity_id VARCHAR(80) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, entity_id)
+);
+
+CREATE TABLE IF NOT EXISTS change_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    seq INTEGER,
+    group_id VARCHAR(36) NOT NULL,
+    entity VARCHAR(20) NOT NULL,
+    entity_id VARCHAR(120) NOT NULL,
+    op VARCHAR(10) NOT NULL,
+    payload TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_group ON change_log(group_id, id);
+CREATE INDEX IF NOT EXISTS idx_change_log_created ON change_log(created_at);
+
+CREATE TABLE IF NOT EXISTS activity_feed (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(80) NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    ref_id VARCHAR(36) NOT NULL,
+    group_id VARCHAR(36) NOT NULL,
+    group_name VARCHAR(120),
+    actor VARCHAR(80) NOT NULL,
+    title VARCHAR(50),
+    note VARCHAR(255),
+    amount FLOAT NOT NULL,
+    date VARCHAR(10) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_activity_feed_user ON activity_feed(username, kind, date, id);
+CREATE INDEX IF NOT EXISTS idx_activity_feed_ref ON activity_feed(ref_id);
+
+CREATE TABLE IF NOT EXISTS ledger_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id VARCHAR(36) NOT NULL,
+    debtor VARCHAR(80) NOT NULL,
+    creditor VARCHAR(80) NOT NULL,
+    amount DOUBLE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_entries_group ON ledger_entries(group_id, id);
+
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id VARCHAR(36) NOT NULL,
+    taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_entry BIGINT NOT NULL,
+    is_floor SMALLINT NOT NULL DEFAULT 0,
+    balances TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_snapshots_group ON ledger_snapshots(group_id, taken_at);
+
+CREATE TABLE IF NOT EXISTS ledger_heads (
+    group_id VARCHAR(36) PRIMARY KEY,
+    pending INT NOT NULL DEFAULT 0,
+    snapshot_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS group_shards (
+    group_id VARCHAR(36) PRIMARY KEY,
+    shard VARCHAR(255) NOT NULL
+);
+'''
+
+
+@functools.lru_cache(maxsize=512)
+def _translate(sql):
+    """Rewrite pymysql-style placeholders for sqlite3"""
+    return sql.replace('%s', '?').replace('%%', '%')
+
+
+class _Cursor:
+    def __init__(self, raw):
+        self._raw = raw
+
+    def execute(self, sql, args=()):
+        self._raw.execute(_translate(sql), args)
+
+    def executemany(self, sql, seq):
+        self._raw.executemany(_translate(sql), seq)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class _Connection:
+    """pymysql-shaped view of a thread-owned sqlite3 connection"""
+
+    def __init__(self, database, raw):
+        self._database = database
+        self._raw = raw
+
+    def cursor(self, *args):
+        # pymysql cursor classes are ignored; sqlite3 cursors already stream
+        return _Cursor(self._raw.cursor())
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._database.release(raw)
+
+    discard = close
+
+
+class SQLiteRepository(Repository):
+    IntegrityError = sqlite3.IntegrityError
+
+    def upsert(self, keys):
+        return f'ON CONFLICT ({keys}) DO UPDATE SET'
+
+    def inserted(self, column):
+        return f'excluded.{column}'
+
+    def days_ago(self):
+        return "datetime('now', '-' || %s || ' days')"
+
+    def share_lock(self):
+        # A write transaction already keeps every other writer out
+        return ''
+
+    def violated(self, error):
+        message = str(error)
+        if message.startswith(('UNIQUE constraint failed', 'PRIMARY KEY must be unique')):
+            return 'unique'
+        if message.startswith('FOREIGN KEY constraint failed'):
+            return 'foreign_key'
+        return None
+
+
+class SQLiteDatabase(Database):
+    repository_class = SQLiteRepository
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        raw = self._open()
+        raw.executescript(SCHEMA)
+        self._upgrade(raw)
+        self.release(raw)
+
+    @staticmethod
+    def _upgrade(raw):
+        """Bring a file created by an older version up to SCHEMA"""
+        if 'seq' not in {row[1] for row in raw.execute('PRAGMA table_info(change_log)')}:
+            # The sync cursor used to be the change id; keep cursors clients hold valid
+            raw.execute('ALTER TABLE change_log ADD COLUMN seq INTEGER')
+            raw.execute('UPDATE change_log SET seq = id')
+            raw.execute('''
+                INSERT OR REPLACE INTO entity_versions (kind, entity_id, version)
+                SELECT 'changelog', 'seq', COALESCE(MAX(seq), 0) FROM change_log
+            ''')
+        raw.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_seq ON change_log(seq)')
+        raw.commit()
+
+    def _open(self):
+        raw = sqlite3.connect(self.path, timeout=5, check_same_thread=False,
+                              detect_types=sqlite3.PARSE_DECLTYPES)
+        for pragma in PRAGMAS:
+            raw.execute(pragma)
+        # MySQL functions used by hand-written SQL in tests and tools
+        raw.create_function('CURDATE', 0, lambda: date.today().isoformat())
+        return raw
+
+    def connect(self, intent='write', pin=None):
+        # One file serves reads and writes; WAL keeps readers off the writer's lock
+        idle = getattr(self._local, 'idle', None)
+        raw = idle.pop() if idle else self._open()
+        return _Connection(self, raw)
+
+    def release(self, raw):
+        raw.rollback()
+        self._local.__dict__.setdefault('idle', []).append(raw)
+
+    def after_fork(self):
+        # A SQLite connection must not be used in a process other than the one that opened it
+        self._local = threading.local()
@@ -0,0 +1,7 @@
+# test_db.py
+import storage
+
+
+def get_test_connection():
+    """Raw DB-API connection to the configured backend (SQLite under tests/)"""
+    return storage.get_database().connect()
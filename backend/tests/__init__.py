@@ -0,0 +1,8 @@
+# Tests run against a throwaway SQLite database unless DB_BACKEND=mysql is set,
+# and without admission limits except where a test enables them
+import os
+import tempfile
+
+os.environ.setdefault('DB_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', os.path.join(tempfile.mkdtemp(prefix='expense-tests-'), 'test.sqlite3'))
+os.environ.setdefault('ADMISSION_ENABLED', '0')
@@ -1,7 +1,7 @@
 # tests/base.py
 import unittest
 from werkzeug.security import generate_password_hash
-from expenseDB import get_connection
+import storage
 from app import app
 
 TEST_USER_A = "alexa"
@@ -14,24 +14,10 @@ class FlaskTestCase(unittest.TestCase):
         Runs once before ALL tests in a file.
         Makes sure a test user exists in the database.
         """
-        conn = get_connection()
-        cur = conn.cursor()
-
-        # Check if user already exists
-        cur.execute("SELECT username FROM users WHERE username = %s", (TEST_USER_A,))
-        row = cur.fetchone()
-
-        if not row:
-            print("Seeding test user 'alice'...")
-            hashed = generate_password_hash(TEST_PASS_A)
-            cur.execute(
-                "INSERT INTO users (username, password) VALUES (%s, %s)",
-                (TEST_USER_A, hashed)
-            )
-            conn.commit()
-
-        cur.close()
-        conn.close()
+        with storage.transaction() as repo:
+            if not repo.user_exists(TEST_USER_A):
+                print("Seeding test user 'alice'...")
+                repo.create_user(TEST_USER_A, generate_password_hash(TEST_PASS_A))
 
     def setUp(self):
         """
@@ -0,0 +1,99 @@
+import threading
+import unittest
+import admission
+from admission import Admission, RouteLimiter, TokenBuckets, load_classes
+from app import create_app
+from tests.base import TEST_USER_A
+
+class TestLimiters(unittest.TestCase):
+
+    def test_bucket_allows_burst_then_reports_wait(self):
+        buckets = TokenBuckets(rate=1.0, burst=2)
+        self.assertEqual(buckets.take('alexa'), 0)
+        self.assertEqual(buckets.take('alexa'), 0)
+        self.assertGreater(buckets.take('alexa'), 0.5)
+        # Buckets are per caller
+        self.assertEqual(buckets.take('bob'), 0)
+
+    def test_route_limiter_queues_then_fails_fast(self):
+        limiter = RouteLimiter(concurrency=1, queue=1)
+        self.assertEqual(limiter.acquire(0.01), 'admitted')
+        self.assertEqual(limiter.acquire(0.01), 'queue_timeout')
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire(1)))
+        waiter.start()
+        while limiter.waiting == 0:
+            pass
+        # The single queue slot is taken, so the next request is refused at once
+        self.assertEqual(limiter.acquire(1), 'queue_full')
+        limiter.release()
+        waiter.join()
+        self.assertEqual(results, ['queued'])
+
+class TestAdmissionMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        app = create_app({'ADMISSION': False})
+        self.admission = Admission(app, classes=load_classes({'read': {'rate': 1.0, 'burst': 2}}),
+                                   max_inflight=10)
+        self.app = app.test_client()
+
+    def test_rate_limited_caller_gets_429_with_retry_after(self):
+        limited = admission.decisions.value(route='groups.list_groups', priority='read', decision='rate_limited')
+        for _ in range(2):
+            self.assertEqual(self.app.get('/api/groups/list', query_string={'user': TEST_USER_A}).status_code, 200)
+        resp = self.app.get('/api/groups/list', query_string={'user': TEST_USER_A})
+
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers['Retry-After'], '1')
+        self.assertIn('admission_decisions_total{route="groups.list_groups",priority="read",'
+                      f'decision="rate_limited"}} {limited + 1}',
+                      self.app.get('/api/metrics').get_data(as_text=True))
+
+    def test_buckets_are_keyed_on_the_client_address(self):
+        # Another address claiming the same name does not drain this caller's bucket
+        for _ in range(2):
+            self.app.get('/api/groups/list', query_string={'user': TEST_USER_A},
+                         environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        resp = self.app.get('/api/groups/list', query_string={'user': TEST_USER_A})
+        self.assertEqual(resp.status_code, 200)
+
+        # Rotating names only spends the address's larger bucket
+        statuses = [self.app.get('/api/groups/list', query_string={'user': f'name-{i}'},
+                                 environ_base={'REMOTE_ADDR': '10.0.0.3'}).status_code
+                    for i in range(25)]
+        self.assertEqual(statuses.count(200), 20)
+        self.assertEqual(statuses[-1], 429)
+
+    def test_address_refusals_leave_the_user_budget(self):
+        statuses = [self.app.get('/api/groups/list', query_string={'user': f'name-{i}'},
+                                 environ_base={'REMOTE_ADDR': '10.0.0.4'}).status_code
+                    for i in range(20)]
+        self.assertEqual(statuses.count(200), 20)
+        for _ in range(3):
+            resp = self.app.get('/api/groups/list', query_string={'user': TEST_USER_A},
+                                environ_base={'REMOTE_ADDR': '10.0.0.4'})
+            self.assertEqual(resp.status_code, 429)
+
+        # Once the address bucket has refilled, the user's burst is still whole
+        self.admission.address_buckets['read'].give_back('10.0.0.4')
+        self.admission.address_buckets['read'].give_back('10.0.0.4')
+        for _ in range(2):
+            resp = self.app.get('/api/groups/list', query_string={'user': TEST_USER_A},
+                                environ_base={'REMOTE_ADDR': '10.0.0.4'})
+            self.assertEqual(resp.status_code, 200)
+
+    def test_expensive_classes_are_shed_first(self):
+        self.admission.inflight = 8
+        resp = self.app.get('/api/analytics/overview', query_string={'user': TEST_USER_A})
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn('Retry-After', resp.headers)
+
+        # Writes are still admitted at the same load
+        resp = self.app.post('/api/users/login', json={'username': TEST_USER_A, 'password': 'wrong'})
+        self.assertNotIn(resp.status_code, (429, 503))
+        self.assertEqual(self.admission.inflight, 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+import storage
+from app import app, create_app
+
+# Every route app.py served before it was split into blueprints
+BASELINE_ROUTES = {
+    ('/api/users/register', 'POST'), ('/api/users/login', 'POST'),
+    ('/api/groups/create', 'POST'), ('/api/groups/list', 'GET'), ('/api/groups/add-member', 'POST'),
+    ('/api/expenses/create', 'POST'), ('/api/expenses/list', 'GET'), ('/api/expenses/delete', 'POST'),
+    ('/api/expenses/recent', 'GET'), ('/api/receipts/process', 'POST'), ('/api/analytics/overview', 'GET'),
+    ('/api/payments/pending', 'GET'), ('/api/payments/pay', 'POST'), ('/api/payments/history', 'GET'),
+    ('/api/settlements/suggest', 'GET'), ('/api/summary', 'GET'), ('/api/summary/ai', 'GET'),
+    ('/api/dashboard', 'GET'), ('/api/export/<kind>', 'GET'), ('/api/sync', 'GET'), ('/api/stream', 'GET'),
+    ('/api/health', 'GET'),
+}
+
+ENDPOINTS = {
+    'static',
+    'users.register_user', 'users.login_user',
+    'groups.create_group', 'groups.list_groups', 'groups.add_member_to_group', 'groups.update_group_members',
+    'expenses.create_expense', 'expenses.list_expenses', 'expenses.delete_expense', 'expenses.recent_expenses',
+    'expenses.activity_feed', 'expenses.search_expenses',
+    'receipts.process_receipt',
+    'analytics.analytics_overview', 'analytics.dashboard', 'analytics.analytics_timeseries',
+    'analytics.analytics_stats',
+    'payments.get_pending_payments', 'payments.make_payment', 'payments.payment_history',
+    'payments.settlements_suggest', 'payments.settlements_network', 'payments.balances',
+    'summary.summary_plain', 'summary.summary_ai', 'summary.summary_ai_stream',
+    'export.export_data',
+    'sync.sync_changes', 'sync.stream_changes',
+    'health.health', 'health.ready', 'health.metrics_endpoint',
+}
+
+def routes(flask_app):
+    return {(rule.rule, method) for rule in flask_app.url_map.iter_rules() for method in rule.methods}
+
+class TestCreateApp(unittest.TestCase):
+
+    def test_factory_registers_every_route(self):
+        self.assertEqual(BASELINE_ROUTES - routes(app), set())
+        self.assertEqual({rule.endpoint for rule in app.url_map.iter_rules()}, ENDPOINTS)
+
+        # Each call builds its own app with the same routes
+        other = create_app({'ADMISSION': False})
+        self.assertIsNot(other, app)
+        self.assertEqual(routes(other), routes(app))
+
+    def test_config_overrides_are_applied(self):
+        self.addCleanup(storage.configure)
+        path = os.path.join(tempfile.mkdtemp(prefix='expense-app-'), 'app.sqlite3')
+
+        limited = create_app({'ADMISSION': True, 'DB_BACKEND': 'sqlite', 'SQLITE_PATH': path, 'TESTING': True})
+        self.assertTrue(limited.config['TESTING'])
+        self.assertIn('admission', limited.extensions)
+        self.assertEqual(storage.get_database().path, path)
+        self.assertEqual(limited.test_client().get('/api/health').status_code, 200)
+
+        self.assertNotIn('admission', create_app({'ADMISSION': False}).extensions)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import uuid
+import storage
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestBalances(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friend = f"friend-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(self.friend, "x")
+        self.group_id = self.create_group(name="ledger").get_json()["id"]
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friend})
+
+    def add_expense(self, amount, paid_by):
+        resp = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": "Shared", "amount": amount,
+            "date": "2025-02-01", "paidBy": paid_by
+        })
+        return resp.get_json()["id"]
+
+    def balance_with(self, user, other):
+        return self.app.get("/api/balances", query_string={"user": user, "with": other}).get_json()
+
+    def mismatches(self, repo):
+        # Other test files write splits with raw SQL, so only this group is checked
+        return [m for m in repo.audit_ledger() if m[0][2] == self.group_id]
+
+    def test_expenses_and_payments_update_both_sides(self):
+        dinner = self.add_expense(40.0, TEST_USER_A)
+        self.add_expense(10.0, self.friend)
+
+        # friend owes 20, alexa owes 5
+        self.assertEqual(self.balance_with(self.friend, TEST_USER_A)["net"], 15.0)
+        self.assertEqual(self.balance_with(TEST_USER_A, self.friend)["net"], -15.0)
+
+        self.app.post("/api/payments/pay", json={"expenseId": dinner, "username": self.friend, "amount": 20.0})
+        self.assertEqual(self.balance_with(self.friend, TEST_USER_A)["net"], -5.0)
+
+        overview = self.app.get("/api/balances", query_string={"user": self.friend}).get_json()
+        self.assertEqual(overview["balances"], [{"with": TEST_USER_A, "net": -5.0}])
+        self.assertEqual(overview["owedToYou"], 5.0)
+
+    def test_delete_takes_back_what_is_still_owed(self):
+        expense_id = self.add_expense(30.0, TEST_USER_A)
+        self.app.post("/api/expenses/delete", json={"expenseId": expense_id})
+
+        result = self.balance_with(self.friend, TEST_USER_A)
+        self.assertEqual(result["net"], 0)
+        self.assertEqual(result["byGroup"], [])
+
+    def test_audit_agrees_and_rebuild_is_idempotent(self):
+        expense_id = self.add_expense(50.0, TEST_USER_A)
+        self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": self.friend, "amount": 25.0})
+        self.add_expense(12.0, self.friend)
+
+        with storage.session() as repo:
+            self.assertEqual(self.mismatches(repo), [])
+        with storage.transaction() as repo:
+            repo.rebuild_ledger()
+        with storage.session() as repo:
+            self.assertEqual(self.mismatches(repo), [])
+        self.assertEqual(self.balance_with(self.friend, TEST_USER_A)["net"], -6.0)
+
+    def test_payments_without_a_split_or_above_it_keep_the_audit_clean(self):
+        stranger = f"stranger-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(stranger, "x")
+        dinner = self.add_expense(40.0, TEST_USER_A)
+        # The friend owes 20 and pays 50; the stranger owes nothing and pays 10
+        self.app.post("/api/payments/pay", json={"expenseId": dinner, "username": self.friend, "amount": 50.0})
+        self.app.post("/api/payments/pay", json={"expenseId": dinner, "username": stranger, "amount": 10.0})
+
+        with storage.session() as repo:
+            self.assertEqual(self.mismatches(repo), [])
+        self.assertEqual(self.balance_with(self.friend, TEST_USER_A)["net"], 0)
+        self.assertEqual(self.balance_with(stranger, TEST_USER_A)["byGroup"], [])
+
+        # Deleting takes back nothing more than the ledger holds
+        self.app.post("/api/expenses/delete", json={"expenseId": dinner})
+        with storage.session() as repo:
+            self.assertEqual(self.mismatches(repo), [])
+
+if __name__ == "__main__":
+    unittest.main()
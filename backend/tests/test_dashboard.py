@@ -0,0 +1,71 @@
+import json
+import time
+import unittest
+import uuid
+from unittest import mock
+import consistency
+import storage
+from routes import analytics
+from serialize import json_response
+from tests.base import FlaskTestCase
+
+class TestDashboard(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = f"dash-{uuid.uuid4().hex[:8]}"
+        self.friend = f"dash-{uuid.uuid4().hex[:8]}"
+        for name in (self.user, self.friend):
+            self.app.post("/api/users/register", json={"username": name, "password": "x"})
+        for title, amount, payer in (("Groceries", 40.0, self.user), ("Gas", 18.0, self.friend)):
+            group_id = self.create_group(name=title, owner=self.user).get_json()["id"]
+            self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": self.friend})
+            expense_id = self.app.post("/api/expenses/create", json={
+                "groupId": group_id, "title": title, "amount": amount, "date": "2025-03-01",
+                "paidBy": payer}).get_json()["id"]
+        self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": self.user, "amount": 9.0})
+
+    def test_parallel_sections_match_running_them_one_after_another(self):
+        resp = self.app.get("/api/dashboard", query_string={"user": self.user})
+        self.assertEqual(resp.status_code, 200)
+        body = resp.get_json()
+
+        with storage.session(pin=('user', self.user)) as repo:
+            sequential = {name: fn(repo, self.user) for name, fn in analytics.DASHBOARD_SECTIONS.items()}
+        self.assertEqual(body, json.loads(json_response(sequential).get_data()))
+
+        # And each section is what its own endpoint answers
+        self.assertEqual(body["groups"], self.app.get("/api/groups/list", query_string={"user": self.user}).get_json())
+        self.assertEqual(body["recent"],
+                         self.app.get("/api/expenses/recent", query_string={"user": self.user}).get_json())
+        self.assertEqual(len(body["groups"]), 2)
+        self.assertEqual(body["summary"]["total"], 58.0)
+        suggested = self.app.get("/api/settlements/suggest", query_string={"user": self.user}).get_json()
+        self.assertEqual(body["settlements"]["transfers"], sum(len(s["transfers"]) for s in suggested))
+
+    def test_server_timing_names_every_section(self):
+        resp = self.app.get("/api/dashboard", query_string={"user": self.user})
+        timings = [part.strip().split(";dur=") for part in resp.headers["Server-Timing"].split(",")]
+        self.assertEqual([name for name, _ in timings], list(analytics.DASHBOARD_SECTIONS) + ["total"])
+        self.assertTrue(all(float(ms) >= 0 for _, ms in timings))
+
+    def test_slow_section_times_out(self):
+        sections = {**analytics.DASHBOARD_SECTIONS, "slow": lambda repo, user: time.sleep(0.2)}
+        with mock.patch.object(analytics, "DASHBOARD_SECTIONS", sections), \
+                mock.patch.object(analytics, "DASHBOARD_TIMEOUT", 0.05):
+            resp = self.app.get("/api/dashboard", query_string={"user": self.user})
+        self.assertEqual(resp.status_code, 500)
+        self.assertNotIn("Server-Timing", resp.headers)
+
+    def test_sections_keep_the_read_your_writes_pin(self):
+        seen = []
+        sections = {"pinned": lambda repo, user: seen.append(consistency.reads_from_primary())}
+        with mock.patch.object(analytics, "DASHBOARD_SECTIONS", sections):
+            resp = self.app.get("/api/dashboard", query_string={"user": self.user},
+                                headers={consistency.HEADER: f"{time.time() + 2:.3f}"})
+            self.assertEqual(resp.status_code, 200)
+            self.app.application.test_client().get("/api/dashboard", query_string={"user": self.user})
+        self.assertEqual(seen, [True, False])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import unittest
+import uuid
+from unittest import mock
+from events import EventBus, bus
+from routes import sync
+from tests.base import FlaskTestCase
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus(history=3)
+
+    def test_since_filters_by_channel(self):
+        """Only events on subscribed channels are returned, but the cursor still advances."""
+        self.bus.publish(['group:a'], 'expense.created', {'id': 1})
+        self.bus.publish(['group:b'], 'expense.created', {'id': 2})
+
+        events, last_seq, complete = self.bus.since(0, {'group:a'})
+
+        self.assertEqual([e.data['id'] for e in events], [1])
+        self.assertEqual(last_seq, 2)
+        self.assertTrue(complete)
+
+    def test_resume_from_event_id(self):
+        first = self.bus.publish(['group:a'], 'expense.created', {'id': 1})
+        self.bus.publish(['group:a'], 'expense.deleted', {'id': 1})
+
+        seq = self.bus.parse_event_id(first.id)
+        events, _, _ = self.bus.since(seq, {'group:a'})
+
+        self.assertEqual([e.type for e in events], ['expense.deleted'])
+
+    def test_foreign_event_id_is_rejected(self):
+        self.assertIsNone(self.bus.parse_event_id('deadbeef-4'))
+        self.assertIsNone(self.bus.parse_event_id('garbage'))
+
+    def test_evicted_history_is_reported(self):
+        """Falling behind the ring buffer must be flagged so the client re-fetches."""
+        for i in range(5):
+            self.bus.publish(['group:a'], 'expense.created', {'id': i})
+
+        events, _, complete = self.bus.since(1, {'group:a'})
+
+        self.assertFalse(complete)
+        self.assertEqual(len(events), 3)
+
+    def test_wait_times_out_without_events(self):
+        events, last_seq, complete = self.bus.wait(0, {'group:a'}, timeout=0.01)
+        self.assertEqual(events, [])
+        self.assertEqual(last_seq, 0)
+        self.assertTrue(complete)
+
+class TestStreamSubscriptions(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = f"stream-{uuid.uuid4().hex[:8]}"
+        self.app.post("/api/users/register", json={"username": self.user, "password": "x"})
+
+    def stream_after(self, published, until):
+        """Events /api/stream sends when everything in `published` is already waiting, up to
+        the `until` event or the first heartbeat"""
+        # A heartbeat ends the read instead of blocking on events that never come
+        patcher = mock.patch.object(sync, "STREAM_HEARTBEAT_SECONDS", 0.2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        resume = f"{bus.boot}-{bus.last_seq}"
+        for channels, event_type, data in published:
+            bus.publish(channels, event_type, data)
+        resp = self.app.get("/api/stream", query_string={"user": self.user, "lastEventId": resume},
+                            buffered=False)
+        self.addCleanup(resp.close)
+        sent = []
+        for chunk in resp.response:
+            frame = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if frame.startswith(": heartbeat"):
+                return sent
+            fields = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line)
+            if "event" in fields:
+                sent.append((fields["event"], json.loads(fields["data"])))
+                if fields["event"] == until:
+                    return sent
+
+    def test_events_after_joining_in_the_same_batch_are_sent(self):
+        sent = self.stream_after([
+            (["group:new", f"user:{self.user}"], "member.added", {"groupId": "new", "username": self.user}),
+            (["group:new"], "expense.created", {"id": 1, "groupId": "new"}),
+            ([f"user:{self.user}"], "test.done", {}),
+        ], until="test.done")
+        self.assertEqual([t for t, _ in sent], ["member.added", "expense.created", "test.done"])
+
+    def test_removal_drops_the_group(self):
+        group_id = self.create_group(name="Left", owner=self.user).get_json()["id"]
+        sent = self.stream_after([
+            ([f"group:{group_id}", f"user:{self.user}"], "members.updated",
+             {"groupId": group_id, "added": [], "removed": [self.user]}),
+            ([f"group:{group_id}"], "expense.created", {"id": 1, "groupId": group_id}),
+            ([f"user:{self.user}"], "test.done", {}),
+        ], until="test.done")
+        self.assertEqual([t for t, _ in sent], ["members.updated", "test.done"])
+
+if __name__ == "__main__":
+    unittest.main()
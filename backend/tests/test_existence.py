@@ -0,0 +1,77 @@
+import time
+import unittest
+import uuid
+import existence
+import storage
+from existence import ExistenceCache
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestExistenceCache(unittest.TestCase):
+
+    def test_negative_answers_expire(self):
+        cache = ExistenceCache(max_entries=10, negative_ttl=0.05)
+        cache.put('user', 'ghost', False)
+        self.assertIs(cache.get('user', 'ghost'), False)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('user', 'ghost'))
+
+    def test_positive_memberships_expire_like_negative_answers(self):
+        self.assertEqual(existence.cache.positive_ttls['member'], existence.cache.negative_ttl)
+        cache = ExistenceCache(max_entries=10, negative_ttl=5, positive_ttls={'member': 0.05})
+        cache.put('member', ('g', 'alexa'), True)
+        cache.put('user', 'alexa', True)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('member', ('g', 'alexa')))
+        self.assertIs(cache.get('user', 'alexa'), True)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ExistenceCache(max_entries=2, negative_ttl=5)
+        cache.put('user', 'a', True)
+        cache.put('user', 'b', True)
+        cache.get('user', 'a')
+        cache.put('group', 'g', True)
+        self.assertIsNone(cache.get('user', 'b'))
+        self.assertIs(cache.get('user', 'a'), True)
+
+    def test_size_zero_disables(self):
+        cache = ExistenceCache(max_entries=0, negative_ttl=5)
+        cache.put('user', 'a', True)
+        self.assertIsNone(cache.get('user', 'a'))
+
+class TestRepositoryExistence(FlaskTestCase):
+
+    def hits(self, kind, result):
+        return existence.lookups.value(kind=kind, result=result)
+
+    def test_unknown_user_is_answered_from_cache(self):
+        name = f"ghost-{uuid.uuid4().hex[:8]}"
+        login = {"username": name, "password": "x"}
+        self.assertEqual(self.app.post("/api/users/login", json=login).status_code, 404)
+        before = self.hits('user', 'negative_hit')
+        self.assertEqual(self.app.post("/api/users/login", json=login).status_code, 404)
+        self.assertEqual(self.hits('user', 'negative_hit'), before + 1)
+
+        # Registering forgets the negative answer
+        self.app.post("/api/users/register", json=login)
+        self.assertEqual(self.app.post("/api/users/login", json=login).status_code, 200)
+
+    def test_writes_are_remembered_only_after_commit(self):
+        group_id = str(uuid.uuid4())
+        with self.assertRaises(RuntimeError):
+            with storage.transaction() as repo:
+                repo.create_group(group_id, "rolled back", TEST_USER_A)
+                raise RuntimeError
+        self.assertIsNone(existence.cache.get('group', group_id))
+
+        with storage.transaction() as repo:
+            repo.create_group(group_id, "kept", TEST_USER_A)
+        self.assertIs(existence.cache.get('group', group_id), True)
+        self.assertIs(existence.cache.get('member', (group_id, TEST_USER_A)), True)
+
+        before = self.hits('member', 'hit')
+        resp = self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": TEST_USER_A})
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(self.hits('member', 'hit'), before + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 from tests.base import FlaskTestCase, TEST_USER_A
-from expenseDB import get_connection
+from test_db import get_test_connection
 
 class TestExpenses(FlaskTestCase):
 
@@ -41,7 +41,7 @@ class TestExpenses(FlaskTestCase):
         expense_id = exp_data["id"]
 
         # 3. Check directly in DB that expense exists
-        conn = get_connection()
+        conn = get_test_connection()
         cur = conn.cursor()
 
         cur.execute(
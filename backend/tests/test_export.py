@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import unittest
+import uuid
+from unittest import mock
+from storage.base import Repository
+from tests.base import FlaskTestCase
+
+class TestExport(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = f"export-{uuid.uuid4().hex[:8]}"
+        self.friend = f"export-{uuid.uuid4().hex[:8]}"
+        for name in (self.owner, self.friend):
+            self.app.post("/api/users/register", json={"username": name, "password": "x"})
+        self.group_id = self.create_group(name="Cabin", owner=self.owner).get_json()["id"]
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friend})
+        self.expense_id = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": 'Firewood, "dry"', "amount": 30.0,
+            "date": "2025-04-01", "paidBy": self.owner}).get_json()["id"]
+        self.app.post("/api/payments/pay", json={"expenseId": self.expense_id, "username": self.friend, "amount": 15.0})
+
+    def export(self, kind, fmt, **params):
+        return self.app.get(f"/api/export/{kind}", query_string={"format": fmt, **params})
+
+    def test_csv_by_group_has_header_and_quotes_fields(self):
+        resp = self.export("expenses", "csv", groupId=self.group_id)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "text/csv")
+        self.assertIn("filename=expenses.csv", resp.headers["Content-Disposition"])
+
+        body = resp.get_data(as_text=True)
+        self.assertIn('"Firewood, ""dry"""', body)
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ["id", "group_id", "group_name", "date", "time", "title", "note", "amount",
+                                   "paid_by", "status"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[1][0], rows[1][5], rows[1][8]), (str(self.expense_id), 'Firewood, "dry"', self.owner))
+
+    def test_ndjson_by_user(self):
+        resp = self.export("splits", "ndjson", user=self.friend)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        self.assertEqual([(l["expense_id"], l["username"], float(l["split_amount"])) for l in lines],
+                         [(self.expense_id, self.friend, 15.0)])
+
+        payments = self.export("payments", "ndjson", user=self.friend).get_data(as_text=True).splitlines()
+        self.assertEqual([(json.loads(l)["username"], float(json.loads(l)["amount"])) for l in payments],
+                         [(self.friend, 15.0)])
+
+    def test_csv_by_user_and_ndjson_by_group(self):
+        rows = list(csv.reader(io.StringIO(self.export("payments", "csv", user=self.owner).get_data(as_text=True))))
+        self.assertEqual(rows[0][:4], ["id", "expense_id", "group_id", "username"])
+        self.assertEqual([row[3] for row in rows[1:]], [self.friend])
+
+        lines = self.export("expenses", "ndjson", groupId=self.group_id).get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(l)["title"] for l in lines], ['Firewood, "dry"'])
+
+    def test_empty_result(self):
+        loner = f"export-{uuid.uuid4().hex[:8]}"
+        self.app.post("/api/users/register", json={"username": loner, "password": "x"})
+        self.assertEqual(self.export("expenses", "csv", user=loner).get_data(as_text=True).splitlines(),
+                         ["id,group_id,group_name,date,time,title,note,amount,paid_by,status"])
+        self.assertEqual(self.export("expenses", "ndjson", user=loner).get_data(as_text=True), "")
+
+    def test_rejects_unknown_kind_format_or_scope(self):
+        self.assertEqual(self.export("receipts", "csv", groupId=self.group_id).status_code, 400)
+        self.assertEqual(self.export("expenses", "xml", groupId=self.group_id).status_code, 400)
+        self.assertEqual(self.export("expenses", "csv").status_code, 400)
+
+    def test_failing_query_is_an_error_before_streaming(self):
+        with mock.patch.object(Repository, "export_rows", side_effect=RuntimeError("no such table")):
+            resp = self.export("expenses", "csv", groupId=self.group_id)
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(resp.get_json()["error"], "no such table")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import uuid
+import storage
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestActivityFeed(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friend = f"feed-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(self.friend, "x")
+        self.group_id = self.create_group(name="feed").get_json()["id"]
+
+    def add_expense(self, title, date, paid_by=TEST_USER_A):
+        resp = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": title, "amount": 30.0, "date": date, "paidBy": paid_by})
+        return resp.get_json()["id"]
+
+    def recent(self, user):
+        return self.app.get("/api/expenses/recent", query_string={"user": user}).get_json()
+
+    def test_new_member_is_backfilled_and_sees_later_writes(self):
+        self.add_expense("Older", "2025-01-01")
+        self.add_expense("Newer", "2025-03-01")
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friend})
+        self.add_expense("Middle", "2025-02-01", paid_by=self.friend)
+
+        titles = [e["title"] for e in self.recent(self.friend)]
+        self.assertEqual(titles, ["Newer", "Middle", "Older"])
+        self.assertEqual(self.recent(self.friend)[1]["paidBy"], self.friend)
+
+    def test_payment_fans_out_and_delete_removes_items(self):
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friend})
+        expense_id = self.add_expense("Tickets", "2025-04-01")
+        self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": self.friend, "amount": 15.0})
+
+        items = self.app.get("/api/activity", query_string={"user": TEST_USER_A}).get_json()
+        mine = [(i["kind"], i["by"]) for i in items if i["id"] == expense_id]
+        self.assertEqual(sorted(mine), [("expense", TEST_USER_A), ("payment", self.friend)])
+
+        self.app.post("/api/expenses/delete", json={"expenseId": expense_id})
+        items = self.app.get("/api/activity", query_string={"user": self.friend}).get_json()
+        self.assertNotIn(expense_id, [i["id"] for i in items])
+
+    def test_trim_and_rebuild(self):
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friend})
+        for day in range(1, 6):
+            self.add_expense(f"Day {day}", f"2025-05-0{day}")
+
+        with storage.transaction() as repo:
+            repo.trim_feed(3, group_id=self.group_id)
+        self.assertEqual([e["title"] for e in self.recent(self.friend)], ["Day 5", "Day 4", "Day 3"])
+
+        with storage.transaction() as repo:
+            repo.rebuild_feed(200)
+        self.assertEqual(len(self.recent(self.friend)), 5)
+
+if __name__ == "__main__":
+    unittest.main()
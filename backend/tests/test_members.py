@@ -0,0 +1,73 @@
+import unittest
+import uuid
+import storage
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestBatchMembers(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friends = [f"batch-{uuid.uuid4().hex[:8]}" for _ in range(3)]
+        with storage.transaction() as repo:
+            for name in self.friends:
+                repo.create_user(name, "x")
+        self.group_id = self.create_group(name="batch").get_json()["id"]
+
+    def update(self, add=(), remove=()):
+        return self.app.post("/api/groups/members", json={
+            "groupId": self.group_id, "add": list(add), "remove": list(remove)})
+
+    def members(self):
+        groups = self.app.get("/api/groups/list", query_string={"user": TEST_USER_A}).get_json()
+        return sorted(next(g["members"] for g in groups if g["id"] == self.group_id))
+
+    def statuses(self, resp):
+        return {r["username"]: r["status"] for r in resp.get_json()["results"]}
+
+    def test_add_many_reports_each_member(self):
+        missing = f"nobody-{uuid.uuid4().hex[:8]}"
+        resp = self.update(add=self.friends + [missing, TEST_USER_A])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["added"], 3)
+        statuses = self.statuses(resp)
+        self.assertEqual([statuses[f] for f in self.friends], ["added"] * 3)
+        self.assertEqual(statuses[missing], "not_found")
+        self.assertEqual(statuses[TEST_USER_A], "already_member")
+        self.assertEqual(self.members(), sorted(self.friends + [TEST_USER_A]))
+
+    def test_remove_keeps_owner_and_members_with_balances(self):
+        self.update(add=self.friends)
+        self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": "Dinner", "amount": 40.0,
+            "date": "2025-05-01", "paidBy": self.friends[0]})
+
+        resp = self.update(remove=self.friends + [TEST_USER_A])
+        statuses = self.statuses(resp)
+        self.assertEqual(statuses[TEST_USER_A], "owner")
+        self.assertEqual({statuses[f] for f in self.friends}, {"unsettled"})
+        self.assertEqual(resp.get_json()["removed"], 0)
+
+    def test_removed_member_loses_group_and_feed(self):
+        self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": "Before", "amount": 10.0,
+            "date": "2025-05-01", "paidBy": TEST_USER_A})
+        self.update(add=self.friends)
+        feed = self.app.get("/api/activity", query_string={"user": self.friends[0]}).get_json()
+        self.assertEqual([i["title"] for i in feed], ["Before"])
+
+        resp = self.update(remove=self.friends[:2])
+        self.assertEqual(resp.get_json()["removed"], 2)
+        self.assertEqual(self.members(), sorted([TEST_USER_A, self.friends[2]]))
+        self.assertEqual(self.app.get("/api/activity", query_string={"user": self.friends[0]}).get_json(), [])
+
+        # The membership cache must not still say they belong
+        resp = self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friends[0]})
+        self.assertEqual(resp.status_code, 201)
+
+    def test_unknown_group_and_empty_batch(self):
+        resp = self.app.post("/api/groups/members", json={"groupId": str(uuid.uuid4()), "add": self.friends})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(self.update().status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
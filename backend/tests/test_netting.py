@@ -0,0 +1,104 @@
+import random
+import unittest
+import uuid
+import netting
+from tests.base import FlaskTestCase
+
+def cents(debts):
+    found = {}
+    for debt in debts:
+        key = (debt["groupId"], debt["from"], debt["to"])
+        found[key] = found.get(key, 0) + round(debt["amount"] * 100)
+    return found
+
+class TestNet(unittest.TestCase):
+
+    def check(self, debts, plan):
+        """The group transfers settle every group, and each transfer's only move money from its payer to its payee"""
+        balances = {}
+        for debtor, creditor, group_id, amount in debts:
+            balances[(group_id, debtor)] = balances.get((group_id, debtor), 0) - round(amount * 100)
+            balances[(group_id, creditor)] = balances.get((group_id, creditor), 0) + round(amount * 100)
+        for moves in [t["settles"] for t in plan["transfers"]] + [plan["offsets"]]:
+            flow = {}
+            for (group_id, payer, payee), amount in cents(moves).items():
+                balances[(group_id, payer)] += amount
+                balances[(group_id, payee)] -= amount
+                flow[payer] = flow.get(payer, 0) - amount
+                flow[payee] = flow.get(payee, 0) + amount
+            if moves is not plan["offsets"]:
+                transfer = next(t for t in plan["transfers"] if t["settles"] is moves)
+                amount = round(transfer["amount"] * 100)
+                self.assertEqual(flow.pop(transfer["from"]), -amount)
+                self.assertEqual(flow.pop(transfer["to"]), amount)
+            self.assertFalse(any(flow.values()))
+        self.assertFalse(any(balances.values()))
+
+    def test_opposite_debts_in_two_groups_net_to_one_transfer(self):
+        debts = [("bo", "al", "g1", 20.0), ("al", "bo", "g2", 5.0)]
+        plan = netting.net(debts)
+        self.assertEqual([(t["from"], t["to"], t["amount"]) for t in plan["transfers"]], [("bo", "al", 15.0)])
+        self.assertEqual(cents(plan["offsets"]), {("g1", "bo", "al"): 500, ("g2", "al", "bo"): 500})
+        self.check(debts, plan)
+
+    def test_cycles_cancel_and_chains_shortcut(self):
+        cycle = [("a", "b", "g1", 10.0), ("b", "c", "g2", 10.0), ("c", "a", "g3", 10.0)]
+        self.assertEqual(netting.net(cycle)["transfers"], [])
+
+        chain = [("a", "b", "g1", 10.0), ("b", "c", "g2", 10.0), ("c", "d", "g3", 4.0)]
+        plan = netting.net(chain)
+        self.assertEqual([(t["from"], t["to"], t["amount"]) for t in plan["transfers"]],
+                         [("a", "c", 6.0), ("a", "d", 4.0)])
+        self.check(chain, plan)
+
+    def test_random_graphs_beat_settling_each_group(self):
+        rng = random.Random(7)
+        debts = {}
+        for _ in range(6000):
+            debtor, creditor = rng.sample(range(400), 2)
+            key = (f"u{debtor}", f"u{creditor}", f"g{rng.randrange(50)}")
+            debts[key] = debts.get(key, 0) + rng.randint(1, 5000) / 100
+        debts = [(d, c, g, a) for (d, c, g), a in debts.items()]
+
+        plan = netting.net(debts)
+        out_of_time = netting.net(debts, budget=-1)
+        self.assertEqual((plan["complete"], out_of_time["complete"]), (True, False))
+        self.assertLess(len(plan["transfers"]), len(out_of_time["transfers"]) / 2)
+        self.check(debts, plan)
+        self.check(debts, out_of_time)
+
+class TestNetworkSettlements(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.users = [f"net-{uuid.uuid4().hex[:8]}" for _ in range(3)]
+        for name in self.users:
+            self.app.post("/api/users/register", json={"username": name, "password": "x"})
+
+    def group(self, owner, member, amount):
+        group_id = self.create_group(name="netting", owner=owner).get_json()["id"]
+        self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": member})
+        self.app.post("/api/expenses/create", json={
+            "groupId": group_id, "title": "Tickets", "amount": amount, "date": "2025-05-01", "paidBy": owner})
+        return group_id
+
+    def test_component_pays_across_groups(self):
+        first, second, third = self.users
+        # second owes first 20, third owes second 10
+        self.group(first, second, 40.0)
+        self.group(second, third, 20.0)
+
+        plan = self.app.get("/api/settlements/network", query_string={"user": third}).get_json()
+        self.assertEqual([(t["from"], t["to"]) for t in plan["transfers"]], [(third, second)])
+
+        plan = self.app.get("/api/settlements/network",
+                            query_string={"user": third, "scope": "component"}).get_json()
+        self.assertEqual((plan["users"], plan["debts"], plan["truncated"]), (3, 2, False))
+        self.assertEqual(sorted((t["from"], t["to"], t["amount"]) for t in plan["transfers"]),
+                         sorted([(second, first, 10.0), (third, first, 10.0)]))
+
+        resp = self.app.get("/api/settlements/network", query_string={"user": third, "scope": "world"})
+        self.assertEqual(resp.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
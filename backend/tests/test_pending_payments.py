@@ -11,6 +11,7 @@ class TestPendingPayments(unittest.TestCase):
         # Clean tables before each test
         self.cursor.execute("DELETE FROM payments")
         self.cursor.execute("DELETE FROM expense_split")
+        self.cursor.execute("DELETE FROM expense_split_rule")
         self.cursor.execute("DELETE FROM expenses")
         self.cursor.execute("DELETE FROM group_members")
         self.cursor.execute("DELETE FROM `groups`")
@@ -0,0 +1,56 @@
+import unittest
+from expenseDB import ConnectionPool, PoolTimeout
+
+class FakeRaw:
+    def __init__(self):
+        self.rolled_back = 0
+        self.closed = False
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed = True
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+        self.pool = ConnectionPool(self.connect, size=2, timeout=0.01)
+
+    def connect(self):
+        raw = FakeRaw()
+        self.created.append(raw)
+        return raw
+
+    def test_close_returns_connection_for_reuse(self):
+        conn = self.pool.acquire()
+        conn.close()
+        again = self.pool.acquire()
+
+        self.assertEqual(len(self.created), 1)
+        self.assertIs(again._raw, self.created[0])
+        # Returning a connection ends whatever transaction it had open
+        self.assertEqual(self.created[0].rolled_back, 1)
+
+    def test_pool_is_bounded(self):
+        first = self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+
+        first.close()
+        self.assertIsNotNone(self.pool.acquire())
+        self.assertEqual(len(self.created), 2)
+
+    def test_discard_frees_a_slot(self):
+        conn = self.pool.acquire()
+        conn.discard()
+
+        self.assertTrue(self.created[0].closed)
+        self.assertEqual(self.pool.in_use, 0)
+        self.pool.acquire()
+        self.assertEqual(len(self.created), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import readiness
+from admission import Admission
+from app import create_app
+from tests.base import FlaskTestCase
+
+class TestReadiness(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        readiness.probe.clear()
+        self.addCleanup(readiness.probe.clear)
+
+    def test_ready_reports_every_dependency(self):
+        resp = self.app.get("/api/ready")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.get_json()
+        self.assertEqual(body["status"], "ready")
+        self.assertEqual(set(body["checks"]), {"database", "pool", "ocr_queue", "ai_queue", "errors"})
+        self.assertEqual({c["status"] for c in body["checks"].values()}, {"ok"})
+        self.assertIn("ms", body["checks"]["database"])
+
+    def test_result_is_cached_between_probes(self):
+        first = self.app.get("/api/ready").get_json()
+        second = self.app.get("/api/ready").get_json()
+        self.assertEqual(second["checks"]["database"]["ms"], first["checks"]["database"]["ms"])
+        self.assertLessEqual(second["ageSeconds"], readiness.CACHE_SECONDS)
+
+    def test_recent_server_errors_fail_the_probe(self):
+        window = readiness.ResponseWindow(60)
+        for status in [200] * 20 + [500] * 10:
+            window.record(status)
+        self.addCleanup(setattr, readiness, "responses", readiness.responses)
+        readiness.responses = window
+
+        resp = self.app.get("/api/ready")
+        self.assertEqual(resp.status_code, 503)
+        errors = resp.get_json()["checks"]["errors"]
+        self.assertEqual((errors["status"], errors["responses"], errors["errors"]), ("fail", 30, 10))
+        # The probe's own 503 is not counted
+        self.assertEqual(window.totals(), (30, 10))
+
+    def test_full_ai_queue_fails_the_probe(self):
+        for endpoint in ("summary.summary_ai", "summary.summary_ai_stream"):
+            with self.subTest(endpoint=endpoint):
+                readiness.probe.clear()
+                app = create_app({'ADMISSION': False})
+                admission = Admission(app)
+                limiter = admission._limiter(endpoint, "external")
+                limiter.waiting = limiter.queue
+
+                body = app.test_client().get("/api/ready").get_json()
+                self.assertEqual(body["status"], "not_ready")
+                self.assertEqual(body["checks"]["ai_queue"]["status"], "fail")
+                self.assertEqual(body["checks"]["ai_queue"]["route"], endpoint)
+                self.assertEqual(body["checks"]["ocr_queue"]["status"], "ok")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+import consistency
+from app import create_app
+from expenseDB import ConnectionPool, ReadRouter, Replica
+
+def open_db(path, label):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS whoami (name TEXT)")
+    conn.execute("DELETE FROM whoami")
+    conn.execute("INSERT INTO whoami VALUES (?)", (label,))
+    conn.commit()
+    return conn
+
+def whoami(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM whoami")
+    name = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+    return name
+
+class BrokenPool:
+    in_use = 0
+
+    def acquire(self):
+        raise ConnectionRefusedError('replica down')
+
+class TestReadRouter(unittest.TestCase):
+    """Routes between two real local databases: a primary and one replica."""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp(prefix='replicas-')
+        primary_path = os.path.join(tmp, 'primary.db')
+        replica_path = os.path.join(tmp, 'replica.db')
+        self.primary = ConnectionPool(lambda: open_db(primary_path, 'primary'), 2, 0.01)
+        self.replica = Replica('replica', ConnectionPool(lambda: open_db(replica_path, 'replica'), 2, 0.01))
+        self.router = ReadRouter(self.primary, [self.replica], eject_seconds=0.05, pin_seconds=0.05)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(whoami(self.router.acquire('read')), 'replica')
+        self.assertEqual(whoami(self.router.acquire('write')), 'primary')
+        self.assertEqual(whoami(self.router.acquire()), 'primary')
+
+    def test_pinned_scope_reads_its_writes_from_primary(self):
+        self.router.pin([('user', 'alexa')])
+
+        self.assertEqual(whoami(self.router.acquire('read', ('user', 'alexa'))), 'primary')
+        self.assertEqual(whoami(self.router.acquire('read', ('user', 'bob'))), 'replica')
+
+        time.sleep(0.06)
+        self.assertEqual(whoami(self.router.acquire('read', ('user', 'alexa'))), 'replica')
+
+    def test_failed_replica_is_ejected_until_it_recovers(self):
+        broken = Replica('broken', BrokenPool())
+        self.router.replicas = [broken]
+
+        self.assertEqual(whoami(self.router.acquire('read')), 'primary')
+        self.assertEqual(self.router.healthy(), [])
+
+        time.sleep(0.06)
+        self.assertEqual(self.router.healthy(), [broken])
+
+    def test_busy_replica_loses_the_pick(self):
+        idle = Replica('idle', ConnectionPool(lambda: open_db(':memory:', 'idle'), 2, 0.01))
+        self.router.replicas = [self.replica, idle]
+        held = self.replica.pool.acquire()
+
+        for _ in range(5):
+            self.assertEqual(whoami(self.router.acquire('read')), 'idle')
+        held.close()
+
+class TestClientCarriedPin(unittest.TestCase):
+    """The pin travels with the client, so any worker honours it"""
+
+    def setUp(self):
+        app = create_app({'ADMISSION': False})
+
+        @app.route('/test/reads-from-primary')
+        def reads_from_primary():
+            return {'primary': consistency.reads_from_primary()}
+
+        self.app = app.test_client()
+
+    def test_write_response_pins_the_clients_next_reads(self):
+        resp = self.app.post("/api/users/register", json={"username": f"pin-{time.time_ns()}", "password": "x"})
+        until = resp.headers[consistency.HEADER]
+        self.assertGreater(float(until), time.time())
+
+        # A client without the cookie, e.g. cross-origin, echoes the header
+        other = self.app.application.test_client()
+        self.assertFalse(other.get("/test/reads-from-primary").get_json()["primary"])
+        self.assertTrue(other.get("/test/reads-from-primary", headers={consistency.HEADER: until})
+                        .get_json()["primary"])
+
+        # The cookie alone does the same; expired or implausible values do not
+        self.assertTrue(self.app.get("/test/reads-from-primary").get_json()["primary"])
+        for value in (time.time() - 1, time.time() + 3600):
+            self.assertFalse(other.get("/test/reads-from-primary", headers={consistency.HEADER: str(value)})
+                             .get_json()["primary"])
+
+    def test_router_sends_pinned_clients_reads_to_the_primary(self):
+        tmp = tempfile.mkdtemp(prefix='replicas-')
+        primary = ConnectionPool(lambda: open_db(os.path.join(tmp, 'p.db'), 'primary'), 2, 0.01)
+        replica = Replica('replica', ConnectionPool(lambda: open_db(os.path.join(tmp, 'r.db'), 'replica'), 2, 0.01))
+        router = ReadRouter(primary, [replica], eject_seconds=0.05, pin_seconds=0.05)
+        token = consistency._primary.set(True)
+        try:
+            self.assertEqual(whoami(router.acquire('read')), 'primary')
+        finally:
+            consistency._primary.reset(token)
+        self.assertEqual(whoami(router.acquire('read')), 'replica')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import search
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestTokenize(unittest.TestCase):
+
+    def test_words_are_lowercased_and_deduplicated(self):
+        self.assertEqual(search.tokenize("Pizza night: PIZZA & drinks_2"), ['pizza', 'night', 'drinks', '2'])
+
+    def test_best_field_weight_wins(self):
+        terms = search.expense_terms("Dinner", "dinner with alexa", "alexa", "Trip")
+        self.assertEqual(terms['dinner'], search.FIELD_WEIGHTS['title'])
+        self.assertEqual(terms['alexa'], search.FIELD_WEIGHTS['payer'])
+        self.assertEqual(terms['trip'], search.FIELD_WEIGHTS['group'])
+
+class TestSearchEndpoint(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.group_id = self.create_group(name="Lisbon Trip").get_json()["id"]
+        self.ids = {}
+        for title, amount, date, notes in (
+            ("Dinner", 60.0, "2025-03-01", "seafood place"),
+            ("Dinner cruise", 120.0, "2025-03-02", ""),
+            ("Groceries", 35.0, "2025-03-03", "dinner supplies"),
+            ("Taxi", 18.0, "2025-03-04", "airport"),
+        ):
+            resp = self.app.post("/api/expenses/create", json={
+                "groupId": self.group_id, "title": title, "amount": amount,
+                "date": date, "paidBy": TEST_USER_A, "notes": notes
+            })
+            self.ids[title] = resp.get_json()["id"]
+
+    def search(self, **params):
+        params.setdefault("user", TEST_USER_A)
+        params.setdefault("groupId", self.group_id)
+        resp = self.app.get("/api/expenses/search", query_string=params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.get_json()
+
+    def test_prefix_match_ranks_title_above_note(self):
+        titles = [r["title"] for r in self.search(q="din")["results"]]
+        self.assertEqual(titles[-1], "Groceries")
+        self.assertCountEqual(titles, ["Dinner", "Dinner cruise", "Groceries"])
+
+    def test_every_term_must_match(self):
+        titles = [r["title"] for r in self.search(q="dinner cru")["results"]]
+        self.assertEqual(titles, ["Dinner cruise"])
+
+    def test_filters_and_pagination(self):
+        page = self.search(q="dinner", minAmount=50, limit=1)
+        self.assertEqual(len(page["results"]), 1)
+        self.assertTrue(page["hasMore"])
+
+        rest = self.search(q="dinner", minAmount=50, limit=1, offset=page["nextOffset"])
+        self.assertFalse(rest["hasMore"])
+        both = {page["results"][0]["title"], rest["results"][0]["title"]}
+        self.assertEqual(both, {"Dinner", "Dinner cruise"})
+
+        dated = self.search(q="trip", **{"from": "2025-03-04", "to": "2025-03-04"})
+        self.assertEqual([r["title"] for r in dated["results"]], ["Taxi"])
+
+    def test_deleted_expense_leaves_the_index(self):
+        self.app.post("/api/expenses/delete", json={"expenseId": self.ids["Taxi"]})
+        self.assertEqual(self.search(q="airport")["results"], [])
+
+    def test_other_users_groups_are_not_searched(self):
+        resp = self.app.get("/api/expenses/search", query_string={"user": "nobody", "q": "dinner"})
+        self.assertEqual(resp.get_json()["results"], [])
+
+    def test_query_required(self):
+        resp = self.app.get("/api/expenses/search", query_string={"user": TEST_USER_A, "q": " !! "})
+        self.assertEqual(resp.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
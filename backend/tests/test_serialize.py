@@ -0,0 +1,78 @@
+import gzip
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+import serialize
+from app import app
+from storage.rows import ExpenseRow, PaymentRow, Rows
+from tests.base import FlaskTestCase
+
+class ListCursor:
+    """fetchmany() over a list, like an unbuffered DB-API cursor"""
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.closed = False
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+class TestEncodeRows(unittest.TestCase):
+
+    def test_matches_dicts_across_chunks(self):
+        tuples = [(f'e{i}', i * 1.5, f'title {i}', None, '2025-01-02', 'ann') for i in range(2500)]
+        cursor = ListCursor(tuples)
+        encoded = json.loads(serialize.encode_rows(Rows(ExpenseRow, cursor)))
+        self.assertTrue(cursor.closed)
+        self.assertEqual(encoded, Rows(ExpenseRow, ListCursor(tuples)).dicts())
+        self.assertEqual(encoded[1]['paidBy'], 'ann')
+        self.assertEqual([r.title for r in Rows(ExpenseRow, ListCursor(tuples[:2]))], ['title 0', 'title 1'])
+
+    def test_empty(self):
+        self.assertEqual(serialize.encode_rows(Rows(ExpenseRow, ListCursor([]))), b'[]')
+
+    def test_values_encoded_like_jsonify(self):
+        row = (1, Decimal('12.50'), datetime(2025, 3, 4, 5, 6, 7), 'manual', 'Taxi', 'Trip')
+        with app.app_context():
+            expected = json.loads(app.json.dumps(Rows(PaymentRow, ListCursor([row])).dicts()))
+        self.assertEqual(json.loads(serialize.encode_rows(Rows(PaymentRow, ListCursor([row])))), expected)
+
+class TestCompression(unittest.TestCase):
+
+    def respond(self, headers):
+        rows = Rows(ExpenseRow, ListCursor((f'e{i}', 10.0, 'dinner', '', '2025-01-01', 'ann') for i in range(1000)))
+        with app.test_request_context(headers=headers):
+            return serialize.json_response(rows)
+
+    def test_gzip_when_accepted(self):
+        with mock.patch.object(serialize, 'brotli', None):
+            resp = self.respond({'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(resp.content_encoding, 'gzip')
+        self.assertIn('Accept-Encoding', resp.vary)
+        self.assertEqual(len(json.loads(gzip.decompress(resp.get_data()))), 1000)
+
+    def test_identity_otherwise(self):
+        resp = self.respond({})
+        self.assertIsNone(resp.content_encoding)
+        self.assertEqual(len(resp.get_json()), 1000)
+
+class TestListEndpoints(FlaskTestCase):
+
+    def test_list_expenses_shape(self):
+        group_id = self.create_group(name="rows").get_json()["id"]
+        self.app.post("/api/expenses/create", json={
+            "groupId": group_id, "title": "Lunch", "amount": 12, "date": "2025-05-01", "paidBy": "alexa"})
+        resp = self.app.get("/api/expenses/list", query_string={"groupId": group_id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "application/json")
+        [expense] = resp.get_json()
+        self.assertEqual(set(expense), {"id", "amount", "title", "note", "date", "paidBy"})
+        self.assertEqual((expense["title"], expense["amount"]), ("Lunch", 12.0))
+
+if __name__ == "__main__":
+    unittest.main()
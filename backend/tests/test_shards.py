@@ -0,0 +1,241 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+import shards
+import storage
+from expenseDB import ShardRouter
+from tests.base import FlaskTestCase
+
+class TestShardRouter(unittest.TestCase):
+
+    def test_adding_a_shard_only_moves_groups_onto_it(self):
+        group_ids = [str(uuid.uuid4()) for _ in range(2000)]
+        before = ShardRouter(['a', 'b', 'c'])
+        after = ShardRouter(['a', 'b', 'c', 'd'])
+
+        moved = [g for g in group_ids if before.shard_for(g) != after.shard_for(g)]
+        self.assertEqual({after.shard_for(g) for g in moved}, {'d'})
+        self.assertLess(abs(len(moved) / len(group_ids) - 0.25), 0.1)
+        for shard in 'abc':
+            share = sum(before.shard_for(g) == shard for g in group_ids) / len(group_ids)
+            self.assertLess(abs(share - 1 / 3), 0.1)
+
+    def test_directory_overrides_the_ring(self):
+        directory = {}
+        router = ShardRouter(['a', 'b'], load=lambda: directory.items(), ttl=60)
+        group_id = str(uuid.uuid4())
+        other = 'b' if router.shard_for(group_id) == 'a' else 'a'
+
+        directory[group_id] = other
+        self.assertNotEqual(router.shard_for(group_id), other)  # still the cached directory
+        router.refresh()
+        self.assertEqual(router.shard_for(group_id), other)
+
+class TestShardedStorage(FlaskTestCase):
+    """Three SQLite files standing in for three shard databases"""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.mkdtemp(prefix='expense-shards-')
+        self.paths = [os.path.join(tmp, f'shard{i}.sqlite3') for i in range(4)]
+        self.database = storage.configure('sqlite', shards=self.paths[:3])
+        self.addCleanup(storage.configure)
+        self.user = f"shard-{uuid.uuid4().hex[:8]}"
+        self.friend = f"shard-{uuid.uuid4().hex[:8]}"
+        for name in (self.user, self.friend):
+            resp = self.app.post("/api/users/register", json={"username": name, "password": "x"})
+            self.assertEqual(resp.status_code, 201)
+
+    def make_groups(self, count, start=0):
+        group_ids = []
+        for i in range(start, start + count):
+            group_id = self.create_group(name=f"trip {i}", owner=self.user).get_json()["id"]
+            self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": self.friend})
+            self.app.post("/api/expenses/create", json={
+                "groupId": group_id, "title": "Dinner", "amount": 10.0 * (i + 1),
+                "date": f"2025-06-{i + 1:02d}", "paidBy": self.user})
+            group_ids.append(group_id)
+        return group_ids
+
+    def holders(self, group_id):
+        return [shard for shard, ids in shards.groups_by_shard(self.database).items() if group_id in ids]
+
+    def holding_user(self, name):
+        """Shards with a users row for name, asked directly rather than through the existence cache"""
+        found = []
+        for shard, db in self.database.shards.items():
+            with db.session() as repo:
+                repo.cur.execute("SELECT 1 FROM users WHERE username = %s", (name,))
+                if repo.cur.fetchone():
+                    found.append(shard)
+        return found
+
+    def views(self):
+        """What the user-scoped endpoints answer, for comparing before and after a move"""
+        get = lambda path, user: self.app.get(path, query_string={"user": user}).get_json()
+        # Groups created within the same second may come back in either order
+        return {
+            "groups": sorted(get("/api/groups/list", self.user), key=lambda g: g["name"]),
+            "recent": get("/api/expenses/recent", self.user),
+            "overview": get("/api/analytics/overview", self.user),
+            "pending": get("/api/payments/pending", self.friend),
+            "balances": get("/api/balances", self.friend),
+        }
+
+    def test_users_are_on_every_shard(self):
+        for db in self.database.databases():
+            with db.session() as repo:
+                self.assertTrue(repo.user_exists(self.user))
+        resp = self.app.post("/api/users/login", json={"username": self.user, "password": "x"})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_groups_live_on_one_shard_and_user_views_gather(self):
+        group_ids = self.make_groups(8)
+
+        for group_id in group_ids:
+            self.assertEqual(self.holders(group_id), [self.database.router.shard_for(group_id)])
+        self.assertGreater(len({self.database.router.shard_for(g) for g in group_ids}), 1)
+
+        views = self.views()
+        self.assertEqual(sorted(g["id"] for g in views["groups"]), sorted(group_ids))
+        self.assertEqual([e["date"] for e in views["recent"]],
+                         [f"2025-06-{d:02d}" for d in (8, 7, 6, 5, 4)])
+        self.assertEqual(views["overview"]["totals"]["totalSpend"], 360.0)
+        self.assertEqual(views["overview"]["byPayer"], [{"payer": self.user, "total": 360.0}])
+        self.assertEqual(len(views["pending"]["pending"]), 8)
+        self.assertEqual(views["balances"]["youOwe"], 180.0)
+
+        listed = self.app.get("/api/expenses/list", query_string={"groupId": group_ids[3]}).get_json()
+        self.assertEqual([e["amount"] for e in listed], [40.0])
+
+    def test_search_pages_merge_every_shard(self):
+        self.make_groups(8)
+        pages, offset = [], 0
+        while offset is not None:
+            body = self.app.get("/api/expenses/search", query_string={
+                "user": self.user, "q": "dinner", "limit": 3, "offset": offset}).get_json()
+            pages.append([r["date"] for r in body["results"]])
+            offset = body["nextOffset"]
+        days = [f"2025-06-{d:02d}" for d in range(8, 0, -1)]
+        self.assertEqual(pages, [days[:3], days[3:6], days[6:]])
+
+    def test_analytics_sum_every_shard(self):
+        self.make_groups(8)
+        series = self.app.get("/api/analytics/timeseries", query_string={
+            "user": self.user, "start": "2025-06-01", "end": "2025-06-08", "breakdown": "payer"}).get_json()["series"]
+        self.assertEqual([p["total"] for p in series], [10.0 * d for d in range(1, 9)])
+        self.assertEqual(series[0]["breakdown"], {self.user: 10.0})
+
+        stats = self.app.get("/api/analytics/stats", query_string={"user": self.user}).get_json()
+        self.assertEqual((stats["count"], stats["total"]), (8, 360.0))
+        self.assertEqual({m["member"]: m["share"] for m in stats["fairness"]}, {self.user: 180.0, self.friend: 180.0})
+
+    def test_export_by_user_reads_every_shard(self):
+        group_ids = self.make_groups(8)
+        resp = self.app.get("/api/export/expenses", query_string={"user": self.friend, "format": "ndjson"})
+        self.assertEqual(resp.status_code, 200)
+        rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        self.assertEqual(sorted(r["group_id"] for r in rows), sorted(group_ids))
+
+    def test_sync_is_refused(self):
+        resp = self.app.get("/api/sync", query_string={"user": self.user})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("/api/stream", resp.get_json()["error"])
+
+    def test_registration_that_failed_half_way_can_be_retried(self):
+        name = f"shard-{uuid.uuid4().hex[:8]}"
+        # The home shard commits last; make the middle one fail after the last has committed
+        failing = self.database.shards[self.paths[1]]
+        connect = failing.connect
+
+        def connect_and_fail_commit(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.commit = mock.Mock(side_effect=sqlite3.OperationalError("disk I/O error"))
+            return conn
+
+        with mock.patch.object(failing, "connect", connect_and_fail_commit):
+            resp = self.app.post("/api/users/register", json={"username": name, "password": "x"})
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(self.holding_user(name), [self.paths[2]])
+
+        resp = self.app.post("/api/users/register", json={"username": name, "password": "y"})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.holding_user(name), self.paths[:3])
+        resp = self.app.post("/api/users/login", json={"username": name, "password": "y"})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_expense_writes_find_their_shard(self):
+        group_id = self.make_groups(1)[0]
+        expense_id = self.views()["pending"]["pending"][0]["expense_id"]
+
+        resp = self.app.post("/api/payments/pay", json={
+            "expenseId": expense_id, "username": self.friend, "amount": 5.0})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.views()["pending"]["pending"], [])
+
+        resp = self.app.post("/api/expenses/delete", json={"expenseId": expense_id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.app.get("/api/expenses/list", query_string={"groupId": group_id}).get_json(), [])
+
+    def test_move_group_uses_the_directory(self):
+        group_id = self.make_groups(1)[0]
+        home = self.database.router.shard_for(group_id)
+        target = next(s for s in self.paths[:3] if s != home)
+        before = self.views()
+
+        shards.move_group(self.database, group_id, target)
+        self.assertEqual(self.holders(group_id), [target])
+        self.assertEqual(self.database.router.directory(), {group_id: target})
+        self.assertEqual(self.views(), before)
+
+        shards.move_group(self.database, group_id, home)
+        self.assertEqual(self.holders(group_id), [home])
+        self.assertEqual(self.database.router.directory(), {})
+
+    def test_rows_left_by_an_interrupted_move_are_not_counted(self):
+        group_id = self.make_groups(1)[0]
+        other = next(s for s in self.paths[:3] if s != self.database.router.shard_for(group_id))
+        # The copy was made but the move stopped before the old rows were deleted
+        with self.database.shard_of(group_id).session() as source, \
+                self.database.shards[other].transaction() as repo:
+            shards.copy_group(source, repo, group_id)
+        self.assertEqual(len(self.holders(group_id)), 2)
+
+        query = {"user": self.friend, "with": self.user}
+        self.assertEqual(self.app.get("/api/balances", query_string=query).get_json()["net"], 5.0)
+        self.assertEqual(self.app.get("/api/balances", query_string={**query, "asOf": "2099-01-01"}).get_json()["net"],
+                         5.0)
+
+    def test_rebalance_onto_a_new_shard(self):
+        group_ids = self.make_groups(12)
+        while not any(ShardRouter(self.paths).shard_for(g) == self.paths[3] for g in group_ids):
+            group_ids += self.make_groups(1, start=len(group_ids))
+        # A member who joins later is not covered by the earlier expenses' split rules
+        late = f"shard-{uuid.uuid4().hex[:8]}"
+        self.app.post("/api/users/register", json={"username": late, "password": "x"})
+        for group_id in group_ids:
+            self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": late})
+        before = self.views()
+
+        self.database = storage.configure('sqlite', shards=self.paths)
+        moves = shards.rebalance(self.database, dry_run=True)
+        self.assertTrue(moves)
+        self.assertEqual({target for _, _, target in moves}, {self.paths[3]})
+
+        self.assertEqual(shards.rebalance(self.database), moves)
+        self.assertEqual(shards.misplaced(self.database), [])
+        for group_id in group_ids:
+            self.assertEqual(self.holders(group_id), [self.database.router.shard_for(group_id)])
+        self.assertEqual(self.views(), before)
+        pending = self.app.get("/api/payments/pending", query_string={"user": late}).get_json()
+        self.assertEqual(pending["pending"], [])
+        for db in self.database.databases():
+            with db.session() as repo:
+                self.assertEqual(repo.audit_ledger(), [])
+
+if __name__ == "__main__":
+    unittest.main()
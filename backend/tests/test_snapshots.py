@@ -0,0 +1,132 @@
+import unittest
+import uuid
+from datetime import datetime, timedelta
+import snapshots
+import storage
+from tests.base import FlaskTestCase, TEST_USER_A
+
+def stamp(moment):
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+class TestLedgerSnapshots(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friend = f"snap-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(self.friend, "x")
+        self.group_id = self.create_group(name="snapshots").get_json()["id"]
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": self.friend})
+
+    def add_expense(self, amount, when=None):
+        resp = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": "Rent", "amount": amount,
+            "date": "2025-03-01", "paidBy": TEST_USER_A})
+        if when:
+            self.backdate("ledger_entries", "created_at", when)
+        return resp.get_json()["id"]
+
+    def backdate(self, table, column, when):
+        """Move the group's newest row of `table` (an entry or snapshot) to `when`"""
+        with storage.transaction() as repo:
+            repo.cur.execute(f"SELECT MAX(id) FROM {table} WHERE group_id = %s", (self.group_id,))
+            newest = repo.cur.fetchone()[0]
+            repo.cur.execute(f"UPDATE {table} SET {column} = %s WHERE id = %s", (stamp(when), newest))
+
+    def snapshot(self, when):
+        with storage.transaction() as repo:
+            repo.snapshot_ledger(self.group_id)
+        self.backdate("ledger_snapshots", "taken_at", when)
+
+    def owed(self, as_of=None):
+        query = {"user": self.friend}
+        if as_of:
+            query["asOf"] = as_of
+        resp = self.app.get("/api/balances", query_string=query)
+        return resp.status_code, resp.get_json().get("youOwe")
+
+    def test_as_of_replays_entries_after_the_nearest_snapshot(self):
+        self.add_expense(40.0, datetime(2025, 2, 10, 12))
+        self.snapshot(datetime(2025, 2, 28, 23))
+        expense_id = self.add_expense(20.0, datetime(2025, 3, 5, 9))
+        self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": self.friend, "amount": 10.0})
+        self.backdate("ledger_entries", "created_at", datetime(2025, 3, 20, 18))
+
+        self.assertEqual(self.owed("2025-02-01"), (200, 0))
+        self.assertEqual(self.owed("2025-03-01"), (200, 20.0))
+        self.assertEqual(self.owed("2025-03-10T00:00:00Z"), (200, 30.0))
+        self.assertEqual(self.owed("2025-03-31"), self.owed())
+        self.assertEqual(self.owed("March"), (400, None))
+
+        resp = self.app.get("/api/balances", query_string={"user": self.friend, "with": TEST_USER_A,
+                                                           "asOf": "2025-03-10"})
+        self.assertEqual(resp.get_json()["net"], 30.0)
+        resp = self.app.get("/api/settlements/suggest", query_string={"groupId": self.group_id,
+                                                                      "asOf": "2025-03-10"})
+        self.assertEqual(resp.get_json()["transfers"], [{"from": self.friend, "to": TEST_USER_A, "amount": 30.0}])
+        self.assertEqual(resp.get_json()["asOf"], "2025-03-10 23:59:59")
+
+    def test_settlements_now_match_as_of_a_future_moment(self):
+        expense_id = self.add_expense(20.0)
+        self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": self.friend, "amount": 5.0})
+
+        live = self.app.get("/api/settlements/suggest", query_string={"groupId": self.group_id}).get_json()
+        self.assertEqual(live["transfers"], [{"from": self.friend, "to": TEST_USER_A, "amount": 5.0}])
+        later = self.app.get("/api/settlements/suggest", query_string={"groupId": self.group_id,
+                                                                       "asOf": "2099-01-01"}).get_json()
+        self.assertEqual(later["transfers"], live["transfers"])
+
+    def test_writes_trigger_snapshots(self):
+        self.addCleanup(setattr, snapshots, "EVERY_WRITES", snapshots.EVERY_WRITES)
+        snapshots.EVERY_WRITES = 2
+        for amount in (10.0, 20.0, 30.0, 40.0, 50.0):
+            self.add_expense(amount)
+
+        with storage.session() as repo:
+            repo.cur.execute("SELECT COUNT(*) FROM ledger_snapshots WHERE group_id = %s", (self.group_id,))
+            self.assertEqual(repo.cur.fetchone()[0], 2)
+            repo.cur.execute("SELECT pending FROM ledger_heads WHERE group_id = %s", (self.group_id,))
+            self.assertEqual(repo.cur.fetchone()[0], 1)
+        self.assertEqual(self.owed(stamp(datetime.utcnow() + timedelta(minutes=1))), (200, 75.0))
+
+    def test_compaction_keeps_month_ends_and_sets_a_floor(self):
+        now = datetime.utcnow()
+        month = (now - timedelta(days=300)).replace(day=1, hour=12)
+        old = now - timedelta(days=3 * 365)
+        for amount, when in ((10.0, old), (20.0, old + timedelta(days=1)),
+                             (30.0, month + timedelta(days=4)), (40.0, month + timedelta(days=19))):
+            self.add_expense(amount, when - timedelta(hours=1))
+            self.snapshot(when)
+        with storage.transaction() as repo:
+            repo.snapshot_ledger(self.group_id)
+
+        with storage.transaction() as repo:
+            removed = repo.compact_snapshots(snapshots.KEEP_DAYS, snapshots.KEEP_MONTHS)
+            repo.cur.execute("SELECT taken_at, is_floor FROM ledger_snapshots WHERE group_id = %s ORDER BY id",
+                             (self.group_id,))
+            kept = repo.cur.fetchall()
+            repo.cur.execute("SELECT COUNT(*) FROM ledger_entries WHERE group_id = %s", (self.group_id,))
+            entries = repo.cur.fetchone()[0]
+        self.assertEqual(removed[0], 3)
+        self.assertEqual([floor for _, floor in kept], [1, 0])
+        self.assertEqual(stamp(kept[0][0]), stamp(month + timedelta(days=19)))
+        self.assertEqual(entries, 0)
+
+        self.assertEqual(self.owed(stamp(month + timedelta(days=10)))[0], 404)
+        self.assertEqual(self.owed(stamp(month + timedelta(days=20))), (200, 50.0))
+        self.assertEqual(self.owed(stamp(now + timedelta(minutes=1))), (200, 50.0))
+
+    def test_ledger_older_than_the_journal_has_no_history_before_its_first_snapshot(self):
+        self.add_expense(40.0)
+        with storage.transaction() as repo:
+            repo.cur.execute("DELETE FROM ledger_entries WHERE group_id = %s", (self.group_id,))
+            repo.cur.execute("DELETE FROM ledger_heads WHERE group_id = %s", (self.group_id,))
+        self.assertEqual(self.owed(stamp(datetime.utcnow()))[0], 404)
+
+        with storage.transaction() as repo:
+            self.assertGreaterEqual(repo.take_snapshots(), 1)
+        self.assertEqual(self.owed(stamp(datetime.utcnow() - timedelta(days=1)))[0], 404)
+        self.assertEqual(self.owed(stamp(datetime.utcnow() + timedelta(minutes=1))), (200, 20.0))
+
+if __name__ == "__main__":
+    unittest.main()
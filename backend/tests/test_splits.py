@@ -0,0 +1,96 @@
+import unittest
+import uuid
+import storage
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestSplitRules(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friends = [f"split-{uuid.uuid4().hex[:8]}" for _ in range(3)]
+        with storage.transaction() as repo:
+            for name in self.friends:
+                repo.create_user(name, "x")
+        self.group_id = self.create_group(name="splits").get_json()["id"]
+        self.app.post("/api/groups/members", json={"groupId": self.group_id, "add": self.friends})
+
+    def add_expense(self, amount=40.0, paid_by=TEST_USER_A):
+        resp = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": "Groceries", "amount": amount,
+            "date": "2025-06-01", "paidBy": paid_by})
+        return resp.get_json()["id"]
+
+    def splits(self, expense_id):
+        with storage.session() as repo:
+            source, args = repo.split_source('expense', expense_id)
+            repo.cur.execute(f"SELECT username, split_amount FROM {source} es", args)
+            return {name: round(float(amount), 2) for name, amount in repo.cur.fetchall()}
+
+    def count(self, table, expense_id):
+        with storage.session() as repo:
+            repo.cur.execute(f"SELECT COUNT(*) FROM {table} WHERE expense_id = %s", (expense_id,))
+            return repo.cur.fetchone()[0]
+
+    def test_equal_split_is_one_rule_row(self):
+        expense_id = self.add_expense()
+        self.assertEqual(self.count("expense_split_rule", expense_id), 1)
+        self.assertEqual(self.count("expense_split", expense_id), 0)
+        self.assertEqual(self.splits(expense_id), {name: 10.0 for name in self.friends})
+
+        pending = self.app.get("/api/payments/pending", query_string={"user": self.friends[0]}).get_json()
+        self.assertEqual([(p["expense_id"], p["amount_owed"]) for p in pending["pending"]], [(expense_id, 10.0)])
+
+        transfers = self.app.get("/api/settlements/suggest", query_string={"groupId": self.group_id}).get_json()
+        self.assertEqual(sorted((t["from"], t["amount"]) for t in transfers["transfers"]),
+                         sorted((name, 10.0) for name in self.friends))
+
+    def test_status_is_paid_once_every_share_is(self):
+        expense_id = self.add_expense()
+        for name in self.friends:
+            self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": name, "amount": 10.0})
+        with storage.session() as repo:
+            repo.cur.execute("SELECT status FROM expenses WHERE id = %s", (expense_id,))
+            self.assertEqual(repo.cur.fetchone()[0], "paid")
+
+    def test_later_members_do_not_owe_earlier_expenses(self):
+        expense_id = self.add_expense()
+        late = f"split-late-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(late, "x")
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": late})
+        self.assertNotIn(late, self.splits(expense_id))
+        self.assertEqual(self.splits(self.add_expense(50.0))[late], 10.0)
+
+    def test_removed_member_keeps_their_settled_share(self):
+        expense_id = self.add_expense()
+        self.app.post("/api/payments/pay", json={"expenseId": expense_id, "username": self.friends[0], "amount": 10.0})
+        resp = self.app.post("/api/groups/members", json={"groupId": self.group_id, "remove": [self.friends[0]]})
+        self.assertEqual(resp.get_json()["removed"], 1)
+        self.assertEqual(self.splits(expense_id)[self.friends[0]], 10.0)
+
+    def test_compact_converts_explicit_rows_losslessly(self):
+        expense_id = self.add_expense()
+        # Rewrite the expense the way splits were stored before rules, with one member's share changed
+        with storage.transaction() as repo:
+            source, args = repo.split_source('expense', expense_id)
+            repo.cur.execute(f"INSERT INTO expense_split SELECT * FROM {source} es", args)
+            repo.cur.execute("DELETE FROM expense_split_rule WHERE expense_id = %s", (expense_id,))
+            repo.cur.execute("UPDATE expense_split SET split_amount = 4 WHERE expense_id = %s AND username = %s",
+                             (expense_id, self.friends[2]))
+        before = self.splits(expense_id)
+        with storage.session() as repo:
+            audit = repo.audit_ledger()
+
+        last, converted = '', 0
+        while last is not None:
+            with storage.transaction() as repo:
+                last, done, _ = repo.compact_splits(last)
+            converted += done
+        self.assertGreaterEqual(converted, 1)
+        self.assertEqual(self.splits(expense_id), before)
+        self.assertEqual(self.count("expense_split", expense_id), 1)
+        with storage.session() as repo:
+            self.assertEqual(repo.audit_ledger(), audit)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import uuid
+import storage
+from stats import SpendFrame
+from tests.base import FlaskTestCase, TEST_USER_A
+
+def frame(rows):
+    return SpendFrame.from_rows([(f'e{i}', 'x', amount, day, payer, owed)
+                                 for i, (amount, day, payer, owed) in enumerate(rows)])
+
+class TestSpendFrame(unittest.TestCase):
+
+    def test_rolling_average_fills_empty_days(self):
+        f = frame([(10.0, '2025-01-01', 'a', 0), (20.0, '2025-01-03', 'a', 0)])
+        series = f.rolling_average(window=2, points=3)
+        self.assertEqual(series, [
+            {'date': '2025-01-01', 'average': 5.0},
+            {'date': '2025-01-02', 'average': 5.0},
+            {'date': '2025-01-03', 'average': 10.0},
+        ])
+
+    def test_month_over_month_includes_empty_months(self):
+        f = frame([(100.0, '2025-01-05', 'a', 0), (50.0, '2025-03-01', 'a', 0), (25.0, '2025-03-09', 'a', 0)])
+        self.assertEqual(f.month_over_month(), [
+            {'month': '2025-01', 'total': 100.0, 'delta': None, 'change': None},
+            {'month': '2025-02', 'total': 0.0, 'delta': -100.0, 'change': -1.0},
+            {'month': '2025-03', 'total': 75.0, 'delta': 75.0, 'change': None},
+        ])
+
+    def test_outliers_and_blank_dates(self):
+        rows = [(20.0 + i % 3, '2025-02-01', 'a', 0) for i in range(20)] + [(900.0, '', 'a', 0)]
+        outliers = frame(rows).outliers()
+        self.assertEqual([o['amount'] for o in outliers], [900.0])
+        self.assertIsNone(outliers[0]['date'])
+
+    def test_fairness_counts_payer_share(self):
+        # a paid 90 split three ways; b paid 30 split three ways
+        f = frame([(90.0, '2025-01-01', 'a', 60.0), (30.0, '2025-01-02', 'b', 20.0)])
+        fairness = {m['member']: m for m in f.fairness({'a': 10.0, 'b': 30.0, 'c': 40.0})}
+        self.assertEqual(fairness['a']['ratio'], 2.25)
+        self.assertEqual(fairness['b']['share'], 40.0)
+        self.assertEqual(fairness['c']['ratio'], 0.0)
+
+    def test_empty_frame(self):
+        f = frame([])
+        self.assertEqual(f.summary()['count'], 0)
+        self.assertEqual(f.rolling_average(), [])
+        self.assertEqual(f.fairness({}), [])
+
+class TestStatsEndpoint(FlaskTestCase):
+
+    def test_group_stats(self):
+        friend = f"stats-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(friend, "x")
+        group_id = self.create_group(name="stats").get_json()["id"]
+        self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": friend})
+        for amount, payer in ((40.0, TEST_USER_A), (20.0, friend)):
+            self.app.post("/api/expenses/create", json={
+                "groupId": group_id, "title": "t", "amount": amount, "date": "2025-04-01", "paidBy": payer})
+
+        resp = self.app.get("/api/analytics/stats", query_string={"groupId": group_id})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.get_json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["percentiles"]["p50"], 30.0)
+        ratios = {m["member"]: m["ratio"] for m in data["fairness"]}
+        self.assertEqual(ratios, {TEST_USER_A: 1.333, friend: 0.667})
+
+if __name__ == "__main__":
+    unittest.main()
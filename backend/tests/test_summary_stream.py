@@ -0,0 +1,118 @@
+import json
+import os
+import unittest
+import uuid
+import clients
+import llm
+from routes import summary
+from tests.base import FlaskTestCase
+
+def events(body):
+    """[(event, data)] from a Server-Sent Events body"""
+    found = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        found.append((fields["event"], json.loads(fields["data"])))
+    return found
+
+class FakeResponse:
+    """A streamed OpenAI response that records being closed"""
+
+    def __init__(self, status_code, lines):
+        self.status_code = status_code
+        self.lines = lines
+        self.text = "invalid api key"
+        self.closed = False
+
+    def iter_lines(self):
+        for line in self.lines:
+            if self.closed:
+                return
+            yield line
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+
+    def __init__(self, response):
+        self.response = response
+        self.sent = []
+
+    def post(self, url, **kwargs):
+        self.sent.append(kwargs["json"])
+        return self.response
+
+def chunk(content):
+    return b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode()
+
+class TestSummaryStream(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.provider = llm.PROVIDER
+        llm.PROVIDER = "fake"
+        # A fresh user for each test, so the external class's rate limit is not shared
+        self.user = f"ai-{uuid.uuid4().hex[:8]}"
+        self.app.post("/api/users/register", json={"username": self.user, "password": "x"})
+        group_id = self.create_group(name="Trip", owner=self.user).get_json()["id"]
+        self.app.post("/api/expenses/create", json={
+            "groupId": group_id, "title": "Fuel", "amount": 60.0, "date": "2025-05-01", "paidBy": self.user})
+
+    def tearDown(self):
+        llm.PROVIDER = self.provider
+        os.environ.pop("OPENAI_API_KEY", None)
+        clients.reset()
+
+    def use_openai(self, response):
+        llm.PROVIDER = "openai"
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        clients._llm_session = FakeSession(response)
+        return clients._llm_session
+
+    def test_tokens_are_sent_as_they_arrive_then_done(self):
+        first_tokens = summary.first_token_seconds.count()
+        completed = summary.stream_seconds.count(outcome="completed")
+
+        resp = self.app.get("/api/summary/ai/stream", query_string={"user": self.user})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "text/event-stream")
+
+        found = events(resp.get_data(as_text=True))
+        tokens = [data["text"] for event, data in found if event == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(found[-1][0], "done")
+        self.assertEqual(found[-1][1]["text"], "".join(tokens).strip())
+        self.assertEqual(found[-1][1]["text"], llm.FAKE_TEXT)
+
+        self.assertEqual(summary.first_token_seconds.count(), first_tokens + 1)
+        self.assertEqual(summary.stream_seconds.count(outcome="completed"), completed + 1)
+        self.assertIn('summary_ai_stream_seconds_bucket{outcome="completed",le="+Inf"}',
+                      self.app.get("/api/metrics").get_data(as_text=True))
+
+    def test_openai_chunks_are_relayed_and_disconnect_closes_upstream(self):
+        upstream = FakeResponse(200, [b": keep-alive", chunk("- Fuel"), b"", chunk(" is most"), b"data: [DONE]"])
+        session = self.use_openai(upstream)
+        cancelled = summary.stream_seconds.count(outcome="cancelled")
+
+        resp = self.app.get("/api/summary/ai/stream", query_string={"user": self.user}, buffered=False)
+        self.assertTrue(session.sent[0]["stream"])
+        body = iter(resp.response)
+        self.assertEqual(events(next(body).decode()), [("token", {"text": "- Fuel"})])
+
+        # The client goes away after the first token
+        resp.close()
+        self.assertTrue(upstream.closed)
+        self.assertEqual(summary.stream_seconds.count(outcome="cancelled"), cancelled + 1)
+
+    def test_refused_request_is_an_error_before_streaming(self):
+        upstream = FakeResponse(401, [])
+        self.use_openai(upstream)
+
+        resp = self.app.get("/api/summary/ai/stream", query_string={"user": self.user})
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(resp.get_json()["error"], "OpenAI error 401")
+        self.assertTrue(upstream.closed)
+
+if __name__ == "__main__":
+    unittest.main()
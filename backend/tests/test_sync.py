@@ -0,0 +1,112 @@
+import unittest
+import uuid
+import storage
+from tests.base import FlaskTestCase
+
+class TestSync(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = f"sync-{uuid.uuid4().hex[:8]}"
+        self.app.post("/api/users/register", json={"username": self.owner, "password": "x"})
+        self.group_id = self.create_group(name="Flat", owner=self.owner).get_json()["id"]
+
+    def sync(self, since, **params):
+        resp = self.app.get("/api/sync", query_string={"user": self.owner, "since": since, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.get_json()
+
+    def add_expense(self, title, amount=10.0):
+        return self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": title, "amount": amount,
+            "date": "2025-06-01", "paidBy": self.owner}).get_json()["id"]
+
+    def test_first_sync_is_a_snapshot_with_a_cursor(self):
+        expense_id = self.add_expense("Rent")
+        body = self.sync(0)
+
+        self.assertTrue(body["reset"])
+        self.assertFalse(body["hasMore"])
+        self.assertEqual([g["id"] for g in body["groups"]], [self.group_id])
+        self.assertEqual([e["id"] for e in body["expenses"]], [expense_id])
+        self.assertEqual(body["payments"], [])
+
+        # Nothing new since the snapshot's cursor
+        after = self.sync(body["cursor"])
+        self.assertFalse(after["reset"])
+        self.assertEqual((after["changes"], after["cursor"]), ([], body["cursor"]))
+
+    def test_cursor_below_the_compacted_floor_resets(self):
+        cursor = self.sync(0)["cursor"]
+        self.add_expense("Gas")
+        with storage.transaction() as repo:
+            floor = repo.change_head()
+            repo.cur.execute(f'''
+                INSERT INTO entity_versions (kind, entity_id, version) VALUES ('changelog', 'floor', %s)
+                {repo.upsert('kind, entity_id')} version = %s
+            ''', (floor, floor))
+        self.addCleanup(self.lower_floor)
+
+        body = self.sync(cursor)
+        self.assertTrue(body["reset"])
+        self.assertEqual(len(body["expenses"]), 1)
+        self.assertGreaterEqual(body["cursor"], floor)
+        # The fresh cursor replays again
+        self.assertFalse(self.sync(body["cursor"])["reset"])
+
+    def lower_floor(self):
+        with storage.transaction() as repo:
+            repo.cur.execute("DELETE FROM entity_versions WHERE kind = 'changelog' AND entity_id = 'floor'")
+
+    def test_limit_pages_with_has_more(self):
+        cursor = self.sync(0)["cursor"]
+        ids = [self.add_expense(f"Item {n}") for n in range(3)]
+
+        first = self.sync(cursor, limit=2)
+        self.assertTrue(first["hasMore"])
+        self.assertEqual([c["entityId"] for c in first["changes"]], [str(i) for i in ids[:2]])
+        self.assertEqual(first["cursor"], first["changes"][-1]["id"])
+
+        second = self.sync(first["cursor"], limit=2)
+        self.assertFalse(second["hasMore"])
+        self.assertEqual([c["entityId"] for c in second["changes"]], [str(ids[2])])
+
+    def test_deletes_arrive_as_tombstones(self):
+        expense_id = self.add_expense("Mistake")
+        cursor = self.sync(0)["cursor"]
+        self.app.post("/api/expenses/delete", json={"expenseId": expense_id})
+
+        changes = self.sync(cursor)["changes"]
+        self.assertEqual([(c["entity"], c["entityId"], c["op"], c["data"]) for c in changes],
+                         [("expense", str(expense_id), "delete", None)])
+
+    def test_a_removed_member_receives_their_removal(self):
+        friend = f"sync-{uuid.uuid4().hex[:8]}"
+        self.app.post("/api/users/register", json={"username": friend, "password": "x"})
+        self.app.post("/api/groups/add-member", json={"groupId": self.group_id, "memberName": friend})
+        cursor = self.app.get("/api/sync", query_string={"user": friend, "since": 0}).get_json()["cursor"]
+
+        self.app.post("/api/groups/members", json={"groupId": self.group_id, "remove": [friend]})
+        self.add_expense("After they left")
+
+        body = self.app.get("/api/sync", query_string={"user": friend, "since": cursor}).get_json()
+        self.assertEqual([(c["groupId"], c["entity"], c["entityId"], c["op"]) for c in body["changes"]],
+                         [(self.group_id, "member", friend, "delete")])
+        # The members who stay see it as well
+        self.assertIn(("member", friend, "delete"),
+                      [(c["entity"], c["entityId"], c["op"]) for c in self.sync(cursor)["changes"]])
+
+    def test_a_lower_id_committed_late_is_not_skipped(self):
+        self.add_expense("Early")
+        cursor = self.sync(0)["cursor"]
+        # A transaction that took its id before the ones the client has seen, committing only now
+        with storage.transaction() as repo:
+            repo.record_change(self.group_id, "member", self.owner, "update")
+            repo.cur.execute("UPDATE change_log SET id = (SELECT MIN(id) FROM change_log) - 1 WHERE seq IS NULL")
+
+        changes = self.sync(cursor)["changes"]
+        self.assertEqual([(c["entity"], c["op"]) for c in changes], [("member", "update")])
+        self.assertGreater(changes[0]["id"], cursor)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+import rollups
+from routes import analytics
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestPeriods(unittest.TestCase):
+
+    def test_weeks_start_on_monday_and_months_roll_over_years(self):
+        self.assertEqual(rollups.periods(date(2025, 1, 1), date(2025, 1, 14), 'week'),
+                         ['2024-12-30', '2025-01-06', '2025-01-13'])
+        self.assertEqual(rollups.periods(date(2024, 11, 20), date(2025, 2, 1), 'month'),
+                         ['2024-11', '2024-12', '2025-01', '2025-02'])
+
+    def test_fill_adds_zero_periods(self):
+        rows = [('2025-03-02', None, 5.0), ('2025-03-04', None, 7.5)]
+        series = rollups.fill(rows, date(2025, 3, 1), date(2025, 3, 4), 'day')
+        self.assertEqual([(p, t) for p, t, _ in series],
+                         [('2025-03-01', 0.0), ('2025-03-02', 5.0), ('2025-03-03', 0.0), ('2025-03-04', 7.5)])
+
+class TestTimeseriesEndpoint(FlaskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.group_id = self.create_group(name="rollup group").get_json()["id"]
+
+    def add_expense(self, title, amount, day):
+        resp = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": title, "amount": amount, "date": day, "paidBy": TEST_USER_A
+        })
+        return resp.get_json()["id"]
+
+    def series(self, **params):
+        params.update(user=TEST_USER_A, groupId=self.group_id)
+        resp = self.app.get("/api/analytics/timeseries", query_string=params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.get_json()["series"]
+
+    def test_weekly_series_with_breakdown_and_gaps(self):
+        self.add_expense("Rent", 100.0, "2023-05-01")
+        self.add_expense("Food", 20.0, "2023-05-03")
+        self.add_expense("Food", 30.0, "2023-05-16")
+
+        series = self.series(start="2023-05-01", end="2023-05-21", granularity="week", breakdown="category")
+        self.assertEqual([(p["period"], p["total"]) for p in series],
+                         [("2023-05-01", 120.0), ("2023-05-08", 0.0), ("2023-05-15", 30.0)])
+        self.assertEqual(series[0]["breakdown"], {"Rent": 100.0, "Food": 20.0})
+
+    def test_delete_is_taken_out_of_the_rollup(self):
+        expense_id = self.add_expense("Taxi", 15.0, "2023-06-10")
+        self.app.post("/api/expenses/delete", json={"expenseId": expense_id})
+
+        series = self.series(start="2023-06-01", end="2023-06-30", granularity="month")
+        self.assertEqual(series, [{"period": "2023-06", "total": 0.0}])
+
+    def test_etag_moves_with_the_query_and_the_default_end(self):
+        params = {"user": TEST_USER_A, "granularity": "day"}
+        etag = self.app.get("/api/analytics/timeseries", query_string=params).headers["ETag"]
+        resp = self.app.get("/api/analytics/timeseries", query_string=params, headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+
+        resp = self.app.get("/api/analytics/timeseries", query_string={**params, "granularity": "week"},
+                            headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+
+        # After midnight the open-ended window has moved, though nothing was written
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return date.today() + timedelta(days=1)
+
+        with mock.patch.object(analytics, "date", Tomorrow):
+            resp = self.app.get("/api/analytics/timeseries", query_string=params, headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["series"][-1]["period"], (date.today() + timedelta(days=1)).isoformat())
+
+    def test_rejects_bad_ranges(self):
+        resp = self.app.get("/api/analytics/timeseries", query_string={
+            "user": TEST_USER_A, "start": "2025-02-01", "end": "2025-01-01"})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.app.get("/api/analytics/timeseries", query_string={
+            "user": TEST_USER_A, "granularity": "hour"})
+        self.assertEqual(resp.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
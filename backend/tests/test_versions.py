@@ -0,0 +1,43 @@
+import unittest
+import versions
+from storage.base import Repository
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def execute(self, query, args=()):
+        self.queries.append(args)
+
+    def fetchone(self):
+        return self.row
+
+class FakeConnection:
+    def __init__(self, row):
+        self.cursor_ = FakeCursor(row)
+
+    def cursor(self):
+        return self.cursor_
+
+class TestVersions(unittest.TestCase):
+
+    def test_group_token_defaults_to_zero(self):
+        """A group that was never written to still gets a stable token."""
+        self.assertEqual(Repository(FakeConnection(None)).version_token('group', 'g1'), 'g0')
+        self.assertEqual(Repository(FakeConnection((7,))).version_token('group', 'g1'), 'g7')
+
+    def test_user_token_is_one_round_trip(self):
+        conn = FakeConnection((2, 15))
+        self.assertEqual(Repository(conn).version_token('user', 'alexa'), 'u2.15')
+        self.assertEqual(len(conn.cursor_.queries), 1)
+
+    def test_etag_depends_on_path_scope_and_token(self):
+        base = versions.etag('/api/expenses/list', 'group', 'g1', 'g1')
+        self.assertEqual(base, versions.etag('/api/expenses/list', 'group', 'g1', 'g1'))
+        self.assertNotEqual(base, versions.etag('/api/expenses/list', 'group', 'g1', 'g2'))
+        self.assertNotEqual(base, versions.etag('/api/settlements/suggest', 'group', 'g1', 'g1'))
+        self.assertNotEqual(base, versions.etag('/api/expenses/list', 'group', 'g1', 'g1', 'asOf=2025-01-01'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import uuid
+import storage
+from tests.base import FlaskTestCase, TEST_USER_A
+
+class TestWriteErrors(FlaskTestCase):
+    """Writes check existence with constraints; each failure keeps its 404/409"""
+
+    def setUp(self):
+        super().setUp()
+        self.friend = f"writes-{uuid.uuid4().hex[:8]}"
+        with storage.transaction() as repo:
+            repo.create_user(self.friend, "x")
+        self.group_id = self.create_group(name="writes").get_json()["id"]
+
+    def add_member(self, group_id, member):
+        return self.app.post("/api/groups/add-member", json={"groupId": group_id, "memberName": member})
+
+    def test_add_member(self):
+        self.assertEqual(self.add_member(self.group_id, self.friend).status_code, 201)
+
+        resp = self.add_member(self.group_id, self.friend)
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (409, "User is already a member"))
+        resp = self.add_member("no-such-group", self.friend)
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (404, "Group not found"))
+        resp = self.add_member(self.group_id, "no-such-user")
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (404, "User not found"))
+
+    def test_create_group_for_unknown_owner(self):
+        resp = self.create_group(owner="no-such-user")
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (404, "User not found"))
+
+    def test_create_expense(self):
+        expense = {"groupId": self.group_id, "title": "Cab", "amount": 9, "date": "2025-01-01", "paidBy": TEST_USER_A}
+        resp = self.app.post("/api/expenses/create", json={**expense, "groupId": "no-such-group"})
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (404, "Group not found"))
+        resp = self.app.post("/api/expenses/create", json={**expense, "paidBy": "no-such-user"})
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (404, "User no-such-user not found"))
+
+        resp = self.app.post("/api/expenses/create", json=expense)
+        self.assertEqual(resp.status_code, 201)
+        with storage.session() as repo:
+            self.assertEqual(len(repo.list_expenses(self.group_id).dicts()), 1)
+
+    def test_payment(self):
+        self.add_member(self.group_id, self.friend)
+        expense_id = self.app.post("/api/expenses/create", json={
+            "groupId": self.group_id, "title": "Cab", "amount": 10, "date": "2025-01-01", "paidBy": TEST_USER_A
+        }).get_json()["id"]
+        payment = {"expenseId": expense_id, "username": self.friend, "amount": 5}
+
+        self.assertEqual(self.app.post("/api/payments/pay", json=payment).status_code, 200)
+        resp = self.app.post("/api/payments/pay", json=payment)
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (400, "Already paid"))
+        resp = self.app.post("/api/payments/pay", json={**payment, "expenseId": "no-such-expense"})
+        self.assertEqual((resp.status_code, resp.get_json()["error"]), (404, "Expense not found"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,18 @@
+"""Per-group and per-user version counters behind the ETags on list endpoints.
+
+Every repository write bumps the counters of the groups/users it touched
+inside its own transaction (Repository.bump_versions). GET endpoints hash the
+counters into an ETag, so a conditional request can be answered with a single
+primary-key lookup instead of re-running the aggregation queries.
+"""
+import hashlib
+
+
+def etag(path, kind, entity_id, token, variant=''):
+    """Strong ETag for one endpoint/scope at a given version token.
+
+    `variant` is whatever else the body depends on: the query string, and
+    anything the view reads besides the database, such as today's date.
+    """
+    raw = f"{path}|{kind}:{entity_id}|{token}|{variant}".encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:20]
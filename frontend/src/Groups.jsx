@@ -39,16 +39,21 @@ export default function Groups({ username, onOpen }) {
 
   const addMember = async () => {
     if (!selectedGroupId) { setMessage('❌ Select a group'); return }
-    if (!memberName) { setMessage('❌ Enter member username'); return }
+    // Several usernames can be added at once, separated by commas or spaces
+    const names = memberName.split(/[\s,]+/).filter(Boolean)
+    if (names.length === 0) { setMessage('❌ Enter member username'); return }
     try {
-      const r = await fetch(`${API}/api/groups/add-member`, {
+      const r = await fetch(`${API}/api/groups/members`, {
         method: 'POST',
         headers: {'Content-Type':'application/json'},
-        body: JSON.stringify({ groupId: selectedGroupId, memberName })
+        body: JSON.stringify({ groupId: selectedGroupId, add: names })
       })
       const d = await r.json().catch(()=>({}))
       if (r.ok) { 
-        setMessage('Member added'); 
+        const failed = d.results.filter(x => x.status !== 'added')
+        setMessage(failed.length === 0
+          ? (d.added === 1 ? 'Member added' : `${d.added} members added`)
+          : '❌ ' + failed.map(x => `${x.username}: ${x.status.replace('_', ' ')}`).join(', '));
         setMemberName('');
         loadGroups();
       }
@@ -93,10 +98,10 @@ export default function Groups({ username, onOpen }) {
               {groups.map(g=> <option key={g.id} value={g.id}>{g.name}</option>)}
             </select>
 
-            <label className="form-label">Member Username</label>
+            <label className="form-label">Member Usernames</label>
             <input
               className="input large-input"
-              placeholder="Enter member username"
+              placeholder="Enter member usernames, separated by commas"
               value={memberName}
               onChange={e=>setMemberName(e.target.value)}
             />
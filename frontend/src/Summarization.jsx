@@ -22,13 +22,36 @@ export default function Summary({ username }) {
     } finally { setLoading(false) }
   }
 
+  // Streams the summary, showing each token as the server relays it
   const loadAi = async () => {
-    setAiLoading(true); setAiErr('')
+    setAiLoading(true); setAiErr(''); setAi('')
     try {
-      const r = await fetch(`${API}/api/summary/ai?user=${encodeURIComponent(username)}`)
-      const d = await r.json()
-      if (!r.ok) throw new Error(d.error || d.details || 'AI request failed')
-      setAi(d.text || '')
+      const r = await fetch(`${API}/api/summary/ai/stream?user=${encodeURIComponent(username)}`)
+      if (!r.ok) {
+        const d = await r.json()
+        throw new Error(d.error || d.details || 'AI request failed')
+      }
+      const reader = r.body.pipeThrough(new TextDecoderStream()).getReader()
+      let buffer = ''
+      for (;;) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        const frames = buffer.split('\n\n')
+        buffer = frames.pop()
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1]
+          const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] || '{}')
+          if (event === 'token') {
+            setAiLoading(false)
+            setAi(text => text + data.text)
+          } else if (event === 'done') {
+            setAi(data.text)
+          } else if (event === 'error') {
+            throw new Error(data.error)
+          }
+        }
+      }
     } catch (e) {
       setAiErr(e.message); setAi('')
     } finally { setAiLoading(false) }